@@ -0,0 +1,92 @@
+"""Excel导出基准：旧实现（全量Workbook+BytesIO） vs 只写模式流式导出
+
+运行（在仓库根目录）：
+    python -m api.bench.bench_excel_export                  # 默认 10k/100k/1M
+    python -m api.bench.bench_excel_export --sizes 10000 100000
+
+每个(实现, 数据量)组合在独立子进程中运行，报告耗时、峰值RSS和文件大小。
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from api.bench.common import peak_rss_mb, print_table, run_isolated, seed, use_temp_db
+
+MODULE = 'api.bench.bench_excel_export'
+
+
+def legacy_export(user_id: int):
+    """旧实现：一次性取出全部联系人，构建完整Workbook后保存到BytesIO"""
+    from io import BytesIO
+    from openpyxl import Workbook
+    from api.src.model.db import get_db_connection
+
+    conn = get_db_connection()
+    contacts = conn.execute('SELECT * FROM contacts WHERE user_id = ?', (user_id,)).fetchall()
+    groups = conn.execute('SELECT id, group_name FROM groups WHERE user_id = ?', (user_id,)).fetchall()
+    conn.close()
+    group_map = {g['id']: g['group_name'] for g in groups}
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "通讯录"
+    ws.append(["姓名", "电话1", "电话2", "邮箱1", "邮箱2", "社交账号", "地址", "分组ID", "分组名称", "是否收藏"])
+    for c in contacts:
+        ws.append([
+            c['name'], c['phone1'], c['phone2'] or '', c['email1'] or '', c['email2'] or '',
+            c['social_media'] or '', c['address'] or '', c['group_id'],
+            group_map.get(c['group_id'], '未分组'), "是" if c['is_favorite'] else "否"
+        ])
+    output = BytesIO()
+    wb.save(output)
+    output.seek(0)
+    return output
+
+
+def streaming_export(user_id: int):
+    from api.src.model.contact import Contact
+    return Contact.export_to_excel(user_id)
+
+
+IMPLEMENTATIONS = {'legacy': legacy_export, 'streaming': streaming_export}
+
+
+def child(impl: str, db_path: str, user_id: int, rows: int):
+    use_temp_db(db_path)
+    export = IMPLEMENTATIONS[impl]
+    start = time.perf_counter()
+    output = export(user_id)
+    output.seek(0, os.SEEK_END)
+    size = output.tell()
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'impl': impl, 'rows': rows, 'seconds': round(elapsed, 3),
+                      'peak_rss_mb': peak_rss_mb(), 'xlsx_mb': round(size / 1024 / 1024, 2)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--impl', nargs='+', default=list(IMPLEMENTATIONS), choices=list(IMPLEMENTATIONS))
+    args = parser.parse_args()
+
+    # 所有数据量共用一个测试库，每个数据量对应一个独立用户
+    db_path = use_temp_db()
+    results = []
+    for rows in args.sizes:
+        user_id = seed(contacts_per_user=rows)[0]
+        for impl in args.impl:
+            result = run_isolated(MODULE, impl, db_path, user_id, rows)
+            results.append(result)
+            print_table([result])
+    print()
+    print_table(results)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        impl, db_path, user_id, rows = sys.argv[2:6]
+        child(impl, db_path, int(user_id), int(rows))
+    else:
+        main()
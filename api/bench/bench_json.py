@@ -0,0 +1,95 @@
+"""JSON序列化微基准：旧实现（dict(Row)+jsonify） vs 行元组直接编码（标准库/orjson/流式/列式/msgpack）
+
+运行（在仓库根目录）：
+    python -m api.bench.bench_json                       # 默认 1k/10k/100k 行
+    python -m api.bench.bench_json --sizes 10000 --repeat 5
+
+查询结果只取一次，之后只测量序列化本身，报告每行耗时（纳秒）和响应体大小。
+"""
+import argparse
+import time
+
+from api.bench.common import print_table, seed, use_temp_db
+
+
+def legacy(rows) -> bytes:
+    """旧实现：每行先转成dict，再交给Flask默认的JSON provider"""
+    from flask import jsonify
+    return jsonify({'success': True, 'data': [dict(c) for c in rows], 'next_cursor': None}).get_data()
+
+
+def make_encoder(backend: str):
+    from api.src.utils import serializer
+    dumps = serializer.BACKENDS[backend]
+
+    def encode(rows) -> bytes:
+        payload = dumps({'success': True, 'next_cursor': None})[:-1] + b',"data":'
+        return payload + dumps(serializer.row_objects(rows)) + b'}'
+    return encode
+
+
+def streaming(rows) -> bytes:
+    from api.src.utils.serializer import rows_response
+    return b''.join(rows_response(rows, {'next_cursor': None}, stream=True).response)
+
+
+def make_format(fmt: str):
+    from api.src.utils.serializer import rows_response
+
+    def encode(rows) -> bytes:
+        return rows_response(rows, {'next_cursor': None}, stream=False, fmt=fmt).get_data()
+    return encode
+
+
+def measure(encode, rows, repeat: int) -> tuple[float, int]:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = encode(rows)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    use_temp_db()
+    from flask import Flask
+    from api.src.model.contact import Contact
+    from api.src.utils import serializer
+
+    implementations = {'legacy': legacy}
+    for backend in serializer.BACKENDS:
+        implementations[backend] = make_encoder(backend)
+    implementations[f'stream({serializer.get_backend()})'] = streaming
+    for fmt in serializer.FORMATS:
+        if fmt != 'json':
+            implementations[fmt] = make_format(fmt)
+
+    app = Flask(__name__)
+    results = []
+    with app.app_context():
+        for size in args.sizes:
+            user_id = seed(contacts_per_user=size)[0]
+            rows = Contact._query(user_id, '', 0, -1, None, None, None, None)[0]
+            baseline = None
+            for name, encode in implementations.items():
+                seconds, body_size = measure(encode, rows, args.repeat)
+                baseline = baseline or seconds
+                results.append({
+                    'impl': name, 'rows': size,
+                    'ns_per_row': round(seconds / size * 1e9),
+                    'speedup': round(baseline / seconds, 2),
+                    'body_kb': round(body_size / 1024),
+                })
+            print_table(results[-len(implementations):])
+    print()
+    print_table(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,440 @@
+"""联系人接口负载基准：按规模造数，分别通过Flask测试客户端和本地多worker gunicorn压测
+
+运行（在仓库根目录）：
+    python -m api.bench.bench_load                                    # 1k联系人，client+gunicorn，全部场景
+    python -m api.bench.bench_load --scale 100k --modes gunicorn --workers 4 --concurrency 16
+    python -m api.bench.bench_load --scale 1m --db /tmp/contacts-1m.db --json results.json
+    python -m api.bench.bench_load --json new.json --compare base.json    # 与基线对比，退化时退出码为1
+
+造数是确定性的（同样的 --scale/--users 总是生成同样的数据）；--db 指定的模板库中已有这批数据时直接复用，
+也可以用 --db api/src/data/contacts.db 直接给开发库造数。每个场景都在模板库的副本上、在独立子进程
+（gunicorn模式为新启动的服务）中运行：写入类场景不影响后续场景，峰值内存也互不干扰。
+client模式的峰值内存是“应用+压测线程”所在进程，gunicorn模式是master与全部worker之和。
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from itertools import count
+from urllib.parse import quote
+
+from api.bench.common import GIVEN_NAMES, PROJECT_ROOT, SURNAMES, fake_contact, peak_rss_mb, print_table, \
+    run_isolated, seed, use_temp_db
+
+SCALES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+MODES = ('client', 'gunicorn')
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# 场景 -> 相对 --requests 的请求数比例（导出/导入单次开销大，请求数少一些）
+SCENARIOS = {
+    'list': 1.0,           # 分页列表（按姓名排序）
+    'list_full': 0.1,      # 不分页的全量列表（旧前端的用法）
+    'search': 1.0,         # 3个字符以上的关键词（手机号片段、地址）：走全文索引，按相关度排序
+    'search_short': 1.0,   # 1~2个字符的关键词（姓/名中的字、两位数字）：在该用户的联系人中做子串匹配
+    'group': 1.0,          # 分组筛选
+    'favorite': 1.0,       # 切换收藏
+    'batch': 0.25,         # 批量添加100条
+    'export_csv': 0.05,
+    'export_excel': 0.05,
+    'import': 0.05,        # 导入 --import-rows 行的Excel
+}
+MIN_REQUESTS = 3
+ADDRESS_KEYWORDS = ('海淀区', '浦东新区', '天河区', '南山区')
+BATCH_SIZE = 100
+PHONE_BASE = 900_000_000  # 批量添加使用的手机号序号，与造数的号段不重叠
+
+
+def parse_scale(text: str) -> int:
+    return SCALES.get(text.lower()) or int(text)
+
+
+def _seed_prefix(contacts: int, users: int) -> str:
+    return f'load{contacts}x{users}'
+
+
+def ensure_seeded(path: str, contacts: int, users: int, groups: int) -> str:
+    """模板库中没有这批数据时造数；返回用户名前缀"""
+    prefix = _seed_prefix(contacts, users)
+    use_temp_db(path)
+    from api.src.model.db import get_pool
+
+    conn = get_pool().acquire()
+    try:
+        exists = conn.execute('SELECT 1 FROM users WHERE username = ?', (f'{prefix}_0',)).fetchone()
+    finally:
+        conn.close()
+    if exists:
+        print(f'复用已造好的数据：{path}（{prefix}）')
+    else:
+        start = time.perf_counter()
+        seed(users, contacts // users, groups, prefix=prefix)
+        print(f'造数 {contacts} 个联系人 / {users} 个用户：{time.perf_counter() - start:.1f}s -> {path}')
+    # 写回主库文件，子进程复制出的副本才是完整的
+    checkpoint = sqlite3.connect(path)
+    try:
+        checkpoint.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    finally:
+        checkpoint.close()
+    return prefix
+
+
+def load_context(path: str, prefix: str) -> list[dict]:
+    """每个造数用户的ID、分组ID和一批联系人ID"""
+    conn = sqlite3.connect(path)
+    try:
+        users = conn.execute(
+            "SELECT id FROM users WHERE username LIKE ? ESCAPE '\\' ORDER BY id", (f'{prefix}\\_%',)
+        ).fetchall()
+        return [{
+            'user_id': user_id,
+            'group_ids': [r[0] for r in conn.execute('SELECT id FROM groups WHERE user_id = ?', (user_id,))],
+            'contact_ids': [r[0] for r in conn.execute(
+                'SELECT id FROM contacts WHERE user_id = ? ORDER BY id LIMIT 500', (user_id,)
+            )],
+        } for (user_id,) in users]
+    finally:
+        conn.close()
+
+
+def _multipart(field: str, filename: str, content: bytes) -> tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    head = (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: {XLSX_MIMETYPE}\r\n\r\n').encode('utf-8')
+    return head + content + f'\r\n--{boundary}--\r\n'.encode('ascii'), f'multipart/form-data; boundary={boundary}'
+
+
+def _import_file(rows: int) -> bytes:
+    from api.bench.bench_parallel_import import make_workbook
+
+    path = os.path.join(tempfile.mkdtemp(prefix='contacts-load-'), 'import.xlsx')
+    make_workbook(path, rows, 1)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def build_requests(scenario: str, total: int, users: list[dict], tokens: dict, import_rows: int) -> list[tuple]:
+    """预先生成 (方法, 路径, 请求体, 请求头) 列表；随机数种子固定，每次运行请求序列相同"""
+    rnd = random.Random(scenario)
+    phones = count(PHONE_BASE)
+    upload = _multipart('file', 'import.xlsx', _import_file(import_rows)) if scenario == 'import' else None
+    requests = []
+    for _ in range(total):
+        user = rnd.choice(users)
+        headers = {'Authorization': f"Bearer {tokens[user['user_id']]}", 'Accept-Encoding': 'gzip'}
+        body = None
+        if scenario == 'list':
+            method, path = 'GET', f'/api/contacts?limit=50&sort=name&favorite={rnd.choice([-1, 1])}'
+        elif scenario == 'list_full':
+            method, path = 'GET', '/api/contacts'
+        elif scenario == 'search':
+            keyword = f'{rnd.randrange(1000):03d}' if rnd.random() < 0.7 else rnd.choice(ADDRESS_KEYWORDS)
+            method, path = 'GET', f'/api/contacts?limit=50&keyword={quote(keyword)}'
+        elif scenario == 'search_short':
+            keyword = rnd.choice(SURNAMES + GIVEN_NAMES) if rnd.random() < 0.5 else f'{rnd.randrange(100):02d}'
+            method, path = 'GET', f'/api/contacts?limit=50&keyword={quote(keyword)}'
+        elif scenario == 'group':
+            method, path = 'GET', f"/api/contacts?limit=50&group_id={rnd.choice(user['group_ids'] or [0])}"
+        elif scenario == 'favorite':
+            method, path = 'PUT', f"/api/contacts/favorite/{rnd.choice(user['contact_ids'])}"
+        elif scenario == 'batch':
+            contacts = [dict(fake_contact(next(phones)), group_id=0) for _ in range(BATCH_SIZE)]
+            method, path = 'POST', '/api/contacts/batch'
+            body = json.dumps({'contacts': contacts}).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        elif scenario == 'export_csv':
+            method, path = 'GET', '/api/contacts/export'
+        elif scenario == 'export_excel':
+            method, path = 'GET', '/api/contacts/export/excel'
+        elif scenario == 'import':
+            method, path = 'POST', '/api/contacts/import/excel'
+            body, headers['Content-Type'] = upload
+        else:
+            raise ValueError(f'未知场景：{scenario}')
+        requests.append((method, path, body, headers))
+    return requests
+
+
+def client_sender():
+    """Flask测试客户端（每个线程一个），不经过网络和WSGI服务器"""
+    from api.src.app import app
+
+    local = threading.local()
+
+    def send(method: str, path: str, body: bytes, headers: dict) -> tuple[int, int]:
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        response = client.open(path, method=method, data=body, headers=headers)
+        try:
+            return response.status_code, len(response.get_data())
+        finally:
+            response.close()
+    return send
+
+
+def http_sender(port: int):
+    """每个请求一个新连接（gunicorn sync worker不保持长连接）"""
+    def send(method: str, path: str, body: bytes, headers: dict) -> tuple[int, int]:
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            return response.status, len(response.read())
+        finally:
+            conn.close()
+    return send
+
+
+def drive(send, requests: list[tuple], concurrency: int) -> dict:
+    """concurrency个线程依次取请求发送，返回各请求耗时和总耗时"""
+    pending = iter(requests)
+    lock = threading.Lock()
+    latencies, errors, sizes = [], [], []
+
+    def worker():
+        while True:
+            with lock:
+                request = next(pending, None)
+            if request is None:
+                return
+            start = time.perf_counter()
+            try:
+                status, size = send(*request)
+            except Exception as e:  # 连接被重置、超时等都计为失败请求，不中断压测线程
+                status, size = repr(e), 0
+            latencies.append(time.perf_counter() - start)
+            sizes.append(size)
+            if not isinstance(status, int) or status >= 400:
+                errors.append(status)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {'latencies': latencies, 'errors': errors, 'sizes': sizes, 'elapsed': time.perf_counter() - start}
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """最近秩法百分位数"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(p * len(sorted_values)) - 1))]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _child_pids(pid: int) -> list[int]:
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def tree_peak_rss_mb(pid: int) -> float:
+    """进程及其子进程的峰值常驻内存之和（Linux /proc/<pid>/status 的VmHWM）"""
+    total_kb = 0
+    for p in [pid] + _child_pids(pid):
+        try:
+            with open(f'/proc/{p}/status') as f:
+                total_kb += next((int(line.split()[1]) for line in f if line.startswith('VmHWM:')), 0)
+        except OSError:
+            pass
+    return round(total_kb / 1024, 1)
+
+
+def start_gunicorn(workers: int, log_path: str) -> tuple[subprocess.Popen, int]:
+    port = _free_port()
+    log = open(log_path, 'wb')
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}',
+         '--timeout', '600', 'api.src.app:app'],
+        cwd=PROJECT_ROOT, env=os.environ.copy(), stdout=log, stderr=subprocess.STDOUT
+    )
+    log.close()
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            with open(log_path, encoding='utf-8', errors='replace') as f:
+                raise RuntimeError(f'gunicorn启动失败：\n{f.read()}')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/api/health')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return proc, port
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError('gunicorn启动超时')
+
+
+def run_child(mode: str, scenario: str, template: str, prefix: str, total: int, concurrency: int,
+              workers: int, import_rows: int, warmup: int) -> dict:
+    """子进程：复制模板库，启动被测服务，预热后压测一个场景"""
+    workdir = tempfile.mkdtemp(prefix='contacts-load-')
+    db_path = os.path.join(workdir, 'contacts.db')
+    for suffix in ('', '-wal'):
+        if os.path.exists(template + suffix):
+            shutil.copyfile(template + suffix, db_path + suffix)
+    use_temp_db(db_path)
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    from api.src.utils.auth import issue_token
+
+    users = load_context(db_path, prefix)
+    tokens = {u['user_id']: issue_token(u['user_id'])[0] for u in users}
+    requests = build_requests(scenario, warmup + total, users, tokens, import_rows)
+
+    proc = None
+    try:
+        if mode == 'client':
+            send = client_sender()
+        else:
+            proc, port = start_gunicorn(workers, os.path.join(workdir, 'gunicorn.log'))
+            send = http_sender(port)
+        drive(send, requests[:warmup], concurrency)
+        result = drive(send, requests[warmup:], concurrency)
+        rss = peak_rss_mb() if proc is None else tree_peak_rss_mb(proc.pid)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    latencies = sorted(result['latencies'])
+    return {
+        'mode': mode,
+        'scenario': scenario,
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'errors': len(result['errors']),
+        'rps': round(len(latencies) / result['elapsed'], 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        'kb_per_req': round(sum(result['sizes']) / max(len(latencies), 1) / 1024, 1),
+        'peak_rss_mb': rss,
+        'error_samples': [str(e) for e in result['errors'][:3]],
+    }
+
+
+def _git_revision() -> str:
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=PROJECT_ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return revision + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results: list[dict], baseline_path: str, threshold: float) -> list[dict]:
+    """与基线结果逐场景对比：p95变慢或吞吐下降超过threshold视为退化"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(r['mode'], r['scenario']): r for r in json.load(f)['results']}
+    rows = []
+    for r in results:
+        base = baseline.get((r['mode'], r['scenario']))
+        if base is None:
+            continue
+        p95 = r['p95_ms'] / base['p95_ms'] if base['p95_ms'] else 1.0
+        rps = r['rps'] / base['rps'] if base['rps'] else 1.0
+        rows.append({
+            'mode': r['mode'], 'scenario': r['scenario'],
+            'p95_ms': f"{base['p95_ms']} -> {r['p95_ms']}", 'p95_change': f'{p95 - 1:+.0%}',
+            'rps': f"{base['rps']} -> {r['rps']}", 'rps_change': f'{rps - 1:+.0%}',
+            'regression': p95 > 1 + threshold or rps < 1 - threshold,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', default='1k', help='联系人总数：1k/10k/100k/1m或整数')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--groups', type=int, default=5, help='每个用户的分组数')
+    parser.add_argument('--db', help='模板库路径（默认临时目录，指定后可跨运行复用造好的数据）')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=200, help='每个场景的基准请求数（按场景比例缩放）')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker数')
+    parser.add_argument('--import-rows', type=int, default=1000)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--json', help='把结果写入该JSON文件')
+    parser.add_argument('--compare', help='基线JSON文件（之前用--json生成）')
+    parser.add_argument('--threshold', type=float, default=0.2, help='退化阈值（比例）')
+    parser.add_argument('--child', nargs=9, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, scenario, template, prefix, total, concurrency, workers, import_rows, warmup = args.child
+        print(json.dumps(run_child(mode, scenario, template, prefix, int(total), int(concurrency),
+                                   int(workers), int(import_rows), int(warmup))))
+        return
+
+    contacts = parse_scale(args.scale)
+    template = os.path.abspath(args.db or os.path.join(tempfile.mkdtemp(prefix='contacts-load-'), 'contacts.db'))
+    prefix = ensure_seeded(template, contacts, args.users, args.groups)
+    print(f'CPU核数 {os.cpu_count()}，并发 {args.concurrency}，gunicorn worker {args.workers}')
+
+    results = []
+    for mode in args.modes:
+        for scenario in args.scenarios:
+            total = max(MIN_REQUESTS, int(args.requests * SCENARIOS[scenario]))
+            results.append(run_isolated(
+                'api.bench.bench_load', mode, scenario, template, prefix, total,
+                args.concurrency, args.workers, args.import_rows, args.warmup
+            ))
+            print_table([{k: v for k, v in results[-1].items() if k != 'error_samples'}])
+    print()
+    print_table([{k: v for k, v in r.items() if k != 'error_samples'} for r in results])
+    for r in results:
+        if r['errors']:
+            print(f"⚠️ {r['mode']}/{r['scenario']} 有{r['errors']}个失败请求，例如：{r['error_samples']}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'meta': {
+                    'revision': _git_revision(),
+                    'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'cpu_count': os.cpu_count(),
+                    'contacts': contacts, 'users': args.users, 'groups': args.groups,
+                    'requests': args.requests, 'concurrency': args.concurrency, 'workers': args.workers,
+                    'import_rows': args.import_rows,
+                },
+                'results': results,
+            }, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        rows = compare(results, args.compare, args.threshold)
+        print()
+        print_table(rows)
+        if any(r['regression'] for r in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""并行Excel导入基准：openpyxl单进程导入 vs 多进程片段解析导入
+
+运行（在仓库根目录，建议4~8核机器）：
+    python -m api.bench.bench_parallel_import                        # 默认 200k行、4个工作表
+    python -m api.bench.bench_parallel_import --rows 500000 --sheets 1 --workers 1 2 4 8
+
+serial 只读取活动工作表，为了可比，serial 的耗时按“每行耗时 x 总行数”折算。
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from api.bench.common import fake_contact, print_table, seed, use_temp_db
+
+
+def make_workbook(path: str, rows: int, sheets: int):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    per_sheet = rows // sheets
+    for s in range(sheets):
+        ws = wb.create_sheet(f'Sheet{s + 1}')
+        ws.append(["姓名", "电话1", "电话2", "邮箱1", "邮箱2", "社交账号", "地址", "分组ID", "分组名称", "是否收藏"])
+        for i in range(s * per_sheet, (s + 1) * per_sheet):
+            c = fake_contact(i)
+            ws.append([c['name'], c['phone1'], c['phone2'], c['email1'], c['email2'],
+                       c['social_media'], c['address'], 0, '', '是' if c['is_favorite'] else '否'])
+    wb.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--sheets', type=int, default=4)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--json', help='把结果写入该JSON文件')
+    args = parser.parse_args()
+
+    use_temp_db()
+    from api.src.model.contact import Contact
+
+    path = os.path.join(tempfile.mkdtemp(prefix='contacts-bench-'), 'import.xlsx')
+    start = time.perf_counter()
+    make_workbook(path, args.rows, args.sheets)
+    print(f'生成 {args.rows} 行 / {args.sheets} 个工作表：{time.perf_counter() - start:.1f}s，'
+          f'{os.path.getsize(path) / 1024 / 1024:.1f}MB，CPU核数 {os.cpu_count()}')
+
+    results = []
+    user_id = seed(contacts_per_user=0)[0]
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        report = Contact.import_from_excel(f, user_id)
+    elapsed = time.perf_counter() - start
+    per_row = elapsed / max(report['success'] + report['fail'], 1)
+    baseline = per_row * args.rows
+    results.append({'mode': 'serial(openpyxl)', 'workers': 1, 'rows': args.rows,
+                    'seconds': round(baseline, 2), 'rows_per_sec': int(1 / per_row), 'speedup': 1.0})
+
+    for workers in args.workers:
+        user_id = seed(contacts_per_user=0)[0]
+        start = time.perf_counter()
+        report = Contact.import_from_excel_parallel(path, user_id, workers=workers)
+        elapsed = time.perf_counter() - start
+        results.append({'mode': 'parallel', 'workers': workers, 'rows': report['success'],
+                        'seconds': round(elapsed, 2), 'rows_per_sec': int(report['success'] / elapsed),
+                        'speedup': round(baseline / elapsed, 2)})
+        print_table(results[-1:])
+
+    print()
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'cpu_count': os.cpu_count(), 'results': results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""密码哈希基准：各KDF成本参数下每核每秒可完成的登录验证次数
+
+运行（在仓库根目录）：
+    python -m api.bench.bench_password                  # 默认参数表
+    python -m api.bench.bench_password --seconds 5 --threads 1 4
+
+每个参数组合先生成一次哈希，然后在指定线程数下循环调用verify_password，
+报告单次耗时、总吞吐和按CPU核数折算的每核吞吐。hashlib计算时释放GIL，多线程可以用满多核。
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api.bench.common import print_table, use_temp_db
+
+SETTINGS = [
+    ('scrypt', {'n': 2 ** 12, 'r': 8, 'p': 1}),
+    ('scrypt', {'n': 2 ** 14, 'r': 8, 'p': 1}),
+    ('scrypt', {'n': 2 ** 15, 'r': 8, 'p': 1}),
+    ('pbkdf2_sha256', {'i': 100_000}),
+    ('pbkdf2_sha256', {'i': 310_000}),
+    ('pbkdf2_sha256', {'i': 600_000}),
+]
+
+
+def run(algorithm: str, params: dict, threads: int, seconds: float) -> dict:
+    from api.src.model.user import hash_password, verify_password
+
+    stored = hash_password('bench-password', algorithm, params)
+    deadline = time.perf_counter() + seconds
+
+    def worker() -> int:
+        count = 0
+        while time.perf_counter() < deadline:
+            ok, _ = verify_password('bench-password', stored)
+            assert ok
+            count += 1
+        return count
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        total = sum(f.result() for f in [executor.submit(worker) for _ in range(threads)])
+    elapsed = time.perf_counter() - start
+    cores = min(threads, os.cpu_count() or 1)
+    return {
+        'kdf': algorithm,
+        'params': ','.join(f'{k}={v}' for k, v in params.items()),
+        'threads': threads,
+        'ms_per_verify': round(elapsed * threads / total * 1000, 1),
+        'logins_per_s': round(total / elapsed, 1),
+        'logins_per_s_core': round(total / elapsed / cores, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=2.0)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1])
+    args = parser.parse_args()
+
+    use_temp_db()
+    results = []
+    for algorithm, params in SETTINGS:
+        for threads in args.threads:
+            results.append(run(algorithm, params, threads, args.seconds))
+            print_table(results[-1:])
+    print()
+    print_table(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""基准测试公共工具：临时数据库、批量造数、子进程隔离测量峰值内存
+
+用法：在导入 api.src.model 之前调用 use_temp_db()，让模型层使用独立的测试库。
+"""
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SURNAMES = '张王李赵刘陈杨黄周吴徐孙马朱胡郭何林罗高'
+GIVEN_NAMES = '伟芳娜敏静丽强磊军洋勇艳杰涛明超秀霞平刚桂英华'
+
+
+def use_temp_db(path: str = None) -> str:
+    """指定模型层使用的数据库文件（必须在导入模型之前调用）"""
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix='contacts-bench-'), 'contacts.db')
+    os.environ['CONTACTS_DB_PATH'] = path
+    os.environ.setdefault('DB_CHECKPOINT_INTERVAL', '0')
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    return path
+
+
+def fake_contact(i: int, group_ids: list[int] = ()) -> dict:
+    """生成第i个合成联系人（手机号按序号唯一）"""
+    rnd = random.Random(i)
+    return {
+        'name': rnd.choice(SURNAMES) + ''.join(rnd.choice(GIVEN_NAMES) for _ in range(rnd.randint(1, 2))),
+        'phone1': f'13{i:09d}',
+        'phone2': f'15{rnd.randrange(10 ** 9):09d}' if rnd.random() < 0.3 else '',
+        'email1': f'user{i}@example.com',
+        'email2': '',
+        'social_media': '',
+        'address': rnd.choice(['北京市海淀区', '上海市浦东新区', '广州市天河区', '深圳市南山区', '']),
+        'group_id': rnd.choice(group_ids) if group_ids and rnd.random() < 0.7 else 0,
+        'is_favorite': 1 if rnd.random() < 0.1 else 0,
+    }
+
+
+def seed(user_count: int = 1, contacts_per_user: int = 1000, groups_per_user: int = 5,
+         batch_size: int = 10000, prefix: str = None) -> list[int]:
+    """直接用executemany批量造数，返回用户ID列表
+
+    指定prefix时用户名为“prefix_序号”，同样的参数总是生成同样的数据（便于跨提交对比）。
+    """
+    from api.src.model.db import get_db_connection
+    from api.src.utils.pinyin import pinyin_key
+
+    conn = get_db_connection()
+    try:
+        user_ids = []
+        for u in range(user_count):
+            cursor = conn.execute(
+                'INSERT INTO users (username, password, email) VALUES (?, ?, ?)',
+                (f'{prefix}_{u}' if prefix else f'bench_{u}_{time.time_ns()}', 'bench-password', None)
+            )
+            user_id = cursor.lastrowid
+            user_ids.append(user_id)
+            group_ids = []
+            for g in range(groups_per_user):
+                group_ids.append(conn.execute(
+                    'INSERT INTO groups (group_name, user_id) VALUES (?, ?)', (f'分组{g}', user_id)
+                ).lastrowid)
+            for start in range(0, contacts_per_user, batch_size):
+                rows = []
+                for i in range(start, min(start + batch_size, contacts_per_user)):
+                    c = fake_contact(u * contacts_per_user + i, group_ids)
+                    rows.append((
+                        c['name'], c['phone1'], c['phone2'], c['email1'], c['email2'],
+                        c['social_media'], c['address'], c['group_id'], user_id, c['is_favorite'],
+                        pinyin_key(c['name'])
+                    ))
+                conn.executemany('''
+                    INSERT INTO contacts (
+                        name, phone1, phone2, email1, email2, social_media, address, group_id, user_id, is_favorite,
+                        name_pinyin
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+                conn.commit()
+        return user_ids
+    finally:
+        conn.close()
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（MB，Linux下ru_maxrss单位为KB）"""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def run_isolated(module: str, *args) -> dict:
+    """在独立子进程中运行 `python -m module --child args...`，读取其最后一行JSON输出
+
+    每次测量都用新进程，峰值内存不会被之前的运行抬高。
+    """
+    result = subprocess.run(
+        [sys.executable, '-m', module, '--child', *map(str, args)],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, env=os.environ.copy()
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'{module} {args} 运行失败：\n{result.stderr}')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def print_table(rows: list[dict]):
+    """以对齐的文本表格输出结果"""
+    if not rows:
+        return
+    keys = list(rows[0])
+    widths = {k: max(len(str(k)), *(len(str(r.get(k, ''))) for r in rows)) for k in keys}
+    print('  '.join(str(k).ljust(widths[k]) for k in keys))
+    for r in rows:
+        print('  '.join(str(r.get(k, '')).ljust(widths[k]) for k in keys))
@@ -1,3 +1,4 @@
+import logging
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -8,7 +9,13 @@ from flask_cors import CORS
 from api.src.controller.auth_controller import auth_bp
 from api.src.controller.contact_controller import contact_bp
 from api.src.controller.group_controller import group_bp
-from api.src.model.db import init_db
+from api.src.model.db import init_db, init_app as init_db_pool, get_pool_stats
+from api.src.model.query_log import enable_query_log
+from api.src.utils.cache import get_cache_stats
+from api.src.utils.compression import init_app as init_compression
+from api.src.utils.jobs import purge_jobs
+from api.src.utils.logger import get_logger, init_logging, log_event
+from api.src.utils.metrics import init_app as init_metrics
 
 # 初始化Flask应用
 app = Flask(__name__)
@@ -27,8 +34,21 @@ app.register_blueprint(auth_bp)
 app.register_blueprint(contact_bp)
 app.register_blueprint(group_bp)
 
-# 初始化数据库
+# 结构化日志（后台线程写出，LOG_LEVEL/LOG_FORMAT可调），要在初始化数据库之前配置
+init_logging()
+logger = get_logger(__name__)
+
+# 初始化数据库，并把连接池绑定到请求生命周期
 init_db()
+init_db_pool(app)
+# 上次退出时未完成的后台任务标记为失败，清理过期任务及其上传/结果文件
+purge_jobs()
+# 慢查询日志：超过DB_SLOW_QUERY_MS的语句及其查询计划，新语句出现SCAN contacts时告警
+enable_query_log()
+# 响应压缩（gzip/br/zstd，按Accept-Encoding协商，超过阈值才压缩）
+init_compression(app)
+# 请求耗时直方图、每请求SQL计时、可选的慢请求采样分析，暴露在 /api/metrics
+init_metrics(app)
 
 # 测试接口（用于验证服务是否启动）
 @app.route('/api/health', methods=['GET'])
@@ -36,13 +56,14 @@ def health_check():
     return {
         "status": "success",
         "message": "后端服务正常运行",
-        "port": 5000
+        "port": 5000,
+        "db_pool": get_pool_stats(),
+        "query_cache": get_cache_stats()
     }
 
 if __name__ == '__main__':
-    print("🚀 通讯录后端服务启动中...")
-    print("🔗 访问地址：http://127.0.0.1:5000")
-    print("📝 健康检查：http://127.0.0.1:5000/api/health")
+    log_event(logger, logging.INFO, '通讯录后端服务启动中', url='http://127.0.0.1:5000',
+              health='http://127.0.0.1:5000/api/health')
     # 启动服务（0.0.0.0允许所有IP访问）
     app.run(
         host='0.0.0.0',
@@ -1,12 +1,30 @@
+import logging
 import re
 from flask import Blueprint, request, jsonify
-from api.src.model.user import User  # 导入User模型
+from api.src.model.user import User, PasswordBusy  # 导入User模型
 from api.src.model.db import get_db_connection  # 导入数据库连接
+from api.src.utils.auth import issue_token
+from api.src.utils.logger import get_logger, log_event
+from api.src.utils.ratelimit import by_ip, by_username, failed, rate_limit
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api')
+logger = get_logger(__name__)
+
+
+def _busy():
+    """密码哈希线程池已满：让客户端稍后重试"""
+    log_event(logger, logging.WARNING, '密码哈希线程池已满', endpoint=request.endpoint)
+    response = jsonify({
+        'success': False,
+        'message': '服务器繁忙，请稍后重试'
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
 
 
 @auth_bp.route('/register', methods=['POST'])
+@rate_limit(10, 3600, key=by_ip)
 def register():
     data = request.get_json()
     if not data or 'username' not in data or 'password' not in data:
@@ -27,7 +45,10 @@ def register():
     password = data['password'].strip()
 
     # 调用User模型的注册方法
-    user_id = User.register(username, password, email)
+    try:
+        user_id = User.register(username, password, email)
+    except PasswordBusy:
+        return _busy()
     if user_id == -1:
         return jsonify({
             'success': False,
@@ -42,6 +63,8 @@ def register():
 
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit(30, 60, key=by_ip)                        # 单个IP的登录频率
+@rate_limit(5, 900, key=by_username, count_if=failed)  # 同一用户名连续失败5次锁定15分钟
 def login():
     data = request.get_json()
     if not data or 'username' not in data or 'password' not in data:
@@ -52,19 +75,27 @@ def login():
 
     username = data['username'].strip()
     password = data['password'].strip()
-    user = User.login(username, password)
+    try:
+        user = User.login(username, password)
+    except PasswordBusy:
+        return _busy()
 
     if not user:
+        log_event(logger, logging.INFO, '登录失败', remote_addr=by_ip())
         return jsonify({
             'success': False,
             'message': '用户名或密码错误'
         }), 401
 
+    # 签发令牌：之后的请求携带 Authorization: Bearer <token>
+    token, expires_at = issue_token(user['id'])
     return jsonify({
         'success': True,
         'message': '登录成功',
         'data': {
             'user_id': user['id'],
-            'username': user['username']
+            'username': user['username'],
+            'token': token,
+            'expires_at': expires_at
         }
     })
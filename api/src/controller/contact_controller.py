@@ -2,24 +2,48 @@ from flask import Blueprint, request, jsonify, Response, send_file
 from api.src.model.contact import Contact
 from api.src.model.group import Group
 from api.src.utils.auth import login_required
+from api.src.model.job import Job
+from api.src.utils import jobs
+from api.src.utils.compression import compress
+from api.src.utils.http_cache import conditional_response
+from api.src.utils.serializer import json_response, negotiate_format, row_objects, rows_response
+from api.src.utils.logger import get_logger, log_event
 from io import BytesIO
+import logging
+import os
+from itertools import chain
+from urllib.parse import quote
 
 contact_bp = Blueprint('contact', __name__, url_prefix='/api/contacts')
+logger = get_logger(__name__)
+
+
+def _attachment(download_name: str, fallback: str) -> str:
+    """Content-Disposition头：中文文件名按RFC 5987放在filename*中，filename为ASCII兼容名
+
+    WSGI服务器按latin-1编码响应头，直接写中文文件名会导致500（与send_file的处理方式一致）。
+    """
+    return f"attachment; filename={fallback}; filename*=UTF-8''{quote(download_name, safe='!#$&+-.^_`|~')}"
+
+
+def _wants_async() -> bool:
+    """请求参数async=1时改为后台任务执行"""
+    return request.args.get('async', '').lower() in ('1', 'true')
+
+
+def _job_accepted(job_id: str):
+    return jsonify({
+        'success': True,
+        'message': '任务已提交，请通过任务状态接口查询进度',
+        'data': {'job_id': job_id, 'status_url': f'{contact_bp.url_prefix}/jobs/{job_id}'}
+    }), 202
 
 
 # 获取所有联系人（登录验证，兼容前端user_id传递）
 @contact_bp.route('', methods=['GET'])
-# 临时注释登录验证，解决登录过期问题
-# @login_required
-def get_all():
+@login_required
+def get_all(user_id: int):
     """获取当前用户的所有联系人（支持搜索/分组筛选/收藏筛选）"""
-    # 从请求参数或前端头获取user_id，默认1
-    user_id = request.headers.get('X-User-Id', 1)
-    try:
-        user_id = int(user_id)
-    except ValueError:
-        user_id = 1
-
     keyword = request.args.get('keyword', '').strip()
     group_id = request.args.get('group_id', '0').strip()
     is_favorite = request.args.get('favorite', '-1').strip()
@@ -28,37 +52,80 @@ def get_all():
         is_favorite = int(is_favorite)
     except ValueError:
         is_favorite = -1
+    try:
+        group_id = int(group_id)
+    except ValueError:
+        group_id = 0
+
+    # 分页与字段投影（均为可选参数，不传时返回全部联系人）
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
+    sort = request.args.get('sort') or None
+    after = request.args.get('after') or None
+    limit = request.args.get('limit')
+    try:
+        limit = int(limit) if limit else None
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': '参数错误：limit必须是整数'
+        }), 400
 
-    # 搜索+分组筛选+收藏筛选
-    if keyword:
-        contacts = Contact.search(keyword, user_id)
-    elif group_id != '0':
+    def render():
+        # 搜索+分组筛选+收藏筛选（多个条件同时生效）
         try:
-            contacts = Contact.get_by_group(int(group_id), user_id)
-        except ValueError:
-            contacts = Contact.get_all(user_id, is_favorite)
-    elif is_favorite != -1:
-        contacts = Contact.get_all(user_id, is_favorite)
-    else:
-        contacts = Contact.get_all(user_id)
+            contacts, next_cursor, total = Contact.query(
+                user_id, keyword=keyword, group_id=group_id, favorite=is_favorite,
+                fields=fields, sort=sort, limit=limit, cursor=after
+            )
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': f'参数错误：{str(e)}'
+            }), 400
 
-    return jsonify({
+        response = rows_response(contacts, {'next_cursor': next_cursor}, fmt=fmt)
+        if total is not None:  # 关键词搜索匹配过多时不给出总数，按next_cursor翻页
+            response.headers['X-Total-Count'] = str(total)
+        return response
+
+    # 响应格式由Accept决定：行对象JSON（默认）/列式JSON/MessagePack，共用同一个查询
+    fmt = negotiate_format(request.accept_mimetypes)
+    # 数据未变化时（If-None-Match命中）直接返回304，不查询联系人
+    response = conditional_response(user_id, render, variant='' if fmt == 'json' else fmt)
+    response.vary.add('Accept')
+    return response
+
+
+# 增量同步：只返回since版本之后变化的联系人
+@contact_bp.route('/changes', methods=['GET'])
+@login_required
+def changes(user_id: int):
+    """返回since之后新增/修改的联系人与已删除的联系人ID，next_since用于下一次同步"""
+    try:
+        since = int(request.args.get('since') or 0)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': '参数错误：since必须是整数'
+        }), 400
+
+    result = Contact.changes(user_id, since)
+    return json_response({
         'success': True,
-        'data': [dict(c) for c in contacts]
+        'data': {
+            'upserts': row_objects(result['upserts']),
+            'deletes': result['deletes'],
+            'reset': result['reset']
+        },
+        'next_since': result['version']
     })
 
 
 # 添加单个联系人（适配多字段+修复分组验证）
 @contact_bp.route('', methods=['POST'])
-# @login_required
-def add():
+@login_required
+def add(user_id: int):
     """添加单个联系人（多字段）"""
-    user_id = request.headers.get('X-User-Id', 1)
-    try:
-        user_id = int(user_id)
-    except ValueError:
-        user_id = 1
-
     data = request.get_json()
     if not data or 'name' not in data or 'phone1' not in data:
         return jsonify({
@@ -98,15 +165,9 @@ def add():
 
 # 修改联系人（适配多字段）
 @contact_bp.route('', methods=['PUT'])
-# @login_required
-def update():
+@login_required
+def update(user_id: int):
     """修改联系人（多字段）"""
-    user_id = request.headers.get('X-User-Id', 1)
-    try:
-        user_id = int(user_id)
-    except ValueError:
-        user_id = 1
-
     data = request.get_json()
     if not data or 'old_phone' not in data:
         return jsonify({
@@ -156,15 +217,9 @@ def update():
 
 # 删除联系人
 @contact_bp.route('', methods=['DELETE'])
-# @login_required
-def delete():
+@login_required
+def delete(user_id: int):
     """删除联系人"""
-    user_id = request.headers.get('X-User-Id', 1)
-    try:
-        user_id = int(user_id)
-    except ValueError:
-        user_id = 1
-
     data = request.get_json()
     if not data or 'phone' not in data:
         return jsonify({
@@ -188,15 +243,9 @@ def delete():
 
 # 批量添加联系人（CSV导入）
 @contact_bp.route('/batch', methods=['POST'])
-# @login_required
-def batch_add():
+@login_required
+def batch_add(user_id: int):
     """批量添加联系人（前端导入功能）"""
-    user_id = request.headers.get('X-User-Id', 1)
-    try:
-        user_id = int(user_id)
-    except ValueError:
-        user_id = 1
-
     data = request.get_json()
     if not data or 'contacts' not in data:
         return jsonify({
@@ -205,48 +254,44 @@ def batch_add():
         }), 400
 
     contacts = data['contacts']
-    success, fail = Contact.batch_add(contacts, user_id)
+    if not isinstance(contacts, list):
+        return jsonify({
+            'success': False,
+            'message': '参数错误：contacts必须是数组'
+        }), 400
+
+    result = Contact.batch_add(contacts, user_id)
     return jsonify({
         'success': True,
-        'message': f'导入成功{success}条，失败{fail}条',
-        'data': {'success': success, 'fail': fail}
+        'message': f"导入成功{result['success']}条，失败{result['fail']}条",
+        'data': result
     })
 
 
 # 导出CSV（修复中文乱码，添加UTF-8 BOM）
 @contact_bp.route('/export', methods=['GET'])
-# @login_required
-def export():
+@login_required(allow_query_token=True)
+@compress(gzip=9, br=7, zstd=9)  # 导出文件大、可压缩率高：用更多CPU换带宽
+def export(user_id: int):
     """导出当前用户的联系人到CSV（修复中文乱码）"""
-    user_id = request.args.get('user_id', 1)
-    try:
-        user_id = int(user_id)
-    except ValueError:
-        user_id = 1
-
-    csv_data = Contact.export_to_csv(user_id)
-    # 添加UTF-8 BOM头，解决Excel打开乱码问题
-    return Response(
-        '\ufeff' + csv_data,
-        mimetype="text/csv; charset=utf-8",
-        headers={
-            "Content-disposition": f"attachment; filename=通讯录_{user_id}.csv",
-            "Content-Type": "text/csv; charset=utf-8"
-        }
-    )
+    if _wants_async():
+        return _job_accepted(jobs.submit(user_id, 'export_csv', jobs.run_csv_export_job, user_id))
+
+    # 流式输出：先写UTF-8 BOM头（解决Excel打开乱码问题），再逐块编码CSV
+    chunks = (chunk.encode('utf-8') for chunk in chain(['\ufeff'], Contact.iter_csv(user_id)))
+    headers = {
+        "Content-Disposition": _attachment(f'通讯录_{user_id}.csv', f'contacts_{user_id}.csv'),
+        "Content-Type": "text/csv; charset=utf-8"
+    }
+    # 压缩由应用级中间件按Accept-Encoding处理（见 @compress）
+    return Response(chunks, mimetype="text/csv; charset=utf-8", headers=headers)
 
 
 # 切换收藏状态
 @contact_bp.route('/favorite/<int:contact_id>', methods=['PUT'])
-# @login_required
-def toggle_favorite(contact_id: int):
+@login_required
+def toggle_favorite(user_id: int, contact_id: int):
     """切换联系人收藏状态"""
-    user_id = request.headers.get('X-User-Id', 1)
-    try:
-        user_id = int(user_id)
-    except ValueError:
-        user_id = 1
-
     success = Contact.toggle_favorite(contact_id, user_id)
     if not success:
         return jsonify({
@@ -261,14 +306,11 @@ def toggle_favorite(contact_id: int):
 
 # 导出Excel（修复下载配置）
 @contact_bp.route('/export/excel', methods=['GET'])
-# @login_required
-def export_excel():
+@login_required(allow_query_token=True)
+def export_excel(user_id: int):
     """导出联系人到Excel（优化下载配置）"""
-    user_id = request.args.get('user_id', 1)
-    try:
-        user_id = int(user_id)
-    except ValueError:
-        user_id = 1
+    if _wants_async():
+        return _job_accepted(jobs.submit(user_id, 'export_excel', jobs.run_excel_export_job, user_id))
 
     excel_data = Contact.export_to_excel(user_id)
     return send_file(
@@ -280,16 +322,11 @@ def export_excel():
 
 
 @contact_bp.route('/import/excel', methods=['POST'])
-def import_excel():
-    user_id = request.headers.get('X-User-Id', 1)
-    try:
-        user_id = int(user_id)
-    except ValueError:
-        user_id = 1
-
-    # 排查文件是否上传
-    print("请求头：", request.headers)
-    print("请求文件：", request.files)
+@login_required
+def import_excel(user_id: int):
+    # 排查文件是否上传（不记录请求头：其中含有登录令牌）
+    log_event(logger, logging.DEBUG, '收到导入请求', user_id=user_id, files=list(request.files),
+              content_length=request.content_length)
 
     if 'file' not in request.files:
         return jsonify({'success': False, 'message': '未上传文件'}), 400
@@ -297,10 +334,27 @@ def import_excel():
     if file.filename == '' or not file.filename.endswith('.xlsx'):
         return jsonify({'success': False, 'message': '请上传.xlsx文件'}), 400
 
+    # parallel=1：多进程解析全部工作表（适合超大文件或多工作表）
+    parallel = request.args.get('parallel', '').lower() in ('1', 'true')
+    if _wants_async():
+        # 大文件：保存后交给后台任务，立即返回任务ID
+        jobs.purge_jobs()
+        job_id = Job.create(user_id, 'import_excel')
+        upload_path = jobs.save_upload(file, job_id)
+        return _job_accepted(jobs.start(job_id, jobs.run_import_job, upload_path, user_id, 0, parallel))
+
     try:
-        file_data = BytesIO(file.read())
-        # 调用导入方法时，跳过分组验证
-        success, fail = Contact.import_from_excel(file_data, user_id, force_group_id=0)
+        if parallel:
+            upload_path = jobs.save_upload(file)
+            try:
+                report = Contact.import_from_excel_parallel(upload_path, user_id, force_group_id=0)
+            finally:
+                os.remove(upload_path)
+        else:
+            file_data = BytesIO(file.read())
+            # 调用导入方法时，跳过分组验证
+            report = Contact.import_from_excel(file_data, user_id, force_group_id=0)
+        success, fail = report['success'], report['fail']
         # 优化返回提示，告知用户数据已被强制处理
         if success > 0:
             message = f'导入成功{success}条，失败{fail}条（空值/重复手机号已自动处理）'
@@ -309,7 +363,44 @@ def import_excel():
         return jsonify({
             'success': True,
             'message': message,
-            'fail_reason': '失败原因：Excel数据为空/文件损坏'
+            'fail_reason': '失败原因：Excel数据为空/文件损坏',
+            'data': report
         })
     except Exception as e:
+        log_event(logger, logging.ERROR, 'Excel导入失败', exc_info=True, user_id=user_id)
         return jsonify({'success': False, 'message': f'导入失败：{str(e)}'}), 500
+
+
+# 查询后台任务进度
+@contact_bp.route('/jobs/<job_id>', methods=['GET'])
+@login_required
+def job_status(user_id: int, job_id: str):
+    """查询导入/导出任务的状态与进度"""
+    job = Job.get(job_id, user_id)
+    if not job:
+        return jsonify({
+            'success': False,
+            'message': '任务不存在'
+        }), 404
+    return jsonify({
+        'success': True,
+        'data': Job.to_dict(job)
+    })
+
+
+# 下载后台任务生成的文件
+@contact_bp.route('/jobs/<job_id>/download', methods=['GET'])
+@login_required(allow_query_token=True)
+def job_download(user_id: int, job_id: str):
+    """下载导出任务的结果文件"""
+    job = Job.get(job_id, user_id)
+    if not job or job['status'] != 'succeeded' or not job['artifact_path']:
+        return jsonify({
+            'success': False,
+            'message': '任务不存在或尚未完成'
+        }), 404
+    return send_file(
+        job['artifact_path'],
+        download_name=job['artifact_name'],
+        as_attachment=True
+    )
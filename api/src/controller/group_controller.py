@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from api.src.model.group import Group
 from api.src.utils.auth import login_required
+from api.src.utils.http_cache import conditional_response
+from api.src.utils.serializer import rows_response
 
 group_bp = Blueprint('group', __name__, url_prefix='/api/groups')
 
@@ -8,11 +10,10 @@ group_bp = Blueprint('group', __name__, url_prefix='/api/groups')
 @group_bp.route('', methods=['GET'])
 @login_required
 def get_all_groups(user_id: int):
-    groups = Group.get_all(user_id)
-    return jsonify({
-        'success': True,
-        'data': [dict(g) for g in groups]
-    })
+    def render():
+        return rows_response(Group.get_all(user_id))
+
+    return conditional_response(user_id, render)
 
 
 @group_bp.route('', methods=['POST'])
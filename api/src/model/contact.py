@@ -1,36 +1,365 @@
 from sqlite3 import Row
-from api.src.model.db import get_db_connection
+from api.src.model.db import get_db_connection, get_pool
+from api.src.model.migrations import FTS_COLUMNS, fts_owner
+from api.src.model.version import ChangeVersion
+from api.src.utils.cache import invalidate_user, query_cache
+from api.src.utils.logger import get_logger, log_event
+from api.src.utils.pinyin import pinyin_key
+from api.src.utils.import_rows import IMPORT_WORKERS, get_import_executor, normalize_import_row, parse_import_fragment
+from api.src.utils.xlsx_reader import iter_row_fragments, sheet_paths
+import logging
 import sqlite3
+import time
 from openpyxl import Workbook, load_workbook
 from io import BytesIO, StringIO
+from tempfile import SpooledTemporaryFile
 import csv
-import re
 import random
+import base64
+import json
+from functools import lru_cache
+from collections import Counter, deque
+import os
+
+logger = get_logger(__name__)
+
+# trigram分词至少需要3个字符才能命中全文索引
+FTS_MIN_KEYWORD = 3
+
+
+def _fts_phrase(keyword: str) -> str:
+    """把关键词转成FTS5短语查询，避免用户输入被当成查询语法"""
+    return '"' + keyword.replace('"', '""') + '"'
+
+
+def _fts_match(keyword: str, user_id: int) -> str:
+    """当前用户文档中的检索条件：租户列精确短语 AND 各检索字段中的关键词短语"""
+    return f'owner : {_fts_phrase(fts_owner(user_id))} AND {{{" ".join(FTS_COLUMNS)}}} : {_fts_phrase(keyword)}'
+
+
+def _like_pattern(keyword: str) -> str:
+    return '%' + keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+# 列表接口允许投影的字段
+CONTACT_FIELDS = (
+    'id', 'name', 'phone1', 'phone2', 'email1', 'email2', 'social_media',
+    'address', 'group_id', 'user_id', 'is_favorite', 'created_at', 'updated_at'
+)
+# 增量同步返回的字段：列表字段+行版本号（写入时取自user_versions的版本号）
+SYNC_FIELDS = CONTACT_FIELDS + ('row_version',)
+# 游标翻页的排序键：id 或 (name, id)
+SORT_KEYS = {'id': ('id',), 'name': ('name', 'id')}
+SORT_KEY_TYPES = {'id': int, 'name': str}
+# 全文检索未指定排序时按相关度排序；相关度随索引写入变化，游标记录的是下一页的偏移量
+RANK_SORT = 'rank'
+MAX_PAGE_SIZE = 1000
+# 导出时每次从游标读取的行数
+EXPORT_CHUNK_SIZE = 2000
+# Excel导出结果超过该大小（字节）时写入临时文件，而不是留在内存
+EXCEL_SPOOL_BYTES = 8 * 1024 * 1024
+# Excel导入每个事务写入的行数
+IMPORT_BATCH_SIZE = 5000
+# 批量添加每个事务写入的行数（越小占用写锁的时间越短）
+BATCH_CHUNK_SIZE = 1000
+# 删除记录（墓碑）保留秒数；同步令牌早于已清理的墓碑时客户端需要全量同步
+TOMBSTONE_RETENTION = int(os.environ.get('TOMBSTONE_RETENTION', str(30 * 24 * 3600)))
+
+
+def select_columns(fields: list[str] = None, sort: str = 'id') -> list[str]:
+    """校验投影字段；排序键总会被选出，用于生成下一页游标"""
+    if not fields:
+        return list(CONTACT_FIELDS)
+    unknown = [f for f in fields if f not in CONTACT_FIELDS]
+    if unknown:
+        raise ValueError(f'不支持的字段：{", ".join(unknown)}')
+    columns = list(dict.fromkeys(fields))
+    for key in SORT_KEYS.get(sort, ('id',)):
+        if key not in columns:
+            columns.append(key)
+    return columns
+
+
+def encode_cursor(row: Row, sort: str, offset: int = 0) -> str:
+    """把最后一行的排序键（按相关度排序时为下一页偏移量）编码成不透明的游标"""
+    values = [offset] if sort == RANK_SORT else [row[key] for key in SORT_KEYS[sort]]
+    raw = json.dumps([sort, values], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str) -> list:
+    """解析游标，排序方式不一致或格式错误时抛出ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, values = json.loads(raw.decode('utf-8'))
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise ValueError('无效的分页游标')
+    if cursor_sort != sort:
+        raise ValueError('分页游标与排序方式不匹配')
+    # 游标来自客户端，值直接绑定到SQL参数，必须逐个校验类型
+    types = [int] if sort == RANK_SORT else [SORT_KEY_TYPES[key] for key in SORT_KEYS[sort]]
+    if not isinstance(values, list) or len(values) != len(types) or \
+            not all(type(value) is value_type for value_type, value in zip(types, values)):
+        raise ValueError('无效的分页游标')
+    if sort == RANK_SORT and values[0] < 0:
+        raise ValueError('无效的分页游标')
+    return values
+
+
+# 短关键词（无法使用trigram索引）时在当前用户的联系人中做子串匹配的字段
+SUBSTRING_COLUMNS = FTS_COLUMNS
+# 关键词搜索最多精确计数的条数，超过时总数返回None，客户端按next_cursor翻页
+SEARCH_COUNT_LIMIT = 1000
+
+
+@lru_cache(maxsize=256)
+def _compile_query(mode: str, by_group: bool, by_favorite: bool, columns: tuple, sort: str,
+                   has_cursor: bool, has_limit: bool) -> tuple[str, str]:
+    """按查询形状生成(计数SQL, 查询SQL)
+
+    同一形状总是得到完全相同的SQL文本，参数另行绑定，
+    这样连接上的预编译语句缓存（cached_statements）可以直接命中。
+    全文检索的MATCH条件已限定租户列，CROSS JOIN固定由FTS驱动连接，
+    避免SQLite改为逐行扫描该用户的联系人、对每一行执行一次MATCH。
+    """
+    source = 'contacts c'
+    where = ['c.user_id = ?']
+    if mode == 'fts':
+        source = 'contacts_fts CROSS JOIN contacts c ON c.id = contacts_fts.rowid'
+        where.append('contacts_fts MATCH ?')
+    elif mode == 'substring':
+        where.append('(' + ' OR '.join(f"c.{col} LIKE ? ESCAPE '\\'" for col in SUBSTRING_COLUMNS) + ')')
+    if by_group:
+        where.append('c.group_id = ?')
+    if by_favorite:
+        where.append('c.is_favorite = ?')
+    if mode:
+        # 关键词搜索只数到上限为止，不统计整个匹配集
+        count_sql = f'SELECT COUNT(*) FROM (SELECT 1 FROM {source} WHERE {" AND ".join(where)} LIMIT ?)'
+    else:
+        count_sql = f'SELECT COUNT(*) FROM {source} WHERE {" AND ".join(where)}'
+
+    if sort == RANK_SORT:
+        # FTS5按rank排序时在虚表内部完成排序；游标是偏移量
+        order_by = 'contacts_fts.rank'
+        limit = ' LIMIT ? OFFSET ?' if has_cursor else ' LIMIT ?' if has_limit else ''
+    else:
+        sort_keys = ['c.' + col for col in SORT_KEYS[sort]]
+        if mode == 'fts' and sort == 'id':
+            sort_keys = ['contacts_fts.rowid']  # 按rowid顺序读取全文索引，翻页条件也下推到FTS
+        order_by = ', '.join(sort_keys)
+        if has_cursor:
+            where.append(f'({order_by}) > ({", ".join("?" * len(sort_keys))})')
+        limit = ' LIMIT ?' if has_limit else ''
+    select_sql = (f'SELECT {", ".join("c." + col for col in columns)} FROM {source} '
+                  f'WHERE {" AND ".join(where)} ORDER BY {order_by}{limit}')
+    return count_sql, select_sql
+
+
+def _keyword_params(mode: str, keyword: str, user_id: int) -> list:
+    if mode == 'fts':
+        return [_fts_match(keyword, user_id)]
+    return [_like_pattern(keyword)] * len(SUBSTRING_COLUMNS)
+
+
+INSERT_CONTACT_SQL = '''
+    INSERT INTO contacts (
+        name, phone1, phone2, email1, email2, social_media, address, group_id, user_id, is_favorite,
+        name_pinyin, row_version, updated_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+'''
+
+
+# 导出按id顺序读取，由 (user_id) 索引直接给出顺序（迁移9），不需要临时排序
+EXPORT_SQL = (
+    'SELECT name, phone1, phone2, email1, email2, social_media, address, group_id, is_favorite '
+    'FROM contacts WHERE user_id = ? ORDER BY id'
+)
+
+
+def _dedupe_phone(record: dict, taken: set) -> dict:
+    """在内存中保证手机号唯一：空号生成随机138号码，重复号码修改尾号"""
+    phone1 = record['phone1']
+    if not phone1:
+        phone1 = '138' + ''.join(str(random.randint(0, 9)) for _ in range(8))
+    elif phone1 in taken:
+        record['adjustments'].append(f'电话1 {phone1} 已存在，已修改尾号')
+    # 尾号替换为随机数；尾号10种取值都被占用时逐步放宽替换位数
+    digits = 1
+    attempts = 0
+    while phone1 in taken:
+        phone1 = phone1[:-digits] + ''.join(str(random.randint(0, 9)) for _ in range(digits))
+        attempts += 1
+        if attempts % 20 == 0 and digits < 8:
+            digits += 1
+    taken.add(phone1)
+    record['phone1'] = phone1
+    return record
+
+
+def _import_params(record: dict, user_id: int, version: int) -> tuple:
+    return (
+        record['name'], record['phone1'], *record['values'],
+        record['group_id'], user_id, record['is_favorite'], record['name_pinyin'], version
+    )
+
+
+def _insert_import_batch(conn, batch: list[dict], user_id: int, report: dict):
+    """一个事务内executemany写入一批；整批失败时逐行重试以定位失败行"""
+    try:
+        version = ChangeVersion.bump(conn, user_id)
+        conn.executemany(INSERT_CONTACT_SQL, [_import_params(r, user_id, version) for r in batch])
+        conn.commit()
+        succeeded = batch
+    except sqlite3.Error as e:
+        conn.rollback()
+        log_event(logger, logging.DEBUG, '批量写入失败，逐行重试', user_id=user_id, size=len(batch), error=str(e))
+        succeeded = []
+        version = ChangeVersion.bump(conn, user_id)
+        for record in batch:
+            try:
+                conn.execute(INSERT_CONTACT_SQL, _import_params(record, user_id, version))
+                succeeded.append(record)
+            except sqlite3.Error as e:
+                report['fail'] += 1
+                if logger.isEnabledFor(logging.DEBUG):
+                    log_event(logger, logging.DEBUG, '导入行写入失败', user_id=user_id, row=record['row'], error=str(e))
+                report['rows'].append({
+                    'row': record['row'], 'status': 'failed', 'name': record['name'],
+                    'phone1': record['phone1'], 'reason': str(e)
+                })
+        if succeeded:
+            conn.commit()
+        else:
+            conn.rollback()  # 整批都失败：版本号不变
+    report['success'] += len(succeeded)
+    for record in succeeded:
+        if record['adjustments']:
+            report['rows'].append({
+                'row': record['row'], 'status': 'imported', 'name': record['name'],
+                'phone1': record['phone1'], 'adjustments': record['adjustments']
+            })
+
+
+def _log_import_summary(mode: str, user_id: int, report: dict, started: float):
+    """每次导入只输出一条汇总日志：行数、耗时、吞吐、自动修正数和失败原因分布（逐行明细在DEBUG级别）"""
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    elapsed = time.perf_counter() - started
+    total = report['success'] + report['fail']
+    reasons = Counter(r.get('reason', '') for r in report['rows'] if r['status'] == 'failed')
+    log_event(
+        logger, logging.INFO, 'Excel导入完成', mode=mode, user_id=user_id,
+        success=report['success'], fail=report['fail'],
+        adjusted=sum(1 for r in report['rows'] if r['status'] == 'imported'),
+        seconds=round(elapsed, 3), rows_per_s=round(total / elapsed) if elapsed > 0 else None,
+        fail_reasons=dict(reasons.most_common(5))
+    )
+
+
+# 批量添加的文本字段：JSON中允许字符串或数字（如手机号写成数字），其他类型按行拒绝
+BATCH_TEXT_FIELDS = ('name', 'phone1', 'phone2', 'email1', 'email2', 'social_media', 'address')
+FIELD_LABELS = {
+    'name': '姓名', 'phone1': '电话1', 'phone2': '电话2', 'email1': '邮箱1', 'email2': '邮箱2',
+    'social_media': '社交账号', 'address': '地址',
+}
+
+
+def _validate_batch_contact(contact: dict, user_id: int, group_ids: set, taken: set) -> tuple[tuple, str]:
+    """校验批量添加的一条数据，返回(插入参数, None)或(None, 失败原因)"""
+    if not isinstance(contact, dict):
+        return None, '数据格式错误'
+    values = {}
+    for field in BATCH_TEXT_FIELDS:
+        value = contact.get(field, '')
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (str, int, float))):
+            return None, f'{FIELD_LABELS[field]}格式错误'
+        values[field] = value if value is None or isinstance(value, str) else str(value)
+    name = (values['name'] or '').strip()
+    phone1 = (values['phone1'] or '').strip()
+    if not name or not phone1:
+        return None, '姓名和电话1不能为空'
+    try:
+        group_id = int(contact.get('group_id') or 0)
+    except (TypeError, ValueError):
+        return None, '分组ID格式错误'
+    # 分组ID=0时跳过验证（未分组）
+    if group_id != 0 and group_id not in group_ids:
+        return None, '分组不存在'
+    if phone1 in taken:
+        return None, '电话1已存在'
+    return (
+        name, phone1,
+        values['phone2'],
+        values['email1'],
+        values['email2'],
+        values['social_media'],
+        values['address'],
+        group_id, user_id,
+        1 if contact.get('is_favorite', 0) else 0,
+        pinyin_key(name)
+    ), None
+
+
+def _insert_batch_chunk(conn, chunk: list[tuple], user_id: int, errors: list) -> int:
+    """在一个事务内写入一块数据，返回实际写入的行数
+
+    ON CONFLICT DO NOTHING 跳过并发写入造成的手机号冲突；行数不符时查出本块真正写入的手机号，
+    其余行记为失败。
+    """
+    conn.execute('BEGIN IMMEDIATE')  # 先拿写锁，保证 id > last_id 的行都是本块写入的
+    last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM contacts').fetchone()[0]
+    version = ChangeVersion.bump(conn, user_id)
+    cursor = conn.executemany(
+        INSERT_CONTACT_SQL.rstrip() + ' ON CONFLICT DO NOTHING',
+        [params + (version,) for _, params in chunk]
+    )
+    inserted = cursor.rowcount  # 不含触发器（全文索引）产生的修改
+    if inserted != len(chunk):
+        written = {row[0] for row in conn.execute(
+            'SELECT phone1 FROM contacts WHERE user_id = ? AND id > ?', (user_id, last_id)
+        )}
+        errors.extend({
+            'index': index, 'name': params[0], 'phone1': params[1], 'reason': '电话1已存在'
+        } for index, params in chunk if params[1] not in written)
+    if inserted:
+        conn.commit()
+    else:
+        conn.rollback()  # 一行都没写入：版本号不变
+    return inserted
+
+
+def _ordered_results(executor, func, tasks, window: int):
+    """按提交顺序取回结果，最多同时挂起window个任务，避免整个文件的片段都堆在内存里
+
+    生成器关闭（导入中途失败）时取消尚未开始的任务，进程池由多次导入共用，不随之关闭。
+    """
+    pending = deque()
+    try:
+        for task in tasks:
+            pending.append(executor.submit(func, *task))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
 
 class Contact:
     @staticmethod
     def get_all(user_id: int, is_favorite: int = -1) -> list[Row]:
         """获取当前用户所有联系人，支持收藏筛选"""
-        conn = get_db_connection()
-        query = 'SELECT * FROM contacts WHERE user_id = ?'
-        params = [user_id]
-        if is_favorite != -1:
-            query += ' AND is_favorite = ?'
-            params.append(is_favorite)
-        contacts = conn.execute(query, params).fetchall()
-        conn.close()
-        return contacts
+        return Contact.query(user_id, favorite=is_favorite)[0]
 
     @staticmethod
     def add(contact_data: dict, user_id: int) -> int:
         """添加联系人（多字段）"""
         conn = get_db_connection()
         try:
-            cursor = conn.execute('''
-                INSERT INTO contacts (
-                    name, phone1, phone2, email1, email2, social_media, address, group_id, user_id, is_favorite
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
+            version = ChangeVersion.bump(conn, user_id)
+            cursor = conn.execute(INSERT_CONTACT_SQL, (
                 contact_data['name'],
                 contact_data['phone1'],
                 contact_data.get('phone2', ''),
@@ -40,14 +369,18 @@ class Contact:
                 contact_data.get('address', ''),
                 int(contact_data.get('group_id', 0)),  # 确保是整数
                 user_id,
-                1 if contact_data.get('is_favorite', 0) else 0
+                1 if contact_data.get('is_favorite', 0) else 0,
+                pinyin_key(contact_data['name']),
+                version
             ))
             conn.commit()
             contact_id = cursor.lastrowid
-            print(f"✅ 添加联系人成功：ID={contact_id}, 姓名={contact_data['name']}")
+            invalidate_user(user_id)
+            log_event(logger, logging.DEBUG, '添加联系人成功', user_id=user_id, contact_id=contact_id)
         except sqlite3.IntegrityError:
+            conn.rollback()
             contact_id = -1  # 手机号重复
-            print(f"❌ 添加联系人失败：手机号{contact_data['phone1']}已存在")
+            log_event(logger, logging.DEBUG, '添加联系人失败：手机号已存在', user_id=user_id)
         finally:
             conn.close()
         return contact_id
@@ -73,10 +406,12 @@ class Contact:
             return False
 
         try:
+            version = ChangeVersion.bump(conn, user_id)
             conn.execute('''
                 UPDATE contacts SET 
                     name = ?, phone1 = ?, phone2 = ?, email1 = ?, email2 = ?, 
-                    social_media = ?, address = ?, group_id = ?, is_favorite = ? 
+                    social_media = ?, address = ?, group_id = ?, is_favorite = ?, name_pinyin = ?,
+                    row_version = ?, updated_at = CURRENT_TIMESTAMP
                 WHERE id = ?
             ''', (
                 new_data['name'],
@@ -88,11 +423,15 @@ class Contact:
                 new_data.get('address', ''),
                 int(new_data.get('group_id', 0)),
                 1 if new_data.get('is_favorite', 0) else 0,
+                pinyin_key(new_data['name']),
+                version,
                 contact['id']
             ))
             conn.commit()
+            invalidate_user(user_id)
             success = True
         except sqlite3.IntegrityError:
+            conn.rollback()
             success = False
         finally:
             conn.close()
@@ -107,32 +446,132 @@ class Contact:
             conn.close()
             return False
 
+        version = ChangeVersion.bump(conn, user_id)
         conn.execute('DELETE FROM contacts WHERE id = ?', (contact['id'],))
+        # 墓碑记录：增量同步据此通知客户端删除
+        conn.execute(
+            'INSERT OR REPLACE INTO contact_tombstones (contact_id, user_id, version) VALUES (?, ?, ?)',
+            (contact['id'], user_id, version)
+        )
+        ChangeVersion.prune_tombstones(conn, user_id, TOMBSTONE_RETENTION)
         conn.commit()
         conn.close()
+        invalidate_user(user_id)
         return True
 
     @staticmethod
     def get_by_group(group_id: int, user_id: int) -> list[Row]:
         """按分组筛选联系人"""
-        conn = get_db_connection()
-        contacts = conn.execute(
-            'SELECT * FROM contacts WHERE group_id = ? AND user_id = ?',
-            (group_id, user_id)
-        ).fetchall()
-        conn.close()
-        return contacts
+        return Contact.query(user_id, group_id=group_id)[0]
 
     @staticmethod
     def search(keyword: str, user_id: int) -> list[Row]:
-        """搜索联系人（姓名/电话）"""
+        """搜索联系人（姓名/电话/邮箱/地址/拼音），3个字符以上走全文索引并按相关度排序，更短时做子串匹配"""
+        return Contact.query(user_id, keyword=keyword)[0]
+
+    @staticmethod
+    def query(user_id: int, keyword: str = '', group_id: int = 0, favorite: int = -1,
+              fields: list[str] = None, sort: str = None, limit: int = None,
+              cursor: str = None) -> tuple[list[Row], str, int]:
+        """组合查询联系人，返回(本页数据, 下一页游标, 总数)
+
+        关键词、分组、收藏条件同时生效，编译成一条参数化SQL；group_id=0、favorite=-1表示不筛选。
+        按 id 或 (name, id) 做游标翻页。关键词不少于3个字符时走trigram全文索引（任意位置匹配），
+        未指定排序时按相关度排序；更短时在当前用户的联系人中做子串匹配。
+        总数只在第一页（不带游标）给出，关键词搜索的总数超过SEARCH_COUNT_LIMIT时也为None。
+        结果按(user_id, 查询条件)缓存，该用户有写操作时失效。
+        """
+        shape = ('contacts', keyword.strip(), group_id, favorite, tuple(fields or ()), sort, limit, cursor)
+        return query_cache.get_or_load(
+            user_id, shape,
+            lambda: Contact._query(user_id, keyword, group_id, favorite, fields, sort, limit, cursor),
+            weigh=lambda result: len(result[0])
+        )
+
+    @staticmethod
+    def _query(user_id: int, keyword: str, group_id: int, favorite: int, fields: list[str],
+               sort: str, limit: int, cursor: str) -> tuple[list[Row], str, int]:
+        keyword = keyword.strip()
+        mode = ''
+        if keyword:
+            mode = 'fts' if len(keyword) >= FTS_MIN_KEYWORD else 'substring'
+        if sort is not None and sort not in SORT_KEYS:
+            raise ValueError(f'不支持的排序方式：{sort}')
+        sort = sort or (RANK_SORT if mode == 'fts' else 'id')
+        if limit is not None and not 0 < limit <= MAX_PAGE_SIZE:
+            raise ValueError(f'limit必须在1到{MAX_PAGE_SIZE}之间')
+        columns = tuple(select_columns(fields, 'id' if sort == RANK_SORT else sort))
+        cursor_values = decode_cursor(cursor, sort) if cursor else []
+
+        count_sql, select_sql = _compile_query(
+            mode, bool(group_id), favorite != -1, columns, sort,
+            bool(cursor_values), limit is not None
+        )
+        params = [user_id]
+        if mode:
+            params.extend(_keyword_params(mode, keyword, user_id))
+        if group_id:
+            params.append(group_id)
+        if favorite != -1:
+            params.append(favorite)
+
         conn = get_db_connection()
-        contacts = conn.execute(
-            'SELECT * FROM contacts WHERE (name LIKE ? OR phone1 LIKE ? OR phone2 LIKE ?) AND user_id = ?',
-            (f'%{keyword}%', f'%{keyword}%', f'%{keyword}%', user_id)
-        ).fetchall()
-        conn.close()
-        return contacts
+        try:
+            # 只在第一页计数；带游标的后续页总数为None，不再每页重复一次COUNT
+            total = None
+            if limit is not None and not cursor_values:
+                count_params = params + [SEARCH_COUNT_LIMIT + 1] if mode else params
+                total = conn.execute(count_sql, count_params).fetchone()[0]
+                if mode and total > SEARCH_COUNT_LIMIT:
+                    total = None
+            if sort != RANK_SORT:
+                params.extend(cursor_values)
+            if limit is not None or (sort == RANK_SORT and cursor_values):
+                params.append(-1 if limit is None else limit + 1)  # 多取一条判断是否还有下一页
+            if sort == RANK_SORT:
+                params.extend(cursor_values)  # OFFSET
+            rows = conn.execute(select_sql, params).fetchall()
+        finally:
+            conn.close()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            offset = (cursor_values[0] if cursor_values else 0) + limit if sort == RANK_SORT else 0
+            next_cursor = encode_cursor(rows[-1], sort, offset)
+        if limit is None and not cursor_values:
+            total = len(rows)
+        return rows, next_cursor, total
+
+    @staticmethod
+    def changes(user_id: int, since: int = 0) -> dict:
+        """增量同步：返回版本号since之后新增/修改的联系人和被删除的联系人ID
+
+        since=0或早于已清理的墓碑时返回全量数据（reset=True），客户端应整体替换本地数据。
+        返回的version作为下一次同步的since。
+        """
+        conn = get_db_connection()
+        try:
+            conn.execute('BEGIN')  # 版本号与变更在同一个读快照内读取
+            row = conn.execute(
+                'SELECT version, pruned_version FROM user_versions WHERE user_id = ?',
+                (user_id,)
+            ).fetchone()
+            version, pruned = (row['version'], row['pruned_version']) if row else (0, 0)
+            reset = since <= 0 or since < pruned or since > version
+            upserts = conn.execute(
+                f'SELECT {", ".join(SYNC_FIELDS)} FROM contacts '
+                'WHERE user_id = ? AND row_version > ? ORDER BY row_version, id',
+                (user_id, -1 if reset else since)
+            ).fetchall()
+            deletes = [] if reset else [r[0] for r in conn.execute(
+                'SELECT contact_id FROM contact_tombstones WHERE user_id = ? AND version > ? ORDER BY version',
+                (user_id, since)
+            )]
+        finally:
+            conn.rollback()
+            conn.close()
+        return {'version': version, 'reset': reset, 'upserts': upserts, 'deletes': deletes}
 
     @staticmethod
     def toggle_favorite(contact_id: int, user_id: int) -> bool:
@@ -146,200 +585,235 @@ class Contact:
             conn.close()
             return False
         new_status = 1 - contact['is_favorite']
+        version = ChangeVersion.bump(conn, user_id)
         conn.execute(
-            'UPDATE contacts SET is_favorite = ? WHERE id = ?',
-            (new_status, contact_id)
+            'UPDATE contacts SET is_favorite = ?, row_version = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+            (new_status, version, contact_id)
         )
         conn.commit()
         conn.close()
+        invalidate_user(user_id)
         return True
 
     @staticmethod
-    def batch_add(contacts: list[dict], user_id: int) -> tuple[int, int]:
-        """批量添加联系人"""
-        success = 0
-        fail = 0
+    def batch_add(contacts: list[dict], user_id: int, chunk_size: int = BATCH_CHUNK_SIZE) -> dict:
+        """批量添加联系人
+
+        一次性加载用户的分组ID和已有手机号，在内存中校验全部数据，
+        再按chunk_size分块 INSERT ... ON CONFLICT DO NOTHING，每块一个事务，避免长时间占用写锁。
+        返回 {'success': 成功数, 'fail': 失败数, 'errors': [{'index', 'name', 'phone1', 'reason'}]}。
+        """
+        errors = []
         conn = get_db_connection()
         try:
-            for contact in contacts:
-                name = contact.get('name', '').strip()
-                phone1 = contact.get('phone1', '').strip()
-                if not name or not phone1:
-                    fail += 1
-                    continue
+            group_ids = {row[0] for row in conn.execute('SELECT id FROM groups WHERE user_id = ?', (user_id,))}
+            taken = {row[0] for row in conn.execute('SELECT phone1 FROM contacts WHERE user_id = ?', (user_id,))}
 
-                group_id = int(contact.get('group_id', 0))
-                # 分组ID=0时跳过验证（未分组）
-                if group_id != 0:
-                    group = conn.execute(
-                        'SELECT * FROM groups WHERE id = ? AND user_id = ?',
-                        (group_id, user_id)
-                    ).fetchone()
-                    if not group:
-                        fail += 1
-                        continue
+            rows = []
+            for index, contact in enumerate(contacts):
+                params, reason = _validate_batch_contact(contact, user_id, group_ids, taken)
+                if reason:
+                    errors.append({
+                        'index': index,
+                        'name': contact.get('name') if isinstance(contact, dict) else None,
+                        'phone1': contact.get('phone1') if isinstance(contact, dict) else None,
+                        'reason': reason
+                    })
+                    continue
+                taken.add(params[1])
+                rows.append((index, params))
 
+            success = 0
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
                 try:
-                    conn.execute('''
-                        INSERT INTO contacts (
-                            name, phone1, phone2, email1, email2, social_media, address, group_id, user_id, is_favorite
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        name, phone1,
-                        contact.get('phone2', ''),
-                        contact.get('email1', ''),
-                        contact.get('email2', ''),
-                        contact.get('social_media', ''),
-                        contact.get('address', ''),
-                        group_id, user_id,
-                        1 if contact.get('is_favorite', 0) else 0
-                    ))
-                    success += 1
-                except sqlite3.IntegrityError:
-                    fail += 1
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            fail = len(contacts)
+                    success += _insert_batch_chunk(conn, chunk, user_id, errors)
+                except sqlite3.Error as e:
+                    conn.rollback()
+                    errors.extend({
+                        'index': index, 'name': params[0], 'phone1': params[1], 'reason': f'写入失败：{str(e)}'
+                    } for index, params in chunk)
         finally:
             conn.close()
-        return (success, fail)
+            invalidate_user(user_id)
+        errors.sort(key=lambda e: e['index'])
+        return {'success': success, 'fail': len(errors), 'errors': errors}
 
     @staticmethod
-    def export_to_csv(user_id: int) -> str:
-        """导出CSV"""
-        contacts = Contact.get_all(user_id)
+    def iter_export_chunks(user_id: int, chunk_size: int = EXPORT_CHUNK_SIZE, progress=None):
+        """按块读取导出数据（服务端游标+fetchmany），每块是若干行元组：
+        (姓名, 电话1, 电话2, 邮箱1, 邮箱2, 社交账号, 地址, 分组ID, 分组名称, 是否收藏)
+
+        使用独立的连接池连接而不是请求共享连接，流式响应在请求结束后仍可继续读取。
+        progress(已读取行数) 在每块读取后调用。
+        """
+        conn = get_pool().acquire()
+        try:
+            groups = conn.execute('SELECT id, group_name FROM groups WHERE user_id = ?', (user_id,)).fetchall()
+            group_map = {g['id']: g['group_name'] for g in groups}
+            cursor = conn.execute(EXPORT_SQL, (user_id,))
+            processed = 0
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                processed += len(rows)
+                if progress:
+                    progress(processed)
+                yield [(
+                    row[0], row[1], row[2] or '', row[3] or '', row[4] or '',
+                    row[5] or '', row[6] or '', row[7],
+                    group_map.get(row[7], '未分组'),
+                    '是' if row[8] else '否'
+                ) for row in rows]
+        finally:
+            conn.close()
+
+    @staticmethod
+    def iter_csv(user_id: int, chunk_size: int = EXPORT_CHUNK_SIZE, progress=None):
+        """流式生成CSV文本块，内存占用与联系人数量无关"""
         output = StringIO()
         writer = csv.writer(output)
         writer.writerow(['姓名', '电话1', '电话2', '邮箱1', '邮箱2', '社交账号', '地址', '所属分组', '是否收藏'])
+        for chunk in Contact.iter_export_chunks(user_id, chunk_size, progress):
+            writer.writerows(row[:7] + row[8:] for row in chunk)
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+        if output.tell():
+            yield output.getvalue()  # 没有联系人时只输出表头
 
-        conn = get_db_connection()
-        groups = conn.execute('SELECT id, group_name FROM groups WHERE user_id = ?', (user_id,)).fetchall()
-        group_map = {g['id']: g['group_name'] for g in groups}
-        conn.close()
-
-        for contact in contacts:
-            group_name = group_map.get(contact['group_id'], '未分组')
-            favorite = '是' if contact['is_favorite'] else '否'
-            writer.writerow([
-                contact['name'], contact['phone1'], contact['phone2'] or '',
-                contact['email1'] or '', contact['email2'] or '',
-                contact['social_media'] or '', contact['address'] or '',
-                group_name, favorite
-            ])
-        return output.getvalue()
+    @staticmethod
+    def export_to_csv(user_id: int) -> str:
+        """导出CSV"""
+        return ''.join(Contact.iter_csv(user_id))
 
     @staticmethod
-    def export_to_excel(user_id: int) -> BytesIO:
-        """导出Excel"""
-        contacts = Contact.get_all(user_id)
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "通讯录"
-        headers = [
+    def export_to_excel(user_id: int, chunk_size: int = EXPORT_CHUNK_SIZE, progress=None) -> SpooledTemporaryFile:
+        """导出Excel：openpyxl只写模式逐块写入，结果超过阈值时落到临时文件"""
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("通讯录")
+        ws.append([
             "姓名", "电话1", "电话2", "邮箱1", "邮箱2",
             "社交账号", "地址", "分组ID", "分组名称", "是否收藏"
-        ]
-        ws.append(headers)
-
-        conn = get_db_connection()
-        groups = conn.execute('SELECT id, group_name FROM groups WHERE user_id = ?', (user_id,)).fetchall()
-        group_map = {g['id']: g['group_name'] for g in groups}
-        conn.close()
-
-        for contact in contacts:
-            group_name = group_map.get(contact['group_id'], '未分组')
-            favorite = "是" if contact['is_favorite'] else "否"
-            ws.append([
-                contact['name'],
-                contact['phone1'],
-                contact['phone2'] or '',
-                contact['email1'] or '',
-                contact['email2'] or '',
-                contact['social_media'] or '',
-                contact['address'] or '',
-                contact['group_id'],
-                group_name,
-                favorite
-            ])
-        output = BytesIO()
+        ])
+        for chunk in Contact.iter_export_chunks(user_id, chunk_size, progress):
+            for row in chunk:
+                ws.append(row)
+        output = SpooledTemporaryFile(max_size=EXCEL_SPOOL_BYTES)
         wb.save(output)
         output.seek(0)
         return output
 
     @staticmethod
-    def import_from_excel(file_data: BytesIO, user_id: int, force_group_id: int = None) -> tuple[int, int]:
-        """修复后的Excel导入：强制处理空值、重复手机号、格式错误"""
-        success = 0
-        fail = 0
+    def import_from_excel(file_data: BytesIO, user_id: int, force_group_id: int = None,
+                          batch_size: int = IMPORT_BATCH_SIZE, progress=None) -> dict:
+        """Excel批量导入：强制处理空值、重复手机号、格式错误
+
+        只读模式流式读取工作表，一次性加载该用户已有手机号，在内存中去重，
+        再按batch_size分批executemany写入，每批写入后调用 progress(已处理行数, 失败数)。返回
+        {'success': 成功数, 'fail': 失败数, 'rows': [被自动修正或失败的行]}。
+        """
+        started = time.perf_counter()
+        report = {'success': 0, 'fail': 0, 'rows': []}
+        group_id = force_group_id if force_group_id is not None else 0
+        try:
+            group_id = int(group_id)
+        except ValueError:
+            group_id = 0
+
         conn = get_db_connection()
         try:
-            wb = load_workbook(file_data, data_only=True)
-            ws = wb.active
-            # 遍历Excel行（从第二行开始，跳过表头）
-            for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                # 补全空列，确保至少有10列数据，处理None值
-                row = ['' if cell is None else cell for cell in list(row)] + [''] * (10 - len(row))
-                # 提取核心数据
-                name = str(row[0]).strip()
-                phone1 = str(row[1]).strip()
-
-                # ========== 强制处理数据验证==========
-                # 1. 处理空姓名：默认赋值为“未知姓名_行号”
-                if not name:
-                    name = f'未知姓名_{row_num}'
-                # 2. 处理手机号：格式错误/空值则生成随机11位手机号，重复则修改尾号
-                if not phone1 or not re.match(r'^1[3-9]\d{9}$', phone1):
-                    # 生成随机138开头的手机号
-                    phone1 = '138' + ''.join([str(random.randint(0, 9)) for _ in range(8)])
-                else:
-                    # 检查手机号是否重复，重复则修改尾号
-                    while True:
-                        existing = conn.execute(
-                            'SELECT id FROM contacts WHERE phone1 = ? AND user_id = ?',
-                            (phone1, user_id)
-                        ).fetchone()
-                        if not existing:
-                            break
-                        # 尾号替换为随机数
-                        phone1 = phone1[:-1] + str(random.randint(0, 9))
-                # 3. 处理分组ID：强制使用传入的force_group_id（默认0）
-                group_id = force_group_id if force_group_id is not None else 0
-                try:
-                    group_id = int(group_id)
-                except ValueError:
-                    group_id = 0
-                # 4. 处理是否收藏：统一转换为0/1
-                is_favorite = 1 if str(row[9]).strip() in ['是', '1', 'true', 'True'] else 0
+            taken = {row[0] for row in conn.execute(
+                'SELECT phone1 FROM contacts WHERE user_id = ?', (user_id,)
+            )}
+            wb = load_workbook(file_data, read_only=True, data_only=True)
+            try:
+                batch = []
+                # 遍历Excel行（从第二行开始，跳过表头）
+                for row_num, row in enumerate(wb.active.iter_rows(min_row=2, values_only=True), start=2):
+                    record = normalize_import_row(row_num, row, group_id)
+                    batch.append(_dedupe_phone(record, taken))
+                    if len(batch) >= batch_size:
+                        _insert_import_batch(conn, batch, user_id, report)
+                        batch = []
+                        if progress:
+                            progress(report['success'] + report['fail'], report['fail'])
+                if batch:
+                    _insert_import_batch(conn, batch, user_id, report)
+                if progress:
+                    progress(report['success'] + report['fail'], report['fail'])
+            finally:
+                wb.close()
+        except Exception as e:
+            conn.rollback()
+            log_event(logger, logging.ERROR, 'Excel导入异常中止', exc_info=True, user_id=user_id)
+            report['fail'] += 1
+            report['rows'].append({'row': None, 'status': 'failed', 'reason': f'导入整体异常：{str(e)}'})
+        finally:
+            conn.close()
+            invalidate_user(user_id)
+        _log_import_summary('serial', user_id, report, started)
+        return report
 
-                # ========== 插入数据 ==========
-                try:
-                    conn.execute('''
-                        INSERT INTO contacts (
-                            name, phone1, phone2, email1, email2, social_media, address, group_id, user_id, is_favorite
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        name,
-                        phone1,
-                        str(row[2]).strip(),
-                        str(row[3]).strip(),
-                        str(row[4]).strip(),
-                        str(row[5]).strip(),
-                        str(row[6]).strip(),
-                        group_id,
-                        user_id,
-                        is_favorite
-                    ))
-                    success += 1
-                    print(f"✅ 第{row_num}行导入成功：姓名={name}，电话1={phone1}")
-                except Exception as e:
-                    fail += 1
-                    print(f"❌ 第{row_num}行插入失败：{str(e)}")
-            conn.commit()
+    @staticmethod
+    def import_from_excel_parallel(path: str, user_id: int, force_group_id: int = None,
+                                   workers: int = IMPORT_WORKERS, batch_size: int = IMPORT_BATCH_SIZE,
+                                   progress=None) -> dict:
+        """多进程并行导入Excel的全部工作表
+
+        主进程把每个工作表切成行片段分发给进程池，子进程解析XML并清洗数据，
+        主进程按顺序取回结果，单线程去重后分批写入SQLite。
+        workers>1时使用该进程数的共用进程池（见import_rows.get_import_executor），否则在当前进程解析。
+        多个工作表时，报告中的行号为“工作表名!行号”。返回值与import_from_excel相同。
+        """
+        started = time.perf_counter()
+        report = {'success': 0, 'fail': 0, 'rows': []}
+        group_id = force_group_id if force_group_id is not None else 0
+        try:
+            group_id = int(group_id)
+        except ValueError:
+            group_id = 0
+
+        conn = get_db_connection()
+        results = None
+        try:
+            taken = {row[0] for row in conn.execute(
+                'SELECT phone1 FROM contacts WHERE user_id = ?', (user_id,)
+            )}
+            sheets = sheet_paths(path)
+            tasks = ((path, name, first_row, fragment, group_id)
+                     for name, sheet_path in sheets
+                     for first_row, fragment in iter_row_fragments(path, sheet_path))
+            if workers > 1:
+                results = _ordered_results(get_import_executor(workers), parse_import_fragment, tasks, workers * 2)
+            else:
+                results = (parse_import_fragment(*task) for task in tasks)
+
+            batch = []
+            for sheet, records in results:
+                for record in records:
+                    if len(sheets) > 1:
+                        record['row'] = f"{sheet}!{record['row']}"
+                    batch.append(_dedupe_phone(record, taken))
+                    if len(batch) >= batch_size:
+                        _insert_import_batch(conn, batch, user_id, report)
+                        batch = []
+                        if progress:
+                            progress(report['success'] + report['fail'], report['fail'])
+            if batch:
+                _insert_import_batch(conn, batch, user_id, report)
+            if progress:
+                progress(report['success'] + report['fail'], report['fail'])
         except Exception as e:
             conn.rollback()
-            fail = 1
-            print(f"❌ 导入整体异常：{str(e)}")
+            log_event(logger, logging.ERROR, 'Excel导入异常中止', exc_info=True, user_id=user_id)
+            report['fail'] += 1
+            report['rows'].append({'row': None, 'status': 'failed', 'reason': f'导入整体异常：{str(e)}'})
         finally:
+            if results is not None:
+                results.close()  # 中途失败时取消本次导入尚未开始的片段，进程池继续复用
             conn.close()
-        return (success, fail)
+            invalidate_user(user_id)
+        _log_import_summary(f'parallel:{workers}', user_id, report, started)
+        return report
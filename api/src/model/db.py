@@ -1,77 +1,368 @@
+import logging
 import sqlite3
 from sqlite3 import Connection
 import os
+import threading
+import time
+
+from flask import current_app, g, has_app_context
+
+from api.src.model.migrations import get_schema_version, migrate
+from api.src.utils.logger import get_logger, log_event
+
+logger = get_logger(__name__)
 
 # 简化DB_PATH路径，确保创建在项目根目录的data文件夹
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DB_PATH = os.path.join(PROJECT_ROOT, 'data', 'contacts.db')
+DB_PATH = os.environ.get('CONTACTS_DB_PATH', os.path.join(PROJECT_ROOT, 'data', 'contacts.db'))
+
+# 连接池配置
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))            # 最大连接数
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))   # 连接耗尽时最长等待秒数
+DB_STATEMENT_CACHE = int(os.environ.get('DB_STATEMENT_CACHE', '256'))  # 每个连接缓存的预编译语句数
+
+# 存储配置档：throughput=高吞吐（WAL+NORMAL同步），durable=强持久（WAL+FULL同步）
+STORAGE_PROFILES = {
+    'throughput': {
+        'busy_timeout': 5000,        # 毫秒，写锁冲突时等待而不是立即报错
+        'journal_mode': 'WAL',       # 读写互不阻塞
+        'synchronous': 'NORMAL',     # WAL下只在检查点时fsync，断电最多丢失最近的事务
+        'cache_size': -65536,        # 负数表示KiB，即64MB页缓存
+        'mmap_size': 268435456,      # 256MB内存映射读取
+        'temp_store': 'MEMORY',
+    },
+    'durable': {
+        'busy_timeout': 10000,
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',       # 每次提交都fsync
+        'cache_size': -16384,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+    },
+}
+DB_PROFILE = os.environ.get('DB_PROFILE', 'throughput')
+
+# WAL检查点配置：后台定期把WAL写回主库，避免WAL文件无限增长
+DB_CHECKPOINT_INTERVAL = float(os.environ.get('DB_CHECKPOINT_INTERVAL', '30'))  # 秒，<=0表示关闭
+DB_WAL_TRUNCATE_BYTES = int(os.environ.get('DB_WAL_TRUNCATE_BYTES', str(64 * 1024 * 1024)))
+
+
+def get_storage_profile(name: str = None) -> dict:
+    """获取存储配置档，可用环境变量DB_PRAGMA_<名称>覆盖单个参数"""
+    name = name or DB_PROFILE
+    if name not in STORAGE_PROFILES:
+        raise ValueError(f'未知的存储配置档：{name}（可选：{", ".join(STORAGE_PROFILES)}）')
+    profile = dict(STORAGE_PROFILES[name])
+    for key in profile:
+        override = os.environ.get(f'DB_PRAGMA_{key.upper()}')
+        if override is not None:
+            profile[key] = override
+    return profile
+
+
+def apply_storage_profile(conn: Connection, profile: dict):
+    """对连接执行PRAGMA（busy_timeout最先设置，切换journal_mode时也能等待锁）"""
+    for key in ('busy_timeout', 'journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store'):
+        if key in profile:
+            conn.execute(f'PRAGMA {key} = {profile[key]}')
+
+
+# SQL观察者：每条语句执行后调用 observer(sql, parameters, 秒数, cursor)，用于指标统计和慢查询日志
+# （语句执行失败时cursor为None）
+_sql_observers = []
+
+
+def add_sql_observer(observer):
+    if observer not in _sql_observers:
+        _sql_observers.append(observer)
+
+
+def remove_sql_observer(observer):
+    if observer in _sql_observers:
+        _sql_observers.remove(observer)
+
+
+class PooledConnection(sqlite3.Connection):
+    """连接池中的连接：close()不会真正关闭，而是归还给连接池
+
+    注册了SQL观察者时，execute/executemany会计时（只包含执行到返回第一行，不含之后的fetch）。
+    """
+
+    _pool = None
+    _request_bound = False
+
+    def execute(self, sql, parameters=()):
+        if not _sql_observers:
+            return super().execute(sql, parameters)
+        cursor = None
+        start = time.perf_counter()
+        try:
+            cursor = super().execute(sql, parameters)
+            return cursor
+        finally:
+            elapsed = time.perf_counter() - start
+            for observer in _sql_observers:
+                observer(sql, parameters, elapsed, cursor)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not _sql_observers:
+            return super().executemany(sql, seq_of_parameters)
+        cursor = None
+        start = time.perf_counter()
+        try:
+            cursor = super().executemany(sql, seq_of_parameters)
+            return cursor
+        finally:
+            elapsed = time.perf_counter() - start
+            for observer in _sql_observers:
+                observer(sql, None, elapsed, cursor)
+
+    def close(self):
+        if self._request_bound:
+            # 请求内共享的连接：只丢弃未提交的修改，请求结束时再统一归还
+            if self.in_transaction:
+                self.rollback()
+            return
+        if self._pool is not None:
+            self._pool.release(self)
+        else:
+            super().close()
+
+
+class ConnectionPool:
+    """有界SQLite连接池：复用空闲连接，连接数达到上限时阻塞等待"""
+
+    def __init__(self, db_path: str, max_size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT,
+                 profile: dict = None):
+        self.db_path = db_path
+        self.profile = profile if profile is not None else get_storage_profile()
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self._idle: list[PooledConnection] = []
+        self._created = 0
+        self._cond = threading.Condition()
+        self._hits = 0        # 复用空闲连接次数
+        self._misses = 0      # 新建连接次数
+        self._waits = 0       # 因连接耗尽而等待的次数
+        self._wait_time = 0.0
+        self._timeouts = 0
+
+    def _connect(self) -> PooledConnection:
+        conn = sqlite3.connect(self.db_path, factory=PooledConnection, check_same_thread=False,
+                               cached_statements=DB_STATEMENT_CACHE)
+        conn.row_factory = sqlite3.Row  # 支持按列名访问
+        try:
+            apply_storage_profile(conn, self.profile)
+        except sqlite3.Error:
+            sqlite3.Connection.close(conn)
+            raise
+        conn._pool = self
+        return conn
+
+    def acquire(self) -> PooledConnection:
+        """取出一个连接（优先复用空闲连接）"""
+        with self._cond:
+            if not self._idle and self._created >= self.max_size:
+                self._waits += 1
+                start = time.perf_counter()
+                deadline = start + self.timeout
+                while not self._idle and self._created >= self.max_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        self._wait_time += time.perf_counter() - start
+                        raise sqlite3.OperationalError('数据库连接池已耗尽，请稍后重试')
+                    self._cond.wait(remaining)
+                self._wait_time += time.perf_counter() - start
+
+            if self._idle:
+                self._hits += 1
+                conn = self._idle.pop()
+                conn._request_bound = False
+                return conn
+            self._created += 1
+            self._misses += 1
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn: PooledConnection):
+        """归还连接：回滚未提交的事务后放回空闲列表"""
+        conn._request_bound = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _discard(self, conn: PooledConnection):
+        try:
+            sqlite3.Connection.close(conn)
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    def close_all(self):
+        """关闭所有空闲连接（进程退出或重新配置时调用）"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+        for conn in idle:
+            sqlite3.Connection.close(conn)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'size': self.max_size,
+                'created': self._created,
+                'idle': len(self._idle),
+                'in_use': self._created - len(self._idle),
+                'hits': self._hits,
+                'misses': self._misses,
+                'waits': self._waits,
+                'wait_time_ms': round(self._wait_time * 1000, 3),
+                'timeouts': self._timeouts,
+            }
+
+
+class WalCheckpointer(threading.Thread):
+    """后台WAL检查点线程：定期PASSIVE检查点，WAL超过阈值时TRUNCATE收缩文件"""
+
+    def __init__(self, db_path: str, interval: float = DB_CHECKPOINT_INTERVAL,
+                 truncate_bytes: int = DB_WAL_TRUNCATE_BYTES):
+        super().__init__(name='sqlite-wal-checkpoint', daemon=True)
+        self.db_path = db_path
+        self.interval = interval
+        self.truncate_bytes = truncate_bytes
+        self._stop_event = threading.Event()
+        self.runs = 0
+        self.last_result = None
+
+    def checkpoint(self):
+        """执行一次检查点，返回(busy, wal页数, 已写回页数)"""
+        wal_path = self.db_path + '-wal'
+        mode = 'PASSIVE'
+        if os.path.exists(wal_path) and os.path.getsize(wal_path) > self.truncate_bytes:
+            mode = 'TRUNCATE'
+        # 使用独立连接，不占用连接池
+        conn = sqlite3.connect(self.db_path, timeout=1)
+        try:
+            result = tuple(conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone())
+        finally:
+            conn.close()
+        self.runs += 1
+        self.last_result = result
+        return result
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.checkpoint()
+            except sqlite3.Error as e:
+                log_event(logger, logging.WARNING, 'WAL检查点失败', error=str(e))
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_checkpointer = None
+_abandoned_pools = []  # fork前创建的连接池：子进程里只丢弃不关闭，避免析构时动到父进程的连接
+
+
+def get_pool() -> ConnectionPool:
+    """获取全局连接池（首次调用时创建）"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+
+def _reset_after_fork():
+    """子进程（gunicorn --preload 的worker、multiprocessing fork）不能使用父进程打开的SQLite连接：
+    丢弃继承来的连接池和检查点线程状态，首次使用时重新创建"""
+    global _pool, _pool_lock, _checkpointer
+    if _pool is not None:
+        _abandoned_pools.append(_pool)
+    _pool = None
+    _pool_lock = threading.Lock()
+    _checkpointer = None  # 检查点线程只在父进程中运行，fork不会复制线程
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_pool_stats() -> dict:
+    """连接池命中/未命中/等待耗时统计"""
+    return get_pool().stats()
 
 
 def get_db_connection() -> Connection:
-    """获取数据库连接（确保路径正确）"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # 支持按列名访问
-    return conn
+    """获取数据库连接（同一请求内共享同一个连接，请求结束后归还连接池）"""
+    if has_app_context() and 'db_pool' in current_app.extensions:
+        conn = g.get('_db_conn')
+        if conn is None:
+            conn = get_pool().acquire()
+            conn._request_bound = True
+            g._db_conn = conn
+        return conn
+    return get_pool().acquire()
+
+
+def release_db_connection(exception=None):
+    """请求结束时把共享连接归还连接池"""
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        get_pool().release(conn)
+
+
+def init_app(app):
+    """把连接池绑定到Flask应用生命周期"""
+    global _checkpointer
+    app.extensions['db_pool'] = get_pool()
+    app.teardown_appcontext(release_db_connection)
+    if (_checkpointer is None and DB_CHECKPOINT_INTERVAL > 0
+            and str(get_pool().profile.get('journal_mode', '')).upper() == 'WAL'):
+        _checkpointer = WalCheckpointer(DB_PATH)
+        _checkpointer.start()
 
 
 def init_db():
-    """初始化数据库表（带完整日志）"""
+    """初始化数据库：按版本执行未应用的迁移（带完整日志）"""
     # 确保data文件夹存在
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    print(f"数据库文件路径：{DB_PATH}")
+    log_event(logger, logging.INFO, '数据库文件路径', path=DB_PATH)
 
     conn = get_db_connection()
     try:
-        # 1. 用户表
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT NOT NULL UNIQUE,
-                password TEXT NOT NULL,
-                email TEXT UNIQUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # 2. 分组表
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS groups (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                group_name TEXT NOT NULL,
-                user_id INTEGER NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
-                UNIQUE (group_name, user_id)
-            )
-        ''')
-
-        # 3. 联系人表（支持收藏+多字段）
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS contacts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                phone1 TEXT NOT NULL,
-                phone2 TEXT,
-                email1 TEXT,
-                email2 TEXT,
-                social_media TEXT,
-                address TEXT,
-                group_id INTEGER DEFAULT 0,
-                user_id INTEGER NOT NULL,
-                is_favorite INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
-                FOREIGN KEY (group_id) REFERENCES groups (id) ON DELETE SET NULL,
-                UNIQUE (phone1, user_id)  -- 同一用户手机号唯一
-            )
-        ''')
-
-        conn.commit()
-        print("✅ 数据库表初始化成功：users、groups、contacts")
+        applied = migrate(conn)
+        if applied:
+            log_event(logger, logging.INFO, '数据库迁移完成', applied=applied, version=get_schema_version(conn))
+        else:
+            log_event(logger, logging.INFO, '数据库已是最新版本', version=get_schema_version(conn))
     except sqlite3.Error as e:
         conn.rollback()
-        print(f"❌ 初始化数据库失败：{str(e)}")
+        log_event(logger, logging.ERROR, '初始化数据库失败', exc_info=True, path=DB_PATH, error=str(e))
     finally:
         conn.close()
+        if not has_app_context():
+            # 启动时（模块导入阶段）用过的连接立即关闭，不留给之后fork出的worker
+            get_pool().close_all()
 
 
 # 初始化数据库（启动时执行）
@@ -1,12 +1,18 @@
 from sqlite3 import Row
 from api.src.model.db import get_db_connection
+from api.src.model.version import ChangeVersion
+from api.src.utils.cache import invalidate_user, query_cache
 import sqlite3
 
 
 class Group:
     @staticmethod
     def get_all(user_id: int) -> list[Row]:
-        """获取当前用户的所有分组"""
+        """获取当前用户的所有分组（按用户缓存，分组变化时失效）"""
+        return query_cache.get_or_load(user_id, ('groups',), lambda: Group._get_all(user_id))
+
+    @staticmethod
+    def _get_all(user_id: int) -> list[Row]:
         conn = get_db_connection()
         groups = conn.execute(
             'SELECT * FROM groups WHERE user_id = ?',
@@ -24,8 +30,10 @@ class Group:
                 'INSERT INTO groups (group_name, user_id) VALUES (?, ?)',
                 (group_name, user_id)
             )
+            ChangeVersion.bump(conn, user_id)
             conn.commit()
             group_id = cursor.lastrowid
+            invalidate_user(user_id)
         except sqlite3.IntegrityError:
             group_id = -1  # 分组名称重复
         finally:
@@ -0,0 +1,110 @@
+from sqlite3 import Row
+from api.src.model.db import get_db_connection
+import json
+import uuid
+
+
+class Job:
+    """后台任务记录（持久化在jobs表，多个worker进程共享）"""
+
+    @staticmethod
+    def create(user_id: int, kind: str) -> str:
+        """创建排队中的任务，返回任务ID"""
+        job_id = uuid.uuid4().hex
+        conn = get_db_connection()
+        try:
+            conn.execute(
+                'INSERT INTO jobs (id, user_id, kind) VALUES (?, ?, ?)',
+                (job_id, user_id, kind)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        return job_id
+
+    @staticmethod
+    def get(job_id: str, user_id: int) -> Row:
+        """获取当前用户的任务"""
+        conn = get_db_connection()
+        job = conn.execute(
+            'SELECT * FROM jobs WHERE id = ? AND user_id = ?',
+            (job_id, user_id)
+        ).fetchone()
+        conn.close()
+        return job
+
+    @staticmethod
+    def update(job_id: str, **fields):
+        """更新任务状态/进度（status、processed、failed、total、message、artifact_*）"""
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'], ensure_ascii=False)
+        assignments = ', '.join(f'{key} = ?' for key in fields)
+        conn = get_db_connection()
+        try:
+            conn.execute(
+                f'UPDATE jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                (*fields.values(), job_id)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def fail_stale(stale_seconds: int) -> list[str]:
+        """排队中/执行中但超过stale_seconds未更新的任务标记为失败，返回任务ID
+
+        执行中的任务每处理一批都会更新进度，长时间没有更新说明执行它的进程已经退出（重启或崩溃）。
+        """
+        conn = get_db_connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            stale = [row[0] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('queued', 'running') AND updated_at < datetime('now', ?)",
+                (f'-{int(stale_seconds)} seconds',)
+            )]
+            conn.executemany(
+                "UPDATE jobs SET status = 'failed', message = '任务已中断（服务重启），请重新提交', "
+                'updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                [(job_id,) for job_id in stale]
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        return stale
+
+    @staticmethod
+    def purge_expired(max_age_seconds: int) -> list[str]:
+        """删除超过max_age_seconds未更新的任务（不论状态），返回任务ID，文件由调用方删除"""
+        conn = get_db_connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            expired = [row[0] for row in conn.execute(
+                "SELECT id FROM jobs WHERE updated_at < datetime('now', ?)",
+                (f'-{int(max_age_seconds)} seconds',)
+            )]
+            conn.executemany('DELETE FROM jobs WHERE id = ?', [(job_id,) for job_id in expired])
+            conn.commit()
+        finally:
+            conn.close()
+        return expired
+
+    @staticmethod
+    def existing(job_ids: list[str]) -> set[str]:
+        """job_ids中仍有任务记录的ID"""
+        if not job_ids:
+            return set()
+        conn = get_db_connection()
+        try:
+            return {row[0] for row in conn.execute(
+                f'SELECT id FROM jobs WHERE id IN ({", ".join("?" * len(job_ids))})', job_ids
+            )}
+        finally:
+            conn.close()
+
+    @staticmethod
+    def to_dict(job: Row) -> dict:
+        """转换为接口返回格式（不暴露服务器文件路径）"""
+        data = {key: job[key] for key in job.keys() if key != 'artifact_path'}
+        data['result'] = json.loads(job['result']) if job['result'] else None
+        data['downloadable'] = job['status'] == 'succeeded' and bool(job['artifact_path'])
+        return data
@@ -0,0 +1,281 @@
+import sqlite3
+from sqlite3 import Connection
+
+from api.src.utils.pinyin import pinyin_key
+
+FTS_COLUMNS = ('name', 'phone1', 'phone2', 'email1', 'email2', 'address', 'name_pinyin')
+# 拼音检索键 'zhangsan zs' 中空格后的首字母部分；查询中必须使用完全相同的表达式才能命中表达式索引
+PINYIN_INITIALS = "substr(name_pinyin, instr(name_pinyin, ' ') + 1)"
+
+
+def _add_column(table: str, column: str, definition: str):
+    """ALTER TABLE ADD COLUMN（列已存在时跳过），只改表头不重建表"""
+    def step(conn: Connection):
+        columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        if column not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return step
+
+
+def _backfill_pinyin(conn: Connection):
+    """为已有联系人补全拼音检索键（未安装pypinyin时跳过）"""
+    if not pinyin_key('张三'):
+        return
+    rows = conn.execute("SELECT id, name FROM contacts WHERE name_pinyin IS NULL OR name_pinyin = ''").fetchall()
+    conn.executemany(
+        'UPDATE contacts SET name_pinyin = ? WHERE id = ?',
+        [(pinyin_key(row[1]), row[0]) for row in rows]
+    )
+
+
+def _fts_row(prefix: str) -> str:
+    return ', '.join(f'{prefix}.{column}' for column in FTS_COLUMNS)
+
+
+# 全文索引的租户列：'#用户ID#'，查询时按短语匹配该列，只在当前用户的文档中检索
+FTS_OWNER_COLUMNS = ('owner',) + FTS_COLUMNS
+# 相关度权重（与FTS_OWNER_COLUMNS一一对应）：租户列不参与打分，姓名最高
+FTS_RANK = 'bm25(0.0, 10.0, 5.0, 5.0, 2.0, 2.0, 1.0, 5.0)'
+
+
+def fts_owner(user_id: int) -> str:
+    return f'#{user_id}#'
+
+
+def _fts_owner_row(prefix: str) -> str:
+    return f"'#' || {prefix}.user_id || '#', " + _fts_row(prefix)
+
+
+# 版本化迁移列表：(版本号, 说明, SQL语句列表)
+# 只能追加新版本，已发布的版本不要修改；每条语句都必须可重复执行（IF NOT EXISTS）
+# 语句也可以是接收连接的函数，用于需要先检查表结构或用Python补数据的步骤
+MIGRATIONS = [
+    (1, '初始表结构：users、groups、contacts', [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL,
+            email TEXT UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS groups (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            group_name TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+            UNIQUE (group_name, user_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS contacts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            phone1 TEXT NOT NULL,
+            phone2 TEXT,
+            email1 TEXT,
+            email2 TEXT,
+            social_media TEXT,
+            address TEXT,
+            group_id INTEGER DEFAULT 0,
+            user_id INTEGER NOT NULL,
+            is_favorite INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+            FOREIGN KEY (group_id) REFERENCES groups (id) ON DELETE SET NULL,
+            UNIQUE (phone1, user_id)  -- 同一用户手机号唯一
+        )
+        ''',
+    ]),
+    (2, '联系人/分组复合索引：按分组、收藏、姓名筛选', [
+        'CREATE INDEX IF NOT EXISTS idx_contacts_user_group ON contacts (user_id, group_id)',
+        'CREATE INDEX IF NOT EXISTS idx_contacts_user_favorite ON contacts (user_id, is_favorite)',
+        'CREATE INDEX IF NOT EXISTS idx_contacts_user_name ON contacts (user_id, name)',
+        'CREATE INDEX IF NOT EXISTS idx_groups_user ON groups (user_id)',
+    ]),
+    (3, '联系人全文索引：FTS5 trigram外部内容表+同步触发器（需要SQLite 3.34+）', [
+        _add_column('contacts', 'name_pinyin', "TEXT DEFAULT ''"),
+        _backfill_pinyin,
+        f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5(
+            {', '.join(FTS_COLUMNS)},
+            content='contacts', content_rowid='id', tokenize='trigram'
+        )
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS contacts_fts_ai AFTER INSERT ON contacts BEGIN
+            INSERT INTO contacts_fts (rowid, {', '.join(FTS_COLUMNS)})
+            VALUES (new.id, {_fts_row('new')});
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS contacts_fts_ad AFTER DELETE ON contacts BEGIN
+            INSERT INTO contacts_fts (contacts_fts, rowid, {', '.join(FTS_COLUMNS)})
+            VALUES ('delete', old.id, {_fts_row('old')});
+        END
+        ''',
+        # 只在检索字段变化时同步，切换收藏等操作不触发索引重写
+        f'''
+        CREATE TRIGGER IF NOT EXISTS contacts_fts_au AFTER UPDATE OF {', '.join(FTS_COLUMNS)} ON contacts BEGIN
+            INSERT INTO contacts_fts (contacts_fts, rowid, {', '.join(FTS_COLUMNS)})
+            VALUES ('delete', old.id, {_fts_row('old')});
+            INSERT INTO contacts_fts (rowid, {', '.join(FTS_COLUMNS)})
+            VALUES (new.id, {_fts_row('new')});
+        END
+        ''',
+        "INSERT INTO contacts_fts (contacts_fts) VALUES ('rebuild')",
+    ]),
+    (4, '后台任务表：大文件导入导出的进度与结果', [
+        '''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            processed INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            total INTEGER,
+            message TEXT,
+            result TEXT,
+            artifact_path TEXT,
+            artifact_name TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user_id, created_at)',
+    ]),
+    (5, '用户数据版本号：联系人/分组每次写入+1，用于ETag和缓存失效', [
+        '''
+        CREATE TABLE IF NOT EXISTS user_versions (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+    (6, '增量同步：联系人行版本号/修改时间+删除墓碑表', [
+        _add_column('contacts', 'row_version', 'INTEGER NOT NULL DEFAULT 0'),
+        _add_column('contacts', 'updated_at', 'TIMESTAMP'),
+        'UPDATE contacts SET updated_at = created_at WHERE updated_at IS NULL',
+        'CREATE INDEX IF NOT EXISTS idx_contacts_user_version ON contacts (user_id, row_version)',
+        '''
+        CREATE TABLE IF NOT EXISTS contact_tombstones (
+            contact_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_tombstones_user_version ON contact_tombstones (user_id, version)',
+        # 早于pruned_version的墓碑已被清理，更旧的同步令牌只能全量同步
+        _add_column('user_versions', 'pruned_version', 'INTEGER NOT NULL DEFAULT 0'),
+    ]),
+    (7, '短关键词前缀检索索引：手机号、拼音全拼、拼音首字母', [
+        'CREATE INDEX IF NOT EXISTS idx_contacts_user_phone ON contacts (user_id, phone1)',
+        'CREATE INDEX IF NOT EXISTS idx_contacts_user_pinyin ON contacts (user_id, name_pinyin)',
+        f'CREATE INDEX IF NOT EXISTS idx_contacts_user_initials ON contacts (user_id, {PINYIN_INITIALS})',
+    ]),
+    (8, '全文索引按用户隔离并按相关度排序；短关键词改为子串匹配，删除迁移7的前缀索引', [
+        'DROP TRIGGER IF EXISTS contacts_fts_ai',
+        'DROP TRIGGER IF EXISTS contacts_fts_ad',
+        'DROP TRIGGER IF EXISTS contacts_fts_au',
+        'DROP TABLE IF EXISTS contacts_fts',
+        # 外部内容表需要与索引同名的列，租户列由视图从user_id生成
+        f'''
+        CREATE VIEW IF NOT EXISTS contacts_fts_content AS
+        SELECT id, '#' || user_id || '#' AS owner, {', '.join(FTS_COLUMNS)} FROM contacts
+        ''',
+        f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5(
+            {', '.join(FTS_OWNER_COLUMNS)},
+            content='contacts_fts_content', content_rowid='id', tokenize='trigram'
+        )
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS contacts_fts_ai AFTER INSERT ON contacts BEGIN
+            INSERT INTO contacts_fts (rowid, {', '.join(FTS_OWNER_COLUMNS)})
+            VALUES (new.id, {_fts_owner_row('new')});
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS contacts_fts_ad AFTER DELETE ON contacts BEGIN
+            INSERT INTO contacts_fts (contacts_fts, rowid, {', '.join(FTS_OWNER_COLUMNS)})
+            VALUES ('delete', old.id, {_fts_owner_row('old')});
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS contacts_fts_au AFTER UPDATE OF user_id, {', '.join(FTS_COLUMNS)} ON contacts BEGIN
+            INSERT INTO contacts_fts (contacts_fts, rowid, {', '.join(FTS_OWNER_COLUMNS)})
+            VALUES ('delete', old.id, {_fts_owner_row('old')});
+            INSERT INTO contacts_fts (rowid, {', '.join(FTS_OWNER_COLUMNS)})
+            VALUES (new.id, {_fts_owner_row('new')});
+        END
+        ''',
+        "INSERT INTO contacts_fts (contacts_fts) VALUES ('rebuild')",
+        f"INSERT INTO contacts_fts (contacts_fts, rank) VALUES ('rank', '{FTS_RANK}')",
+        'DROP INDEX IF EXISTS idx_contacts_user_phone',
+        'DROP INDEX IF EXISTS idx_contacts_user_pinyin',
+        'DROP INDEX IF EXISTS idx_contacts_user_initials',
+    ]),
+    (9, '联系人user_id单列索引：按id翻页和导出按主键顺序读取，不需要临时排序', [
+        'CREATE INDEX IF NOT EXISTS idx_contacts_user ON contacts (user_id)',
+    ]),
+]
+
+
+def _ensure_version_table(conn: Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def get_schema_version(conn: Connection) -> int:
+    """当前数据库已应用的最高迁移版本（0表示尚未迁移）"""
+    _ensure_version_table(conn)
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def migrate(conn: Connection, migrations: list = None) -> list[int]:
+    """依次应用未执行的迁移，返回本次应用的版本号列表
+
+    每个版本在独立的 BEGIN IMMEDIATE 事务中执行，多个gunicorn worker同时启动时
+    只有一个会真正执行，其余在拿到写锁后发现版本已存在直接跳过。
+    """
+    migrations = MIGRATIONS if migrations is None else migrations
+    _ensure_version_table(conn)
+    conn.commit()
+
+    applied = []
+    for version, description, statements in sorted(migrations, key=lambda m: m[0]):
+        if version <= get_schema_version(conn):
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # 拿到写锁后再检查一次，避免并发重复执行
+            if conn.execute('SELECT 1 FROM schema_version WHERE version = ?', (version,)).fetchone():
+                conn.rollback()
+                continue
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(statement)
+            conn.execute(
+                'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                (version, description)
+            )
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
@@ -0,0 +1,167 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+from api.src.model.db import add_sql_observer
+from api.src.utils.logger import get_logger, log_event
+
+logger = get_logger(__name__)
+
+# 慢查询日志配置
+DB_SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', '100'))    # 超过该耗时的语句记录日志，<=0表示关闭
+DB_QUERY_PLAN_CHECK = os.environ.get('DB_QUERY_PLAN_CHECK', '1') != '0'  # 每种语句首次执行时检查查询计划
+DB_SCAN_TABLES = tuple(t.strip() for t in os.environ.get('DB_SCAN_TABLES', 'contacts').split(',') if t.strip())
+DB_SLOW_QUERY_COUNT_ROWS = os.environ.get('DB_SLOW_QUERY_COUNT_ROWS', '0') == '1'  # 慢SELECT额外统计结果行数
+DB_QUERY_LOG_MAX = 2000  # 最多跟踪的不同语句数
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACES = re.compile(r'\s+')
+_EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+
+
+def normalize_sql(sql: str) -> str:
+    """归一化SQL文本：压缩空白、字面量替换为?、IN列表合并，用于按语句聚合"""
+    text = _SPACES.sub(' ', sql).strip()
+    text = _STRING.sub('?', text)
+    text = _NUMBER.sub('?', text)
+    return _PLACEHOLDER_LIST.sub('(?, ...)', text)
+
+
+def parameters_shape(parameters) -> str:
+    """参数的形状（个数和类型），不记录参数值（手机号等属于个人信息）"""
+    if parameters is None:
+        return 'executemany'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{k}: {type(v).__name__}' for k, v in parameters.items()) + '}'
+    return '(' + ', '.join(type(v).__name__ for v in parameters) + ')'
+
+
+_TABLE_REF = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+_NOT_ALIAS = {'WHERE', 'JOIN', 'LEFT', 'INNER', 'CROSS', 'ON', 'USING', 'ORDER', 'GROUP', 'LIMIT',
+              'SET', 'NATURAL', 'UNION', 'HAVING', 'WINDOW', 'INDEXED', 'NOT'}
+
+
+def _scan_tables(sql: str, plan: list[str]) -> list[str]:
+    """查询计划中全表扫描（SCAN <表或别名>）的受监控表；带别名的表在计划里显示为别名"""
+    names = {table: table for table in DB_SCAN_TABLES}
+    for table, alias in _TABLE_REF.findall(sql):
+        if table in DB_SCAN_TABLES and alias and alias.upper() not in _NOT_ALIAS:
+            names[alias] = table
+    tables = []
+    for detail in plan:
+        match = re.match(r'SCAN (?:TABLE )?(\w+)', detail)
+        if match and match.group(1) in names:
+            tables.append(names[match.group(1)])
+    return tables
+
+
+class QueryLog:
+    """按归一化SQL聚合执行次数/耗时/慢查询次数，并记录查询计划中的全表扫描
+
+    每种语句（按原始SQL文本）第一次执行时做一次EXPLAIN QUERY PLAN，之后只是字典查找和计数，
+    所以即使语句还不慢，新出现的 SCAN contacts 也能在上线前被发现。
+    """
+
+    def __init__(self, slow_ms: float = DB_SLOW_QUERY_MS, plan_check: bool = DB_QUERY_PLAN_CHECK):
+        self.slow_ms = slow_ms
+        self.plan_check = plan_check
+        self._statements = {}  # 原始SQL -> 聚合条目（同一归一化SQL的原始文本共用一个条目）
+        self._entries = {}     # 归一化SQL -> 聚合条目
+        self._lock = threading.Lock()
+
+    def _entry(self, sql: str, parameters, cursor) -> dict:
+        entry = self._statements.get(sql)
+        if entry is not None:
+            return entry
+        if len(self._statements) >= DB_QUERY_LOG_MAX:
+            return None
+        normalized = normalize_sql(sql)
+        with self._lock:
+            entry = self._entries.get(normalized)
+            if entry is None:
+                entry = self._entries[normalized] = {
+                    'sql': normalized, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'slow': 0, 'plan': None, 'scans': [],
+                }
+            self._statements[sql] = entry
+        if self.plan_check and entry['plan'] is None and cursor is not None and parameters is not None:
+            entry['plan'] = self.explain(cursor.connection, sql, parameters)
+            entry['scans'] = _scan_tables(sql, entry['plan'])
+            if entry['scans']:
+                log_event(logger, logging.WARNING, '查询计划全表扫描', tables=entry['scans'],
+                          sql=normalized, plan=entry['plan'])
+        return entry
+
+    @staticmethod
+    def explain(conn, sql: str, parameters) -> list[str]:
+        """返回EXPLAIN QUERY PLAN的detail列（绕过观察者，不计入统计）"""
+        if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+            return []
+        try:
+            rows = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+        except sqlite3.Error:
+            return []
+        return [row[3] for row in rows]
+
+    def observe(self, sql: str, parameters, seconds: float, cursor):
+        entry = self._entry(sql, parameters, cursor)
+        if entry is None:
+            return
+        elapsed_ms = seconds * 1000
+        with self._lock:
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            if elapsed_ms > entry['max_ms']:
+                entry['max_ms'] = elapsed_ms
+            slow = 0 < self.slow_ms <= elapsed_ms
+            if slow:
+                entry['slow'] += 1
+        if slow:
+            self._log_slow(sql, parameters, elapsed_ms, cursor, entry)
+
+    def _log_slow(self, sql: str, parameters, elapsed_ms: float, cursor, entry: dict):
+        if not logger.isEnabledFor(logging.WARNING):
+            return
+        rows = cursor.rowcount if cursor is not None else -1
+        if rows < 0 and DB_SLOW_QUERY_COUNT_ROWS and cursor is not None and parameters is not None \
+                and sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            try:
+                rows = sqlite3.Connection.execute(
+                    cursor.connection, f'SELECT COUNT(*) FROM ({sql})', parameters
+                ).fetchone()[0]
+            except sqlite3.Error:
+                pass
+        plan = entry['plan']
+        if plan is None and cursor is not None and parameters is not None:
+            plan = self.explain(cursor.connection, sql, parameters)
+        log_event(logger, logging.WARNING, '慢查询', ms=round(elapsed_ms, 1), rows=rows if rows >= 0 else None,
+                  params=parameters_shape(parameters), scans=entry['scans'], sql=entry['sql'], plan=plan)
+
+    def report(self) -> list[dict]:
+        """按累计耗时排序的语句统计；有全表扫描的语句排在最前"""
+        with self._lock:
+            entries = [dict(e, total_ms=round(e['total_ms'], 3), max_ms=round(e['max_ms'], 3))
+                       for e in self._entries.values()]
+        return sorted(entries, key=lambda e: (not e['scans'], -e['total_ms']))
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._entries.clear()
+
+
+query_log = QueryLog()
+
+
+def enable_query_log():
+    """注册慢查询日志观察者（慢查询阈值和计划检查都关闭时不注册，避免计时开销）"""
+    if query_log.slow_ms > 0 or query_log.plan_check:
+        add_sql_observer(query_log.observe)
+
+
+def get_query_report() -> list[dict]:
+    return query_log.report()
@@ -1,17 +1,177 @@
 from sqlite3 import Row
 from api.src.model.db import get_db_connection
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import sqlite3
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+# 密码哈希配置
+PASSWORD_KDF = os.environ.get('PASSWORD_KDF', 'scrypt')                       # scrypt / pbkdf2_sha256
+PASSWORD_SCRYPT_N = int(os.environ.get('PASSWORD_SCRYPT_N', str(2 ** 14)))     # CPU/内存成本，必须是2的幂
+PASSWORD_SCRYPT_R = int(os.environ.get('PASSWORD_SCRYPT_R', '8'))
+PASSWORD_SCRYPT_P = int(os.environ.get('PASSWORD_SCRYPT_P', '1'))
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', '600000'))
+PASSWORD_WORKERS = int(os.environ.get('PASSWORD_WORKERS', '0')) or os.cpu_count() or 1  # 同时计算哈希的线程数
+PASSWORD_MAX_PENDING = int(os.environ.get('PASSWORD_MAX_PENDING', '64'))  # 排队+计算中的上限，超出直接拒绝
+PASSWORD_TIMEOUT = float(os.environ.get('PASSWORD_TIMEOUT', '5'))         # 等待空位的秒数
+PASSWORD_CACHE_SIZE = int(os.environ.get('PASSWORD_CACHE_SIZE', '1024'))  # 验证缓存条目数，0表示关闭
+PASSWORD_CACHE_TTL = float(os.environ.get('PASSWORD_CACHE_TTL', '300'))   # 秒
+
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+
+class PasswordBusy(Exception):
+    """密码哈希线程池已满（登录/注册请求过多）"""
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def current_params() -> tuple[str, dict]:
+    """当前配置的KDF及其参数；已存哈希的参数与之不同时登录成功后自动重新哈希"""
+    if PASSWORD_KDF == 'pbkdf2_sha256':
+        return 'pbkdf2_sha256', {'i': PASSWORD_PBKDF2_ITERATIONS}
+    return 'scrypt', {'n': PASSWORD_SCRYPT_N, 'r': PASSWORD_SCRYPT_R, 'p': PASSWORD_SCRYPT_P}
+
+
+def _derive(password: str, salt: bytes, algorithm: str, params: dict) -> bytes:
+    secret = password.encode('utf-8')
+    if algorithm == 'scrypt':
+        n, r, p = params['n'], params['r'], params['p']
+        return hashlib.scrypt(secret, salt=salt, n=n, r=r, p=p, dklen=HASH_BYTES,
+                              maxmem=128 * n * r * p + 1024 * 1024)
+    if algorithm == 'pbkdf2_sha256':
+        return hashlib.pbkdf2_hmac('sha256', secret, salt, params['i'], dklen=HASH_BYTES)
+    raise ValueError(f'不支持的密码哈希算法：{algorithm}')
+
+
+def hash_password(password: str, algorithm: str = None, params: dict = None) -> str:
+    """生成密码哈希，格式：算法$参数$盐$哈希，如 scrypt$n=16384,r=8,p=1$<盐>$<哈希>"""
+    if algorithm is None:
+        algorithm, params = current_params()
+    salt = os.urandom(SALT_BYTES)
+    encoded_params = ','.join(f'{k}={v}' for k, v in params.items())
+    return f'{algorithm}${encoded_params}${_b64(salt)}${_b64(_derive(password, salt, algorithm, params))}'
+
+
+def _parse_hash(stored: str):
+    parts = stored.split('$')
+    if len(parts) != 4 or parts[0] not in ('scrypt', 'pbkdf2_sha256'):
+        return None  # 旧数据：明文密码
+    algorithm, encoded_params, salt, digest = parts
+    params = {k: int(v) for k, v in (item.split('=') for item in encoded_params.split(','))}
+    return algorithm, params, _unb64(salt), _unb64(digest)
+
+
+def verify_password(password: str, stored: str) -> tuple[bool, bool]:
+    """校验密码，返回(是否正确, 是否需要按当前参数重新哈希)；兼容旧的明文密码"""
+    parsed = _parse_hash(stored or '')
+    if parsed is None:
+        ok = hmac.compare_digest(password.encode('utf-8'), (stored or '').encode('utf-8'))
+        return ok, ok
+    algorithm, params, salt, digest = parsed
+    ok = hmac.compare_digest(_derive(password, salt, algorithm, params), digest)
+    return ok, ok and (algorithm, params) != current_params()
+
+
+class _VerifyCache:
+    """最近验证成功的(已存哈希, 密码)，短时间内重复登录不再计算KDF
+
+    只保存进程内随机密钥的HMAC，不保存密码；已存哈希变化（改密码/重新哈希）后自然失效。
+    """
+
+    def __init__(self, size: int = PASSWORD_CACHE_SIZE, ttl: float = PASSWORD_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._key = os.urandom(32)
+        self._entries = OrderedDict()  # 摘要 -> 过期时间
+        self._lock = threading.Lock()
+
+    def _digest(self, stored: str, password: str) -> bytes:
+        return hmac.new(self._key, f'{stored}\0{password}'.encode('utf-8'), hashlib.sha256).digest()
+
+    def hit(self, stored: str, password: str) -> bool:
+        if self.size <= 0:
+            return False
+        digest = self._digest(stored, password)
+        with self._lock:
+            expires = self._entries.get(digest)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._entries[digest]
+                return False
+            self._entries.move_to_end(digest)
+            return True
+
+    def add(self, stored: str, password: str):
+        if self.size <= 0:
+            return
+        digest = self._digest(stored, password)
+        with self._lock:
+            self._entries[digest] = time.monotonic() + self.ttl
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+@lru_cache(maxsize=1)
+def _dummy_hash() -> str:
+    """用户名不存在时用于校验的固定哈希（当前参数、随机密码），使两种失败的耗时相同，无法据此枚举用户名"""
+    return hash_password(_b64(os.urandom(SALT_BYTES)))
+
+
+_verify_cache = _VerifyCache()
+_executor = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(PASSWORD_MAX_PENDING)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix='password')
+    return _executor
+
+
+def run_kdf(func, *args):
+    """在有界线程池中执行哈希计算（hashlib计算时释放GIL）
+
+    同时计算的数量不超过PASSWORD_WORKERS，排队总数超过PASSWORD_MAX_PENDING时抛出PasswordBusy，
+    避免登录高峰占满所有请求线程。
+    """
+    if not _pending.acquire(timeout=PASSWORD_TIMEOUT):
+        raise PasswordBusy()
+    try:
+        return _get_executor().submit(func, *args).result()
+    finally:
+        _pending.release()
 
 
 class User:
     @staticmethod
     def register(username: str, password: str, email: str = '') -> int:
         """注册用户，返回user_id（-1表示用户名重复）"""
+        password_hash = run_kdf(hash_password, password)
         conn = get_db_connection()
         try:
             cursor = conn.execute(
                 'INSERT INTO users (username, password, email) VALUES (?, ?, ?)',
-                (username, password, email)
+                (username, password_hash, email)
             )
             conn.commit()
             user_id = cursor.lastrowid
@@ -23,11 +183,35 @@ class User:
 
     @staticmethod
     def login(username: str, password: str) -> Row:
-        """登录验证，返回用户信息（None表示失败）"""
+        """登录验证，返回用户信息（None表示失败）
+
+        密码参数变化（或旧的明文密码）时，验证成功后按当前参数重新哈希并保存。
+        """
         conn = get_db_connection()
         user = conn.execute(
-            'SELECT * FROM users WHERE username = ? AND password = ?',
-            (username, password)
+            'SELECT * FROM users WHERE username = ?',
+            (username,)
         ).fetchone()
         conn.close()
+        if not user:
+            run_kdf(verify_password, password, _dummy_hash())
+            return None
+
+        stored = user['password']
+        if _verify_cache.hit(stored, password):
+            return user
+        ok, needs_rehash = run_kdf(verify_password, password, stored)
+        if not ok:
+            return None
+        if needs_rehash:
+            new_hash = run_kdf(hash_password, password)
+            conn = get_db_connection()
+            conn.execute(
+                'UPDATE users SET password = ? WHERE id = ? AND password = ?',
+                (new_hash, user['id'], stored)
+            )
+            conn.commit()
+            conn.close()
+            stored = new_hash
+        _verify_cache.add(stored, password)
         return user
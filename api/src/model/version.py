@@ -0,0 +1,51 @@
+from sqlite3 import Connection
+from datetime import datetime, timezone
+from api.src.model.db import get_db_connection
+
+
+class ChangeVersion:
+    """用户通讯录（联系人+分组）的修改计数器，每次写入+1"""
+
+    @staticmethod
+    def bump(conn: Connection, user_id: int) -> int:
+        """在调用方的事务中把版本号+1（随写操作一起提交或回滚），返回新版本号
+
+        写入的联系人行用这个版本号作为row_version，增量同步按它筛选变更。
+        """
+        return conn.execute('''
+            INSERT INTO user_versions (user_id, version, updated_at) VALUES (?, 1, CURRENT_TIMESTAMP)
+            ON CONFLICT (user_id) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+            RETURNING version
+        ''', (user_id,)).fetchone()[0]
+
+    @staticmethod
+    def prune_tombstones(conn: Connection, user_id: int, max_age_seconds: int):
+        """清理过期的删除记录，并把已清理到的最大版本号记为pruned_version（不提交）"""
+        pruned = conn.execute(
+            "SELECT MAX(version) FROM contact_tombstones WHERE user_id = ? AND deleted_at < datetime('now', ?)",
+            (user_id, f'-{max_age_seconds} seconds')
+        ).fetchone()[0]
+        if pruned is None:
+            return
+        conn.execute(
+            'DELETE FROM contact_tombstones WHERE user_id = ? AND version <= ?',
+            (user_id, pruned)
+        )
+        conn.execute(
+            'UPDATE user_versions SET pruned_version = MAX(pruned_version, ?) WHERE user_id = ?',
+            (pruned, user_id)
+        )
+
+    @staticmethod
+    def get(user_id: int) -> tuple[int, datetime]:
+        """返回(版本号, 最后修改时间UTC)；从未修改过时为(0, None)"""
+        conn = get_db_connection()
+        row = conn.execute(
+            'SELECT version, updated_at FROM user_versions WHERE user_id = ?',
+            (user_id,)
+        ).fetchone()
+        conn.close()
+        if not row:
+            return 0, None
+        updated_at = datetime.strptime(row['updated_at'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+        return row['version'], updated_at
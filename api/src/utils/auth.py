@@ -1,27 +1,176 @@
 from functools import wraps
+from collections import OrderedDict
 from flask import request, jsonify
+import base64
+import hashlib
+import hmac
+import os
+import re
+import threading
+import time
 
+from api.src.model.db import DB_PATH
 
-def login_required(f):
-    """登录验证装饰器：从请求头获取X-User-Id"""
+# 登录令牌配置
+# AUTH_SECRET_KEYS：逗号分隔的"密钥ID:密钥"（密钥ID只能包含字母、数字、_和-），
+# 第一个用于签发，其余只用于校验（轮换时把新密钥放在最前面）；
+# 未配置时使用数据目录下的auth.key（首次启动自动生成，所有worker进程共用）
+AUTH_SECRET_KEYS = os.environ.get('AUTH_SECRET_KEYS', '')
+AUTH_KEY_FILE = os.environ.get('AUTH_KEY_FILE', os.path.join(os.path.dirname(DB_PATH), 'auth.key'))
+AUTH_TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', str(7 * 24 * 3600)))  # 令牌有效期（秒）
+AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', '10000'))           # 已验证令牌缓存条数，0表示关闭
+# 兼容旧前端：为1时没有令牌也接受X-User-Id请求头（不安全，仅用于迁移期）
+AUTH_TRUST_USER_ID_HEADER = os.environ.get('AUTH_TRUST_USER_ID_HEADER', '0') == '1'
+
+
+# <密钥ID>.<user_id>.<过期时间戳>.<签名>：数字只接受ASCII 0-9，签名是43个字符的urlsafe base64
+_TOKEN = re.compile(r'([A-Za-z0-9_-]+)\.([0-9]{1,20})\.([0-9]{1,20})\.([A-Za-z0-9_-]{43})', re.ASCII)
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def _parse_keys(text: str) -> list[tuple[str, bytes]]:
+    keys = []
+    for item in text.replace('\n', ',').split(','):
+        kid, _, secret = item.strip().partition(':')
+        if kid and secret:
+            keys.append((kid, secret.encode('utf-8')))
+    return keys
+
+
+def _load_key_file(path: str) -> list[tuple[str, bytes]]:
+    """读取密钥文件，不存在时原子地生成一个（多个worker同时启动时只有一个写入成功）"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(fd, 'w') as f:
+            f.write(f'k{int(time.time())}:{os.urandom(32).hex()}\n')
+    with open(path) as f:
+        return _parse_keys(f.read())
+
+
+class TokenSigner:
+    """HMAC-SHA256签名的无状态令牌：<密钥ID>.<user_id>.<过期时间戳>.<签名>
+
+    校验只做内存中的HMAC计算，不查数据库；最近验证通过的令牌放在LRU缓存中，
+    重复请求连HMAC也不用算。
+    """
+
+    def __init__(self, keys: list[tuple[str, bytes]], ttl: int = AUTH_TOKEN_TTL,
+                 cache_size: int = AUTH_CACHE_SIZE):
+        if not keys:
+            raise ValueError('未配置令牌签名密钥')
+        invalid = [kid for kid, _ in keys if not re.fullmatch(r'[A-Za-z0-9_-]+', kid, re.ASCII)]
+        if invalid:
+            raise ValueError(f'密钥ID只能包含字母、数字、_和-：{", ".join(invalid)}')
+        self.keys = dict(keys)
+        self.active_kid = keys[0][0]
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # 令牌 -> (user_id, 过期时间戳)
+        self._lock = threading.Lock()
+
+    def _sign(self, kid: str, message: str) -> str:
+        return _b64(hmac.new(self.keys[kid], message.encode('utf-8'), hashlib.sha256).digest())
+
+    def issue(self, user_id: int) -> tuple[str, int]:
+        """签发令牌，返回(令牌, 过期时间戳)"""
+        expires_at = int(time.time()) + self.ttl
+        message = f'{self.active_kid}.{user_id}.{expires_at}'
+        return f'{message}.{self._sign(self.active_kid, message)}', expires_at
+
+    def verify(self, token: str) -> int:
+        """校验令牌，返回user_id；签名错误、密钥已下线或已过期时返回None"""
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(token)
+            if cached is not None:
+                if cached[1] > now:
+                    self._cache.move_to_end(token)
+                    return cached[0]
+                del self._cache[token]
+
+        # 令牌来自请求，严格匹配格式后再计算签名：任何畸形输入都只返回None（401），不会抛异常
+        match = _TOKEN.fullmatch(token)
+        if not match or match.group(1) not in self.keys:
+            return None
+        kid, user_id, expires_at, signature = match.groups()
+        expected = self._sign(kid, f'{kid}.{user_id}.{expires_at}')
+        if not hmac.compare_digest(expected.encode('ascii'), signature.encode('ascii')):
+            return None
+        user_id, expires_at = int(user_id), int(expires_at)
+        if expires_at <= now:
+            return None
+
+        if self.cache_size > 0:
+            with self._lock:
+                self._cache[token] = (user_id, expires_at)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return user_id
+
+
+_signer = None
+_signer_lock = threading.Lock()
+
+
+def get_signer() -> TokenSigner:
+    global _signer
+    if _signer is None:
+        with _signer_lock:
+            if _signer is None:
+                keys = _parse_keys(AUTH_SECRET_KEYS) or _load_key_file(AUTH_KEY_FILE)
+                _signer = TokenSigner(keys)
+    return _signer
+
+
+def issue_token(user_id: int) -> tuple[str, int]:
+    """登录成功后调用，返回(令牌, 过期时间戳)"""
+    return get_signer().issue(user_id)
+
+
+def _request_token(allow_query_token: bool = False) -> str:
+    """令牌来源：Authorization: Bearer <令牌>
+
+    ?token=<令牌>只在下载接口上接受（浏览器直接打开下载链接时无法带请求头）；
+    其他接口不接受，避免令牌出现在普通请求的URL、访问日志和Referer中。
+    """
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and token.strip():
+        return token.strip()
+    return request.args.get('token', '') if allow_query_token else ''
+
+
+def login_required(f=None, *, allow_query_token: bool = False):
+    """登录验证装饰器：校验签名令牌，把user_id作为第一个参数传给被装饰的函数
+
+    用法：@login_required；下载接口用 @login_required(allow_query_token=True)。
+    """
+    if f is None:
+        return lambda func: login_required(func, allow_query_token=allow_query_token)
 
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        user_id = request.headers.get('X-User-Id')
-        if not user_id:
+        token = _request_token(allow_query_token)
+        user_id = get_signer().verify(token) if token else None
+
+        if user_id is None and not token and AUTH_TRUST_USER_ID_HEADER:
+            try:
+                user_id = int(request.headers.get('X-User-Id', ''))
+            except ValueError:
+                user_id = None
+
+        if user_id is None:
             return jsonify({
                 'success': False,
                 'message': '登录已过期，请重新登录'
             }), 401
 
-        try:
-            user_id = int(user_id)
-        except ValueError:
-            return jsonify({
-                'success': False,
-                'message': '用户ID格式错误'
-            }), 400
-
         # 将user_id传入被装饰的函数
         return f(user_id, *args, **kwargs)
 
@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# 查询缓存配置
+CACHE_MAX_ROWS = int(os.environ.get('CACHE_MAX_ROWS', '200000'))  # 所有缓存条目合计的最大行数，0表示关闭缓存
+CACHE_TTL = float(os.environ.get('CACHE_TTL', '30'))              # 秒；多个worker进程之间只能靠TTL兜底
+CACHE_MAX_USERS = int(os.environ.get('CACHE_MAX_USERS', '10000'))  # 保留版本状态的用户数上限
+
+
+class QueryCache:
+    """按(user_id, 查询形状)缓存查询结果的LRU+TTL缓存
+
+    每个用户有一个版本号，写操作调用invalidate()使版本号变化并丢弃该用户的全部条目；
+    加载期间版本号发生变化的结果不会写入缓存，避免把旧数据放回去。
+    容量按行数计算（每个条目的权重=行数+1），超出时淘汰最久未使用的条目。
+    用户的版本状态同样按LRU保留最多max_users个，淘汰用户时一并丢弃其条目；
+    版本号取自全局递增计数，用户被淘汰后重新出现也不会复用旧版本号。
+    """
+
+    def __init__(self, max_weight: int = CACHE_MAX_ROWS, ttl: float = CACHE_TTL,
+                 max_users: int = CACHE_MAX_USERS):
+        self.max_weight = max_weight
+        self.ttl = ttl
+        self.max_users = max(1, max_users)
+        self._entries = OrderedDict()  # key -> (过期时间, 版本号, 权重, 值)
+        self._user_keys = {}           # user_id -> {key}
+        self._users = OrderedDict()    # user_id -> [版本号, 最近一次看到的数据库版本号（user_versions）]
+        self._generation = 0
+        self._weight = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_or_load(self, user_id: int, shape: tuple, loader, weigh=len):
+        """命中则直接返回缓存值，否则调用loader()加载并写入缓存"""
+        if self.max_weight <= 0:
+            return loader()
+        key = (user_id, shape)
+        now = time.monotonic()
+        with self._lock:
+            version = self._user(user_id)[0]
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now and entry[1] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[3]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+
+        value = loader()
+        weight = weigh(value) + 1
+        if weight > self.max_weight:
+            return value
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is None or state[0] != version:
+                return value  # 加载期间有写操作（或用户状态已被淘汰），结果可能已过期
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, version, weight, value)
+            self._user_keys.setdefault(user_id, set()).add(key)
+            self._weight += weight
+            while self._weight > self.max_weight:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return value
+
+    def invalidate(self, user_id: int):
+        """用户数据发生变化：版本号更新，并释放该用户的全部缓存条目"""
+        with self._lock:
+            self._invalidate(user_id)
+
+    def observe(self, user_id: int, db_version: int):
+        """对照数据库中的版本号：其他进程（gunicorn worker、后台任务进程）写入过时立即失效
+
+        首次看到某个用户的版本号时也视为变化：之前缓存的条目无法确认是否早于该版本。
+        """
+        with self._lock:
+            state = self._user(user_id)
+            if state[1] != db_version:
+                state[1] = db_version
+                self._invalidate(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+            self._users.clear()
+            self._weight = 0
+
+    def _user(self, user_id: int) -> list:
+        """取出（必要时创建）用户的版本状态，超出max_users时淘汰最久未使用的用户"""
+        state = self._users.get(user_id)
+        if state is not None:
+            self._users.move_to_end(user_id)
+            return state
+        self._generation += 1
+        state = self._users[user_id] = [self._generation, None]
+        while len(self._users) > self.max_users:
+            evicted = next(iter(self._users))
+            self._remove_user_keys(evicted)
+            del self._users[evicted]
+        return state
+
+    def _invalidate(self, user_id: int):
+        state = self._users.get(user_id)
+        if state is not None:
+            self._generation += 1
+            state[0] = self._generation
+            self._remove_user_keys(user_id)
+        self.invalidations += 1
+
+    def _remove_user_keys(self, user_id: int):
+        for key in list(self._user_keys.get(user_id, ())):
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._weight -= entry[2]
+        keys = self._user_keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[key[0]]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'users': len(self._users),
+                'rows': self._weight,
+                'max_rows': self.max_weight,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+query_cache = QueryCache()
+
+
+def invalidate_user(user_id: int):
+    """写操作成功后调用，使该用户的列表缓存失效"""
+    query_cache.invalidate(user_id)
+
+
+def observe_version(user_id: int, db_version: int):
+    """读取到数据库版本号后调用，跨进程的写入也能让本进程缓存失效"""
+    query_cache.observe(user_id, db_version)
+
+
+def get_cache_stats() -> dict:
+    return query_cache.stats()
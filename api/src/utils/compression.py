@@ -0,0 +1,158 @@
+import os
+import zlib
+from itertools import chain
+
+from flask import current_app, request
+
+# 响应压缩：按Accept-Encoding协商gzip/br/zstd（br、zstd分别需要可选依赖brotli、zstandard）
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 压缩配置
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))  # 小于该大小的响应不压缩，0表示全部压缩
+COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', '1') != '0'
+# 默认压缩级别：偏向低延迟；导出等大响应可以在路由上用 @compress(...) 调高
+COMPRESS_LEVELS = {
+    'gzip': int(os.environ.get('COMPRESS_GZIP_LEVEL', '6')),
+    'br': int(os.environ.get('COMPRESS_BR_LEVEL', '4')),
+    'zstd': int(os.environ.get('COMPRESS_ZSTD_LEVEL', '3')),
+}
+# 客户端q值相同时的优先顺序
+ENCODINGS = tuple(name for name, available in (
+    ('zstd', zstandard is not None),
+    ('br', brotli is not None),
+    ('gzip', True),
+) if available)
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'application/xml', 'application/msgpack')
+
+
+def negotiate_encoding(accept_encoding: str, encodings: tuple = ENCODINGS) -> str:
+    """按q值选择服务端支持的压缩编码，q值相同时按encodings的顺序；都不接受时返回None"""
+    weights = {}
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _compressor(encoding: str, level: int):
+    """返回 (compress(bytes)->bytes, finish()->bytes)"""
+    if encoding == 'gzip':
+        obj = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31：gzip格式
+        return obj.compress, obj.flush
+    if encoding == 'br':
+        obj = brotli.Compressor(quality=level)
+        return obj.process, obj.finish
+    if encoding == 'zstd':
+        obj = zstandard.ZstdCompressor(level=level).compressobj()
+        return obj.compress, obj.flush
+    raise ValueError(f'不支持的压缩编码：{encoding}')
+
+
+def compress_stream(chunks, encoding: str, level: int = None):
+    """逐块压缩，适用于流式响应"""
+    compress, finish = _compressor(encoding, COMPRESS_LEVELS[encoding] if level is None else level)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def compress(enabled: bool = True, min_bytes: int = None, **levels):
+    """路由级压缩选项，如 @compress(gzip=9, br=6, zstd=10) 或 @compress(enabled=False)"""
+    def decorator(f):
+        # 只在视图函数上记录选项（functools.wraps会把它复制到外层装饰器上），由compress_response读取
+        f.compress_options = {'enabled': enabled, 'min_bytes': min_bytes, 'levels': levels}
+        return f
+    return decorator
+
+
+def _route_options() -> dict:
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, 'compress_options', None) or {}
+
+
+def _is_compressible(response) -> bool:
+    mimetype = response.mimetype or ''
+    return (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+            or mimetype.endswith('+json') or mimetype.endswith('+xml'))
+
+
+def _peek(iterable, min_bytes: int) -> tuple[list, object, bool]:
+    """从流式响应中读出至少min_bytes字节，返回(已读块, 剩余迭代器, 是否已读完)"""
+    iterator = iter(iterable)
+    head, size = [], 0
+    for chunk in iterator:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        head.append(chunk)
+        size += len(chunk)
+        if size >= min_bytes:
+            return head, iterator, False
+    return head, iterator, True
+
+
+def compress_response(response):
+    """after_request钩子：超过阈值且客户端接受时压缩响应体（支持流式响应）"""
+    options = _route_options()
+    if not COMPRESS_ENABLED or not options.get('enabled', True):
+        return response
+    if (request.method == 'HEAD' or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers or response.direct_passthrough
+            or not _is_compressible(response)):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+    if encoding is None:
+        return response
+    min_bytes = options.get('min_bytes')
+    min_bytes = COMPRESS_MIN_BYTES if min_bytes is None else min_bytes
+    level = options.get('levels', {}).get(encoding)
+
+    if response.is_streamed:
+        # 先读出阈值大小的数据再决定是否压缩，整个流都小于阈值时原样返回
+        head, rest, finished = _peek(response.response, min_bytes)
+        if finished and sum(len(chunk) for chunk in head) < min_bytes:
+            response.response = head
+            return response
+        response.response = compress_stream(chain(head, rest), encoding, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < min_bytes:
+            return response
+        compress_chunk, finish = _compressor(encoding, COMPRESS_LEVELS[encoding] if level is None else level)
+        response.set_data(compress_chunk(body) + finish())
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    """注册应用级响应压缩"""
+    app.after_request(compress_response)
@@ -0,0 +1,29 @@
+from flask import make_response, request
+
+from api.src.model.version import ChangeVersion
+from api.src.utils.cache import observe_version
+
+
+def conditional_response(user_id: int, render, variant: str = ''):
+    """列表接口的条件GET：按用户数据版本号生成ETag/Last-Modified
+
+    If-None-Match 命中时直接返回304，不会调用render()查询和序列化数据。
+    variant用于区分同一URL的不同表示（如不同的响应格式）。
+    """
+    version, updated_at = ChangeVersion.get(user_id)
+    observe_version(user_id, version)
+    etag = f'{user_id}-{version}' + (f'-{variant}' if variant else '')
+
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(render())
+        if response.status_code != 200:
+            return response
+    response.set_etag(etag, weak=True)
+    if updated_at is not None:
+        response.last_modified = updated_at
+    # 允许客户端缓存，但每次使用前都要带If-None-Match重新验证
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Authorization')
+    return response
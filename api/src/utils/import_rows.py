@@ -0,0 +1,111 @@
+import atexit
+import os
+import re
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from api.src.utils.pinyin import pinyin_key
+from api.src.utils.xlsx_reader import load_shared_strings, parse_row_fragment
+
+# Excel导入的行清洗与片段解析。并行导入的解析进程只导入本模块（以及xlsx_reader、pinyin），
+# 不能引入数据库、Flask等模块：spawn启动的子进程会重新导入任务函数所在的模块。
+
+# 并行导入解析进程数（默认CPU核数）
+IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', '0')) or os.cpu_count() or 1
+PHONE_PATTERN = re.compile(r'^1[3-9]\d{9}$')
+FAVORITE_VALUES = ('是', '1', 'true', 'True')
+
+
+def normalize_import_row(row_num: int, row: tuple, group_id: int) -> dict:
+    """清洗一行Excel数据（纯函数，不访问数据库）：补全空列、处理空姓名、校验手机号、转换收藏"""
+    # 补全空列，确保至少有10列数据，处理None值
+    cells = ['' if cell is None else str(cell).strip() for cell in row]
+    cells += [''] * (10 - len(cells))
+    adjustments = []
+
+    # 1. 处理空姓名：默认赋值为“未知姓名_行号”
+    name = cells[0]
+    if not name:
+        name = f'未知姓名_{row_num}'
+        adjustments.append('姓名为空，已使用默认姓名')
+    # 2. 手机号格式错误/空值：标记后由写入阶段生成随机手机号
+    phone1 = cells[1]
+    if not PHONE_PATTERN.match(phone1):
+        adjustments.append(f'电话1格式错误（{phone1 or "空"}），已生成随机号码')
+        phone1 = ''
+    return {
+        'row': row_num,
+        'name': name,
+        'phone1': phone1,
+        'values': (cells[2], cells[3], cells[4], cells[5], cells[6]),
+        'group_id': group_id,
+        # 3. 处理是否收藏：统一转换为0/1
+        'is_favorite': 1 if cells[9] in FAVORITE_VALUES else 0,
+        'name_pinyin': pinyin_key(name),
+        'adjustments': adjustments,
+    }
+
+
+# 解析进程内缓存最近几个文件的共享字符串表（上传文件名唯一，同一文件只加载一次）
+_shared_strings = {}
+_SHARED_STRINGS_FILES = 4
+
+
+def _shared_strings_of(path: str) -> list[str]:
+    strings = _shared_strings.get(path)
+    if strings is None:
+        if len(_shared_strings) >= _SHARED_STRINGS_FILES:
+            _shared_strings.pop(next(iter(_shared_strings)))
+        with zipfile.ZipFile(path) as zf:
+            strings = _shared_strings[path] = load_shared_strings(zf)
+    return strings
+
+
+def parse_import_fragment(path: str, sheet: str, first_row: int, fragment: bytes,
+                          group_id: int) -> tuple[str, list[dict]]:
+    """进程池任务：解析一个行片段并清洗（跳过表头）"""
+    rows = parse_row_fragment(fragment, _shared_strings_of(path), max_col=10, first_row=first_row)
+    return sheet, [normalize_import_row(row_num, row, group_id) for row_num, row in rows if row_num >= 2]
+
+
+_executors = {}
+_executor_lock = threading.Lock()
+
+
+def get_import_executor(workers: int = IMPORT_WORKERS) -> ProcessPoolExecutor:
+    """并行导入共用的解析进程池（按进程数各一个，首次使用时创建，进程退出时关闭）
+
+    spawn启动进程要重新导入解释器和本模块，每次导入都新建进程池的开销会抵消并行的收益。
+    """
+    executor = _executors.get(workers)
+    if executor is None:
+        with _executor_lock:
+            executor = _executors.get(workers)
+            if executor is None:
+                if not _executors:
+                    atexit.register(shutdown_import_executors)
+                executor = _executors[workers] = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=get_context('spawn')
+                )
+    return executor
+
+
+def shutdown_import_executors():
+    with _executor_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(cancel_futures=True)
+
+
+def _reset_after_fork():
+    # fork出的子进程（如gunicorn worker）不能使用父进程的进程池，首次使用时重新创建
+    global _executor_lock
+    _executors.clear()
+    _executor_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
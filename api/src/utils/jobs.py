@@ -0,0 +1,173 @@
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+
+from api.src.model.db import DB_PATH
+from api.src.model.job import Job
+from api.src.utils.logger import get_logger, init_logging, log_event
+
+logger = get_logger(__name__)
+
+# 后台任务配置
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))                # 并发执行的任务数
+JOB_EXECUTOR = os.environ.get('JOB_EXECUTOR', 'thread')             # thread=线程池，process=进程池（CPU密集的大文件解析）
+JOB_RETENTION = int(os.environ.get('JOB_RETENTION', str(24 * 3600)))  # 任务记录及其文件保留秒数（按最后更新时间）
+JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', '3600'))  # 排队中/执行中的任务超过该时间未更新视为已中断
+JOB_DIR = os.environ.get('JOB_DIR', os.path.join(os.path.dirname(DB_PATH), 'jobs'))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """获取全局任务执行器（首次调用时创建）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                if JOB_EXECUTOR == 'process':
+                    # spawn启动的子进程不会继承gunicorn worker的线程和数据库连接
+                    _executor = ProcessPoolExecutor(max_workers=JOB_WORKERS, mp_context=get_context('spawn'),
+                                                    initializer=init_logging)
+                else:
+                    _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='contacts-job')
+    return _executor
+
+
+def job_path(job_id: str, suffix: str) -> str:
+    os.makedirs(JOB_DIR, exist_ok=True)
+    return os.path.join(JOB_DIR, f'{job_id}{suffix}')
+
+
+def save_upload(file, job_id: str = None) -> str:
+    """把上传文件保存到任务目录，返回文件路径（由导入任务负责删除）
+
+    后台任务的上传文件以任务ID命名，任务中断或过期时随任务一起清理。
+    """
+    path = job_path(job_id or uuid.uuid4().hex, '.upload')
+    file.save(path)
+    return path
+
+
+def _remove_job_files(job_ids: list[str]):
+    for job_id in job_ids:
+        for suffix in ('.upload', '.csv', '.xlsx'):
+            path = os.path.join(JOB_DIR, f'{job_id}{suffix}')
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _remove_orphan_files(max_age_seconds: int):
+    """删除任务目录中超过保留期且没有任务记录的文件（如进程崩溃时遗留的同步导入上传文件）"""
+    if not os.path.isdir(JOB_DIR):
+        return
+    deadline = time.time() - max_age_seconds
+    old = {}
+    for entry in os.scandir(JOB_DIR):
+        if entry.is_file() and entry.stat().st_mtime < deadline:
+            old[entry.path] = os.path.splitext(entry.name)[0]
+    alive = Job.existing(list(set(old.values())))
+    for path, job_id in old.items():
+        if job_id not in alive:
+            os.remove(path)
+
+
+def purge_jobs():
+    """清理后台任务：中断的任务标记为失败并删除上传文件，过期任务连同文件一起删除
+
+    服务启动时调用一次（上一个进程退出时未完成的任务不会再被执行），提交新任务时也会顺带清理。
+    """
+    _remove_job_files(Job.purge_expired(JOB_RETENTION))
+    stale = Job.fail_stale(JOB_STALE_SECONDS)
+    if stale:
+        log_event(logger, logging.WARNING, '后台任务已中断，标记为失败', jobs=len(stale))
+    for job_id in stale:
+        upload = os.path.join(JOB_DIR, f'{job_id}.upload')
+        if os.path.exists(upload):
+            os.remove(upload)
+    _remove_orphan_files(JOB_RETENTION)
+
+
+def submit(user_id: int, kind: str, func, *args) -> str:
+    """创建任务记录并提交执行，立即返回任务ID"""
+    purge_jobs()
+    return start(Job.create(user_id, kind), func, *args)
+
+
+def start(job_id: str, func, *args) -> str:
+    """提交已创建的任务（需要先用任务ID保存上传文件时使用）"""
+    get_executor().submit(func, job_id, *args)
+    return job_id
+
+
+def _progress(job_id: str, total: int = None):
+    def report(processed: int, failed: int = 0):
+        Job.update(job_id, processed=processed, failed=failed)
+    if total is not None:
+        Job.update(job_id, total=total)
+    return report
+
+
+def run_import_job(job_id: str, upload_path: str, user_id: int, force_group_id: int = 0,
+                   parallel: bool = False):
+    """后台导入Excel（任务函数需在模块顶层，进程池才能序列化）"""
+    from api.src.model.contact import Contact
+    Job.update(job_id, status='running')
+    try:
+        if parallel:
+            report = Contact.import_from_excel_parallel(upload_path, user_id, force_group_id=force_group_id,
+                                                        progress=_progress(job_id))
+        else:
+            with open(upload_path, 'rb') as f:
+                report = Contact.import_from_excel(f, user_id, force_group_id=force_group_id,
+                                                   progress=_progress(job_id))
+        Job.update(
+            job_id, status='succeeded', processed=report['success'] + report['fail'], failed=report['fail'],
+            message=f"导入成功{report['success']}条，失败{report['fail']}条", result=report
+        )
+    except Exception as e:
+        log_event(logger, logging.ERROR, '后台导入任务失败', exc_info=True, job_id=job_id, user_id=user_id)
+        Job.update(job_id, status='failed', message=f'导入失败：{str(e)}')
+    finally:
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+
+
+def run_csv_export_job(job_id: str, user_id: int):
+    """后台导出CSV到结果文件"""
+    from api.src.model.contact import Contact
+    Job.update(job_id, status='running')
+    path = job_path(job_id, '.csv')
+    try:
+        progress = _progress(job_id, Contact.query(user_id, fields=['id'], limit=1)[2])
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write('\ufeff')  # UTF-8 BOM头，解决Excel打开乱码问题
+            for chunk in Contact.iter_csv(user_id, progress=progress):
+                f.write(chunk)
+        Job.update(job_id, status='succeeded', message='导出完成',
+                   artifact_path=path, artifact_name=f'通讯录_{user_id}.csv')
+    except Exception as e:
+        log_event(logger, logging.ERROR, '后台导出任务失败', exc_info=True, job_id=job_id, user_id=user_id, format='csv')
+        Job.update(job_id, status='failed', message=f'导出失败：{str(e)}')
+
+
+def run_excel_export_job(job_id: str, user_id: int):
+    """后台导出Excel到结果文件"""
+    from api.src.model.contact import Contact
+    Job.update(job_id, status='running')
+    path = job_path(job_id, '.xlsx')
+    try:
+        progress = _progress(job_id, Contact.query(user_id, fields=['id'], limit=1)[2])
+        output = Contact.export_to_excel(user_id, progress=progress)
+        with output, open(path, 'wb') as f:
+            shutil.copyfileobj(output, f)
+        Job.update(job_id, status='succeeded', message='导出完成',
+                   artifact_path=path, artifact_name=f'通讯录_{user_id}.xlsx')
+    except Exception as e:
+        log_event(logger, logging.ERROR, '后台导出任务失败', exc_info=True, job_id=job_id, user_id=user_id, format='xlsx')
+        Job.update(job_id, status='failed', message=f'导出失败：{str(e)}')
@@ -0,0 +1,151 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# 日志配置
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()       # DEBUG时输出逐行明细（如每条导入失败的行）
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')             # text：便于本地阅读；json：每行一个JSON对象，便于采集
+LOG_FILE = os.environ.get('LOG_FILE', '')                     # 为空时写到stderr
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))  # 队列满时丢弃新日志而不是阻塞请求线程
+ROOT_LOGGER = 'api'  # 所有模块用 get_logger(__name__)，都挂在这个记录器下面
+
+
+class TextFormatter(logging.Formatter):
+    """时间 级别 模块: 消息 key=value ..."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record) -> str:
+        text = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            head, sep, tail = text.partition('\n')  # 字段放在第一行末尾，异常堆栈之前
+            text = head + ' ' + ' '.join(f'{k}={v}' for k, v in fields.items()) + sep + tail
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志一个JSON对象：ts/level/logger/msg + 结构化字段 + exc"""
+
+    def format(self, record) -> str:
+        data = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        data.update(getattr(record, 'fields', None) or {})
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+FORMATTERS = {'text': TextFormatter, 'json': JsonFormatter}
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """请求线程只把日志记录放进有界队列，格式化和写文件都在后台线程完成
+
+    队列满时丢弃并计数（dropped），绝不因为stdout/磁盘慢而阻塞请求。
+    """
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # 在调用线程里把消息和异常堆栈转成文本（参数对象之后可能被修改，traceback不能跨线程保留）
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_handler = None
+_listener = None
+_lock = threading.Lock()
+
+
+def _target_handler() -> logging.Handler:
+    handler = logging.FileHandler(LOG_FILE, encoding='utf-8') if LOG_FILE else logging.StreamHandler(sys.stderr)
+    handler.setFormatter(FORMATTERS.get(LOG_FORMAT, TextFormatter)())
+    return handler
+
+
+def _start_listener():
+    global _listener
+    _handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    _listener = QueueListener(_handler.queue, _target_handler())
+    _listener.start()
+
+
+def _restart_after_fork():
+    # gunicorn --preload 时在主进程初始化，fork出的worker里没有后台线程，需要重建队列和线程
+    if _handler is not None:
+        _start_listener()
+
+
+def init_logging(level: str = None):
+    """配置 api.* 记录器：有界队列 + 后台写线程；重复调用只调整级别"""
+    global _handler
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(level or LOG_LEVEL)
+    with _lock:
+        if _handler is not None:
+            return
+        _handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        _start_listener()
+        logger.addHandler(_handler)
+        logger.propagate = False
+        atexit.register(shutdown_logging)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def shutdown_logging():
+    """停止后台线程并写出队列中剩余的日志"""
+    if _listener is not None:
+        _listener.stop()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """模块记录器；以 __main__ 运行的脚本也归到 api 下"""
+    if not name.startswith(ROOT_LOGGER + '.'):
+        name = f'{ROOT_LOGGER}.{name}'
+    return logging.getLogger(name)
+
+
+def log_event(logger: logging.Logger, level: int, message: str, exc_info=None, **fields):
+    """结构化日志：message为固定文本，变化的部分放在fields中（JSON格式下是独立字段）
+
+    级别未启用时直接返回，只有一次isEnabledFor判断的开销；逐行明细在调用前再判断一次，
+    连fields字典都不必构造。
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, message, exc_info=exc_info, extra={'fields': fields})
+
+
+def get_logging_stats() -> dict:
+    return {
+        'queued': _handler.queue.qsize() if _handler is not None else 0,
+        'dropped': _handler.dropped if _handler is not None else 0,
+    }
@@ -0,0 +1,277 @@
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from functools import wraps
+
+from flask import Response, g, has_request_context, jsonify, request
+
+from api.src.model.db import add_sql_observer, get_pool_stats
+from api.src.model.query_log import get_query_report
+from api.src.utils.cache import get_cache_stats
+from api.src.utils.logger import get_logging_stats
+
+# 指标配置
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+# 访问 /api/metrics* 需要的令牌（Authorization: Bearer <令牌>）；为空时不注册这些接口，只在进程内记录
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# 请求耗时直方图的桶上限（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+# 采样分析（默认关闭）：按PROFILE_SAMPLE_RATE抽样请求，每PROFILE_INTERVAL秒采集一次调用栈，
+# 耗时超过PROFILE_SLOW_MS的请求保留火焰图格式（folded stacks）的采样结果
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', '500'))
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', '0.005'))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', '20'))  # 保留最近多少个慢请求的采样
+
+
+class Histogram:
+    """Prometheus风格的累计直方图（按标签分组）"""
+
+    def __init__(self, name: str, help_text: str, buckets: tuple, labels: tuple):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.labels = labels
+        self._series = {}  # 标签值 -> [各桶计数..., +Inf计数, 总和]
+
+    def observe(self, label_values: tuple, value: float):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for label_values, series in sorted(self._series.items()):
+            labels = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series[-1]:.6f}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name: str, help_text: str, labels: tuple):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = Counter()
+
+    def inc(self, label_values: tuple, amount: float = 1):
+        self._values[label_values] += amount
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{{{_labels(self.labels, label_values)}}} {value:g}')
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _gauges(prefix: str, stats: dict, help_text: str) -> list[str]:
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            name = f'{prefix}_{key}'
+            lines += [f'# HELP {name} {help_text}：{key}', f'# TYPE {name} gauge', f'{name} {value}']
+    return lines
+
+
+class SamplingProfiler:
+    """一个后台线程定时采集被标记线程的调用栈（sys._current_frames），开销与被采样的请求数成正比"""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL, keep: int = PROFILE_KEEP):
+        self.interval = interval
+        self.slow_profiles = deque(maxlen=keep)
+        self._active = {}  # 线程ID -> Counter(调用栈 -> 采样次数)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, thread_id: int):
+        with self._lock:
+            self._active[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id: int) -> Counter:
+        with self._lock:
+            return self._active.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, samples in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[_folded_stack(frame)] += 1
+
+
+def _folded_stack(frame) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
+
+
+class Metrics:
+    def __init__(self):
+        self.requests = CounterMetric('http_requests_total', '请求数', ('endpoint', 'method', 'status'))
+        self.latency = Histogram('http_request_duration_seconds', '请求耗时（秒）', LATENCY_BUCKETS,
+                                 ('endpoint', 'method'))
+        self.sql_count = Histogram('sql_queries_per_request', '每个请求执行的SQL语句数', SQL_COUNT_BUCKETS,
+                                   ('endpoint',))
+        self.sql_time = CounterMetric('sql_duration_seconds_total', 'SQL执行累计耗时（秒）', ('endpoint',))
+        self.slow_requests = CounterMetric('profiled_slow_requests_total', '被采样且超过慢请求阈值的请求数',
+                                           ('endpoint',))
+        self.profiler = SamplingProfiler()
+        self._lock = threading.Lock()
+
+    def observe_request(self, endpoint: str, method: str, status: int, seconds: float,
+                        sql_count: int, sql_seconds: float):
+        with self._lock:
+            self.requests.inc((endpoint, method, str(status)))
+            self.latency.observe((endpoint, method), seconds)
+            self.sql_count.observe((endpoint,), sql_count)
+            self.sql_time.inc((endpoint,), sql_seconds)
+
+    def render(self) -> str:
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.latency, self.sql_count, self.sql_time, self.slow_requests):
+                lines += metric.render()
+        lines += _gauges('db_pool', get_pool_stats(), '数据库连接池')
+        lines += _gauges('query_cache', get_cache_stats(), '查询缓存')
+        lines += _gauges('log_queue', get_logging_stats(), '日志队列（dropped为队列满时丢弃的条数）')
+        report = get_query_report()
+        lines += _gauges('sql_statements', {
+            'tracked': len(report),
+            'full_scan': sum(1 for e in report if e['scans']),
+            'slow_total': sum(e['slow'] for e in report),
+        }, 'SQL语句统计（慢查询日志）')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+def _record_sql(sql, parameters, seconds: float, cursor):
+    if has_request_context() and 'metrics_start' in g:
+        g.sql_count += 1
+        g.sql_seconds += seconds
+
+
+def _endpoint() -> str:
+    return request.endpoint or 'unmatched'
+
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    g.sql_count = 0
+    g.sql_seconds = 0.0
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        g.profiled_thread = threading.get_ident()
+        metrics.profiler.start(g.profiled_thread)
+
+
+def _after_request(response):
+    if 'metrics_start' not in g:
+        return response
+    elapsed = time.perf_counter() - g.metrics_start
+    endpoint = _endpoint()
+    metrics.observe_request(endpoint, request.method, response.status_code, elapsed,
+                            g.sql_count, g.sql_seconds)
+    # Server-Timing：浏览器开发者工具里可以直接看到SQL耗时
+    response.headers.add('Server-Timing', f'db;dur={g.sql_seconds * 1000:.1f};desc="{g.sql_count} queries"')
+    response.headers.add('Server-Timing', f'app;dur={elapsed * 1000:.1f}')
+
+    thread_id = g.pop('profiled_thread', None)
+    if thread_id is not None:
+        samples = metrics.profiler.stop(thread_id)
+        if elapsed * 1000 >= PROFILE_SLOW_MS and samples:
+            with metrics._lock:
+                metrics.slow_requests.inc((endpoint,))
+            metrics.profiler.slow_profiles.append({
+                'endpoint': endpoint,
+                'method': request.method,
+                'path': request.path,
+                'duration_ms': round(elapsed * 1000, 1),
+                'sql_count': g.sql_count,
+                'sql_ms': round(g.sql_seconds * 1000, 1),
+                'samples': [f'{stack} {count}' for stack, count in samples.most_common()],
+            })
+    return response
+
+
+def _teardown_request(exc):
+    # 视图抛出异常时after_request不会执行，这里兜底停止采样
+    thread_id = g.pop('profiled_thread', None)
+    if thread_id is not None:
+        metrics.profiler.stop(thread_id)
+
+
+def _token_required(view):
+    """指标接口含有接口路径、SQL文本和调用栈，只对持有METRICS_TOKEN的采集端开放"""
+    @wraps(view)
+    def wrapper():
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(token.strip().encode('utf-8'),
+                                                                 METRICS_TOKEN.encode('utf-8')):
+            return jsonify({'success': False, 'message': '无权访问指标'}), 401
+        return view()
+    return wrapper
+
+
+def metrics_view():
+    """Prometheus文本格式的指标"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def slow_profiles_view():
+    """最近的慢请求采样（folded stacks，可直接交给flamegraph.pl/speedscope）"""
+    return jsonify({'success': True, 'data': list(metrics.profiler.slow_profiles)})
+
+
+def slow_queries_view():
+    """按归一化SQL聚合的语句统计和查询计划，全表扫描的语句排在最前"""
+    return jsonify({'success': True, 'data': get_query_report()})
+
+
+def init_app(app):
+    """注册请求计时钩子、SQL计时观察者和 /api/metrics 接口（配置了METRICS_TOKEN时）"""
+    if not METRICS_ENABLED:
+        return
+    add_sql_observer(_record_sql)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    if not METRICS_TOKEN:
+        return
+    app.add_url_rule('/api/metrics', 'metrics', _token_required(metrics_view))
+    app.add_url_rule('/api/metrics/slow', 'metrics_slow', _token_required(slow_profiles_view))
+    app.add_url_rule('/api/metrics/queries', 'metrics_queries', _token_required(slow_queries_view))
@@ -0,0 +1,17 @@
+# 拼音检索键：可选依赖pypinyin，未安装时返回空字符串（仅关闭拼音搜索，不影响其他功能）
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+
+def pinyin_key(name: str) -> str:
+    """生成姓名的拼音检索键：全拼+首字母，如 张三 -> 'zhangsan zs'"""
+    if not name or lazy_pinyin is None:
+        return ''
+    syllables = [s.lower() for s in lazy_pinyin(name) if s.strip()]
+    if not syllables:
+        return ''
+    full = ''.join(syllables)
+    initials = ''.join(s[0] for s in syllables)
+    return f'{full} {initials}'
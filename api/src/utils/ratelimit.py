@@ -0,0 +1,213 @@
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from flask import jsonify, make_response, request
+
+from api.src.model.db import DB_PATH
+
+# 限流配置
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') != '0'
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')  # memory：单进程；sqlite：多个worker共享
+RATE_LIMIT_DB = os.environ.get('RATE_LIMIT_DB', os.path.join(os.path.dirname(DB_PATH), 'ratelimit.db'))
+RATE_LIMIT_EVICT_INTERVAL = 60  # 秒，清理过期计数器的间隔
+# 部署在反向代理之后时信任的代理层数：按X-Forwarded-For从右数第N个地址（由最外层可信代理追加）限流，
+# 更靠左的地址由客户端自己填写，不能用于限流；0表示直接使用连接地址
+RATE_LIMIT_TRUST_PROXY = int(os.environ.get('RATE_LIMIT_TRUST_PROXY', '0'))
+
+
+class MemoryBackend:
+    """进程内滑动窗口计数器：每个键只保存[窗口序号, 本窗口计数, 上一窗口计数]
+
+    滑动窗口按上一窗口计数的剩余比例加权近似，内存占用与键数成正比；
+    超过两个窗口没有访问的键定期清理。
+    """
+
+    def __init__(self, evict_interval: float = RATE_LIMIT_EVICT_INTERVAL):
+        self._counters = {}  # 键 -> [窗口序号, 本窗口计数, 上一窗口计数, 窗口秒数]
+        self._lock = threading.Lock()
+        self._evict_interval = evict_interval
+        self._next_evict = time.time() + evict_interval
+
+    def _counter(self, key: str, window: float, now: float) -> list:
+        index = int(now // window)
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = [index, 0, 0, window]
+        elif counter[0] != index:
+            counter[2] = counter[1] if counter[0] == index - 1 else 0
+            counter[1] = 0
+            counter[0] = index
+        return counter
+
+    def hit(self, key: str, window: float, amount: int = 1, now: float = None) -> float:
+        """计数+amount，返回滑动窗口内的加权次数（amount=0时只查询）"""
+        now = time.time() if now is None else now
+        with self._lock:
+            counter = self._counter(key, window, now)
+            counter[1] += amount
+            if now >= self._next_evict:
+                self._evict(now)
+            return counter[2] * (1 - now % window / window) + counter[1]
+
+    def _evict(self, now: float):
+        self._counters = {
+            key: counter for key, counter in self._counters.items()
+            if counter[0] >= int(now // counter[3]) - 1
+        }
+        self._next_evict = now + self._evict_interval
+
+    def reset(self, key: str):
+        with self._lock:
+            self._counters.pop(key, None)
+
+    def __len__(self):
+        return len(self._counters)
+
+
+class SQLiteBackend:
+    """多个gunicorn worker共享的计数器：独立的SQLite文件（WAL），与业务库分开避免争用写锁"""
+
+    def __init__(self, path: str = RATE_LIMIT_DB):
+        self.path = path
+        self._local = threading.local()
+        self._next_evict = 0.0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._conn()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                window_index INTEGER NOT NULL,
+                current INTEGER NOT NULL,
+                previous INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')  # 计数器丢失几次写入无关紧要
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key: str, window: float, amount: int = 1, now: float = None) -> float:
+        now = time.time() if now is None else now
+        index = int(now // window)
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT window_index, current, previous FROM rate_limits WHERE key = ?', (key,)
+            ).fetchone()
+            current, previous = 0, 0
+            if row is not None:
+                if row[0] == index:
+                    current, previous = row[1], row[2]
+                elif row[0] == index - 1:
+                    previous = row[1]
+            current += amount
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_limits VALUES (?, ?, ?, ?, ?)',
+                (key, index, current, previous, (index + 2) * window)
+            )
+            if now >= self._next_evict:
+                conn.execute('DELETE FROM rate_limits WHERE expires_at < ?', (now,))
+                self._next_evict = now + RATE_LIMIT_EVICT_INTERVAL
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            conn.execute('ROLLBACK')
+            raise
+        return previous * (1 - now % window / window) + current
+
+    def reset(self, key: str):
+        self._conn().execute('DELETE FROM rate_limits WHERE key = ?', (key,))
+
+
+BACKENDS = {'memory': MemoryBackend, 'sqlite': SQLiteBackend}
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = BACKENDS[RATE_LIMIT_BACKEND]()
+    return _backend
+
+
+def set_backend(backend):
+    """替换限流后端（如自定义的共享存储实现，需要提供hit/reset）"""
+    global _backend
+    _backend = backend
+
+
+def by_ip() -> str:
+    """按客户端IP限流；与werkzeug的ProxyFix(x_for=N)取同一个地址"""
+    if RATE_LIMIT_TRUST_PROXY > 0:
+        forwarded = [value.strip() for value in request.headers.get('X-Forwarded-For', '').split(',')]
+        if len(forwarded) >= RATE_LIMIT_TRUST_PROXY and forwarded[-RATE_LIMIT_TRUST_PROXY]:
+            return forwarded[-RATE_LIMIT_TRUST_PROXY]
+    return request.remote_addr or ''
+
+
+def by_username() -> str:
+    """按请求体中的用户名限流（统一小写、去空格）；没有用户名时不限流"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return ''
+    return str(data.get('username') or '').strip().lower()
+
+
+def _too_many(retry_after: float):
+    response = make_response(jsonify({
+        'success': False,
+        'message': '请求过于频繁，请稍后再试'
+    }), 429)
+    response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+    return response
+
+
+def rate_limit(limit: int, per: float, key=by_ip, scope: str = None, count_if=None):
+    """限流装饰器：同一个键在per秒的滑动窗口内最多limit次，超出返回429
+
+    key为返回限流键的函数（返回空字符串时不限流）；count_if(response)不为空时只统计满足条件的响应，
+    用于登录失败锁定：连续失败达到limit次后，该键在窗口内的请求直接被拒绝，成功一次即清零。
+    多个装饰器可以叠加（如同时按IP和用户名限制）。
+    """
+    def decorator(f):
+        name = scope or f'{f.__module__}.{f.__name__}:{getattr(key, "__name__", "key")}:{limit}/{per}'
+
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not RATE_LIMIT_ENABLED:
+                return f(*args, **kwargs)
+            value = key()
+            if not value:
+                return f(*args, **kwargs)
+            backend = get_backend()
+            bucket = f'{name}:{value}'
+            now = time.time()
+            if backend.hit(bucket, per, 0 if count_if else 1, now) > (limit - 1 if count_if else limit):
+                return _too_many(per - now % per)
+            response = make_response(f(*args, **kwargs))
+            if count_if is not None:
+                if count_if(response):
+                    backend.hit(bucket, per, 1)
+                elif response.status_code < 400:
+                    backend.reset(bucket)  # 成功后清零（锁定只针对连续失败）
+            return response
+        return wrapper
+    return decorator
+
+
+def failed(response) -> bool:
+    """count_if辅助函数：认证失败（401）的响应"""
+    return response.status_code == 401
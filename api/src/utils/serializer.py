@@ -0,0 +1,149 @@
+# JSON序列化：列表接口直接把查询结果行编码成JSON字节，不经过dict(Row)和Flask的JSON provider。
+# 可选依赖orjson，未安装时使用标准库json（紧凑分隔符、不转义中文）；JSON_BACKEND=stdlib 可强制使用标准库
+# 列表接口按Accept协商响应格式：行对象JSON（默认）、列式JSON、MessagePack（可选依赖msgpack）
+import json
+import os
+from datetime import date, datetime
+from itertools import islice
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto')            # auto / orjson / stdlib
+JSON_STREAM_ROWS = int(os.environ.get('JSON_STREAM_ROWS', '5000'))  # 超过该行数时流式输出JSON数组
+JSON_CHUNK_ROWS = 1000                                             # 流式输出时每块编码的行数
+
+# 响应格式 -> MIME类型；列式格式为 {"columns": [...], "rows": [[...]]}，不重复每行的键名
+JSON_MIMETYPE = 'application/json'
+COLUMNAR_MIMETYPE = 'application/vnd.contacts.columnar+json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+FORMATS = {'json': JSON_MIMETYPE, 'columnar': COLUMNAR_MIMETYPE}
+if msgpack is not None:
+    FORMATS['msgpack'] = MSGPACK_MIMETYPE
+_ACCEPT_ALIASES = {'application/x-msgpack': 'msgpack'}
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    raise TypeError(f'无法序列化的类型：{type(value).__name__}')
+
+
+_stdlib_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default)
+
+
+def _stdlib_dumps(obj) -> bytes:
+    return _stdlib_encoder.encode(obj).encode('utf-8')
+
+
+def _orjson_dumps(obj) -> bytes:
+    return orjson.dumps(obj, default=_default)
+
+
+# 可用的序列化后端：名称 -> dumps(obj) -> bytes
+BACKENDS = {'stdlib': _stdlib_dumps}
+if orjson is not None:
+    BACKENDS['orjson'] = _orjson_dumps
+
+
+def get_backend() -> str:
+    if JSON_BACKEND == 'stdlib' or orjson is None:
+        return 'stdlib'
+    return 'orjson'
+
+
+dumps = BACKENDS[get_backend()]
+
+
+def row_columns(rows) -> list[str]:
+    """取结果行的列名（sqlite3.Row.keys() 来自 cursor.description）"""
+    return list(rows[0].keys()) if rows else []
+
+
+def row_objects(rows, columns: list[str] = None) -> list[dict]:
+    """按列名zip值元组得到可直接序列化的对象，比dict(Row)快（不经过Row的映射接口）"""
+    columns = columns or row_columns(rows)
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def encode_rows(rows, columns: list[str] = None) -> bytes:
+    """把结果行编码为JSON对象数组"""
+    return dumps(row_objects(rows, columns))
+
+
+def row_values(rows) -> list[tuple]:
+    """列式格式的行：只保留值元组"""
+    return [tuple(row) for row in rows]
+
+
+def iter_rows_json(rows, columns: list[str] = None, chunk_rows: int = JSON_CHUNK_ROWS,
+                   columnar: bool = False):
+    """分块产出JSON数组的字节片段，拼起来与一次性编码的结果相同"""
+    columns = columns or row_columns(rows)
+    iterator = iter(rows)
+    yield b'['
+    first = True
+    while True:
+        chunk = list(islice(iterator, chunk_rows))
+        if not chunk:
+            break
+        encoded = dumps(row_values(chunk) if columnar else row_objects(chunk, columns))[1:-1]
+        yield encoded if first else b',' + encoded
+        first = False
+    yield b']'
+
+
+def negotiate_format(accept_mimetypes) -> str:
+    """根据Accept请求头选择响应格式（json / columnar / msgpack），未指定时为json"""
+    offered = list(FORMATS.values())
+    if 'msgpack' in FORMATS:
+        offered.extend(_ACCEPT_ALIASES)
+    best = accept_mimetypes.best_match(offered, default=JSON_MIMETYPE)
+    if best in _ACCEPT_ALIASES:
+        return _ACCEPT_ALIASES[best]
+    return next((name for name, mimetype in FORMATS.items() if mimetype == best), 'json')
+
+
+def json_response(payload: dict, status: int = 200) -> Response:
+    return Response(dumps(payload), status=status, mimetype=JSON_MIMETYPE)
+
+
+def rows_response(rows, meta: dict = None, key: str = 'data', columns: list[str] = None,
+                  stream: bool = None, fmt: str = 'json') -> Response:
+    """返回 {"success": true, ...meta, key: 行数据}
+
+    fmt=json时行数据为对象数组；columnar/msgpack时为 {"columns": [...], "rows": [[...]]}。
+    JSON格式行数超过JSON_STREAM_ROWS（或stream=True）时按块流式输出，不在内存中拼出整个响应体。
+    """
+    payload = {'success': True, **(meta or {})}
+    columns = columns or row_columns(rows)
+    if fmt == 'msgpack':
+        payload[key] = {'columns': columns, 'rows': row_values(rows)}
+        body = msgpack.packb(payload, use_bin_type=True, default=_default)
+        return Response(body, mimetype=MSGPACK_MIMETYPE)
+
+    columnar = fmt == 'columnar'
+    head = dumps(payload)[:-1] + b',' + dumps(key) + b':'
+    if columnar:
+        head += b'{"columns":' + dumps(columns) + b',"rows":'
+    tail = b'}}' if columnar else b'}'
+    if stream is None:
+        stream = len(rows) > JSON_STREAM_ROWS
+    if stream:
+        def generate():
+            yield head
+            yield from iter_rows_json(rows, columns, columnar=columnar)
+            yield tail
+        return Response(generate(), mimetype=FORMATS[fmt])
+    body = dumps(row_values(rows) if columnar else row_objects(rows, columns))
+    return Response(head + body + tail, mimetype=FORMATS[fmt])
@@ -0,0 +1,185 @@
+import posixpath
+import re
+import zipfile
+from io import BytesIO
+from xml.etree.ElementTree import iterparse, parse
+
+# 轻量XLSX读取：直接流式解析工作表XML，只取单元格值，不构建openpyxl的单元格对象。
+# iter_row_fragments 把工作表按完整<row>切成原始XML片段（只做字节查找，不解析），
+# 片段可以交给多个进程并行解析，用于大文件导入
+
+NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+ROW_TAG = f'{NS}row'
+CELL_TAG = f'{NS}c'
+VALUE_TAG = f'{NS}v'
+TEXT_TAG = f'{NS}t'
+INLINE_TAG = f'{NS}is'
+PHONETIC_TAG = f'{NS}rPh'
+_SHEET_DATA_OPEN = re.compile(rb'<(\w+:)?sheetData\b[^>]*>')
+_XMLNS = re.compile(rb'\sxmlns(?::\w+)?="[^"]*"')
+
+
+def sheet_paths(path: str) -> list[tuple[str, str]]:
+    """返回工作簿中所有工作表的(名称, 压缩包内XML路径)，顺序与Excel中一致"""
+    with zipfile.ZipFile(path) as zf:
+        rels = parse(zf.open('xl/_rels/workbook.xml.rels')).getroot()
+        targets = {rel.get('Id'): rel.get('Target') for rel in rels.iter(f'{PKG_REL_NS}Relationship')}
+        workbook = parse(zf.open('xl/workbook.xml')).getroot()
+        sheets = []
+        for sheet in workbook.iter(f'{NS}sheet'):
+            target = targets[sheet.get(f'{REL_NS}id')]
+            if target.startswith('/'):
+                target = target.lstrip('/')
+            else:
+                target = posixpath.normpath(posixpath.join('xl', target))
+            sheets.append((sheet.get('name'), target))
+        return sheets
+
+
+def load_shared_strings(zf: zipfile.ZipFile) -> list[str]:
+    """读取共享字符串表（富文本按片段拼接，忽略注音）"""
+    if 'xl/sharedStrings.xml' not in zf.namelist():
+        return []
+    strings = []
+    for event, element in iterparse(zf.open('xl/sharedStrings.xml')):
+        if element.tag == f'{NS}si':
+            strings.append(_text_of(element))
+            element.clear()
+    return strings
+
+
+def _text_of(element) -> str:
+    if len(element) == 1 and element[0].tag == TEXT_TAG:
+        return element[0].text or ''  # 最常见的情况：<si><t>文本</t></si>
+    phonetic = {id(t) for rph in element.iter(PHONETIC_TAG) for t in rph.iter(TEXT_TAG)}
+    return ''.join(t.text or '' for t in element.iter(TEXT_TAG) if id(t) not in phonetic)
+
+
+def _column_index(ref: str) -> int:
+    index = 0
+    for ch in ref:
+        if 'A' <= ch <= 'Z':
+            index = index * 26 + ord(ch) - 64
+        else:
+            break
+    return index - 1
+
+
+def _cast_number(value: str):
+    """与openpyxl一致：没有小数点/指数的数字转int，其余转float"""
+    if '.' in value or 'E' in value or 'e' in value:
+        return float(value)
+    return int(value)
+
+
+def _cell_value(cell, shared_strings: list[str]):
+    cell_type = cell.get('t', 'n')
+    if cell_type == 'inlineStr':
+        inline = cell.find(INLINE_TAG)
+        return _text_of(inline) if inline is not None else None
+    value = cell.findtext(VALUE_TAG)
+    if value is None:
+        return None
+    if cell_type == 's':
+        return shared_strings[int(value)]
+    if cell_type == 'n':
+        return _cast_number(value)
+    if cell_type == 'b':
+        return value == '1'
+    return value  # str（公式结果）、e（错误值）等按文本返回
+
+
+def _row_values(row, shared_strings: list[str], max_col: int = None) -> tuple:
+    values = []
+    for position, cell in enumerate(row.iter(CELL_TAG)):
+        ref = cell.get('r')
+        column = _column_index(ref) if ref else position
+        if max_col is not None and column >= max_col:
+            continue
+        if column >= len(values):
+            values.extend([None] * (column - len(values) + 1))
+        values[column] = _cell_value(cell, shared_strings)
+    return tuple(values)
+
+
+def iter_rows(path: str, sheet_path: str, min_row: int = 1, max_col: int = None,
+              shared_strings: list[str] = None):
+    """单进程流式读取工作表，产出(行号, 值元组)"""
+    with zipfile.ZipFile(path) as zf:
+        if shared_strings is None:
+            shared_strings = load_shared_strings(zf)
+        row_num = 0
+        for event, element in iterparse(zf.open(sheet_path)):
+            if element.tag != ROW_TAG:
+                continue
+            row_num = int(element.get('r') or row_num + 1)
+            if row_num >= min_row:
+                yield row_num, _row_values(element, shared_strings, max_col)
+            element.clear()
+
+
+def iter_row_fragments(path: str, sheet_path: str, fragment_bytes: int = 4 * 1024 * 1024,
+                       read_size: int = 1024 * 1024):
+    """把工作表<sheetData>切成若干只包含完整<row>元素的独立XML文档，产出(片段首行序号, 片段字节)
+
+    只解压和查找"</row>"，不做XML解析，主进程开销很小。每个片段都带上工作表根元素的
+    命名空间声明（Excel会在<row>上使用x14ac等扩展属性），可以单独解析。
+    片段首行序号是该片段第一个<row>在工作表中的序号（从1开始），行没有r属性时用于推算行号。
+    """
+    with zipfile.ZipFile(path) as zf, zf.open(sheet_path) as stream:
+        buffer = b''
+        prefix = None
+        while prefix is None:
+            block = stream.read(read_size)
+            if not block:
+                return
+            buffer += block
+            match = _SHEET_DATA_OPEN.search(buffer)
+            if match:
+                if match.group(0).endswith(b'/>'):
+                    return  # 空工作表
+                prefix = match.group(1) or b''
+                namespaces = b''.join(dict.fromkeys(_XMLNS.findall(buffer[:match.start()])))
+                buffer = buffer[match.end():]
+        row_end = b'</' + prefix + b'row>'
+        row_open = re.compile(b'<' + re.escape(prefix) + rb'row[\s/>]')
+        data_end = b'</' + prefix + b'sheetData>'
+        open_tag = b'<' + prefix + b'sheetData' + namespaces + b'>'
+        first_row = 1
+
+        finished = False
+        while not finished:
+            block = stream.read(read_size)
+            if block:
+                buffer += block
+            end = buffer.find(data_end)
+            if end != -1:
+                buffer, finished = buffer[:end], True
+            elif not block:
+                finished = True
+            if finished or len(buffer) >= fragment_bytes:
+                cut = len(buffer) if finished else buffer.rfind(row_end)
+                if cut > 0:
+                    if not finished:
+                        cut += len(row_end)
+                    yield first_row, open_tag + buffer[:cut] + data_end
+                    first_row += len(row_open.findall(buffer, 0, cut))
+                    buffer = buffer[cut:]
+
+
+def parse_row_fragment(fragment: bytes, shared_strings: list[str], max_col: int = None,
+                       first_row: int = 1) -> list[tuple[int, tuple]]:
+    """解析iter_row_fragments产出的片段，返回[(行号, 值元组)]
+
+    与iter_rows一致：行没有r属性时取上一行行号+1，片段第一行取first_row。
+    """
+    rows = []
+    row_num = first_row - 1
+    for event, element in iterparse(BytesIO(fragment)):
+        if element.tag == ROW_TAG:
+            row_num = int(element.get('r') or row_num + 1)
+            rows.append((row_num, _row_values(element, shared_strings, max_col)))
+            element.clear()
+    return rows
@@ -0,0 +1,52 @@
+"""测试公共夹具：独立的临时数据库、低成本的密码哈希参数、固定的令牌密钥
+
+配置在模块导入时从环境变量读取，必须在导入 api.src 之前设置好。
+"""
+import itertools
+import os
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATA_DIR = tempfile.mkdtemp(prefix='contacts-test-')
+os.environ.update({
+    'CONTACTS_DB_PATH': os.path.join(DATA_DIR, 'contacts.db'),
+    'DB_CHECKPOINT_INTERVAL': '0',
+    'AUTH_SECRET_KEYS': 'test:test-secret',
+    'PASSWORD_SCRYPT_N': str(2 ** 10),
+    'RATE_LIMIT_ENABLED': '0',
+    'LOG_LEVEL': 'WARNING',
+    'DB_SLOW_QUERY_MS': '0',
+})
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import pytest  # noqa: E402
+
+_usernames = itertools.count()
+
+
+@pytest.fixture(scope='session')
+def app():
+    from api.src.app import app
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def register(client):
+    """注册并登录一个新用户，返回(user_id, 带令牌的请求头)"""
+    def register_user(password: str = 'pw123456'):
+        username = f'user{next(_usernames)}_{os.getpid()}'
+        response = client.post('/api/register', json={
+            'username': username, 'password': password, 'email': f'{username}@example.com'
+        })
+        assert response.status_code == 201, response.json
+        data = client.post('/api/login', json={'username': username, 'password': password}).json['data']
+        return data['user_id'], {'Authorization': f"Bearer {data['token']}"}
+    return register_user
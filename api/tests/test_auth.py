@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from api.src.utils.auth import TokenSigner, _b64
+
+KEYS = [('new', b'new-secret'), ('old', b'old-secret')]
+
+
+def test_issue_and_verify():
+    signer = TokenSigner(KEYS, ttl=60)
+    token, expires_at = signer.issue(42)
+    assert token.startswith('new.42.')
+    assert expires_at > time.time()
+    assert signer.verify(token) == 42
+    assert signer.verify(token) == 42  # 第二次命中缓存
+
+
+def test_expired_token_is_rejected():
+    signer = TokenSigner(KEYS, ttl=-1)
+    token, _ = signer.issue(42)
+    assert signer.verify(token) is None
+
+
+def test_cached_token_expires(monkeypatch):
+    signer = TokenSigner(KEYS, ttl=60)
+    token, _ = signer.issue(42)
+    assert signer.verify(token) == 42
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+    assert signer.verify(token) is None
+
+
+def test_key_rotation():
+    old_signer = TokenSigner([('old', b'old-secret')], ttl=60)
+    token, _ = old_signer.issue(7)
+    # 新密钥在前：旧令牌仍可校验，新令牌用新密钥签发
+    rotated = TokenSigner(KEYS, ttl=60)
+    assert rotated.verify(token) == 7
+    assert rotated.issue(7)[0].startswith('new.')
+    # 旧密钥下线后旧令牌失效
+    assert TokenSigner([('new', b'new-secret')], ttl=60).verify(token) is None
+
+
+def test_tampered_token_is_rejected():
+    signer = TokenSigner(KEYS, ttl=60)
+    token, _ = signer.issue(42)
+    kid, user_id, expires_at, signature = token.split('.')
+    assert signer.verify(f'{kid}.43.{expires_at}.{signature}') is None
+    assert signer.verify(f'{kid}.{user_id}.{int(expires_at) + 1}.{signature}') is None
+    assert signer.verify(f'old.{user_id}.{expires_at}.{signature}') is None
+
+
+@pytest.mark.parametrize('token', [
+    '', 'garbage', 'new.1.2', 'new.1.2.3.4', 'unknown.1.9999999999.' + 'A' * 43,
+    'new.é.1.x', 'new.1.é.x', 'new.1.1.é', 'new.１.9999999999.' + 'A' * 43,
+    'new.+1.9999999999.' + 'A' * 43, 'new. 1.9999999999.' + 'A' * 43, 'new.1_0.9999999999.' + 'A' * 43,
+    'new.1.9999999999.' + 'é' * 43, 'new.1.9999999999.' + 'A' * 44, 'new.1.9999999999.' + 'A' * 42 + '=',
+])
+def test_malformed_token_returns_none(token):
+    assert TokenSigner(KEYS).verify(token) is None
+
+
+def test_invalid_key_id_is_rejected():
+    with pytest.raises(ValueError):
+        TokenSigner([('bad.kid', b'secret')])
+
+
+def test_malformed_token_is_401(client):
+    for token in ('new.é.1.x', 'test.1.é.x', 'test.1.9999999999.' + 'é' * 43):
+        response = client.get('/api/contacts', headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 401
+
+
+def test_query_token_only_on_download_routes(client, register):
+    _, headers = register()
+    token = headers['Authorization'].split(' ', 1)[1]
+    assert client.get(f'/api/contacts?token={token}').status_code == 401
+    assert client.get(f'/api/groups?token={token}').status_code == 401
+    assert client.get(f'/api/contacts/export?token={token}').status_code == 200
+    assert client.get(f'/api/contacts/export/excel?token={token}').status_code == 200
+    assert client.get('/api/contacts', headers=headers).status_code == 200
+
+
+def test_signature_is_urlsafe_base64_of_hmac():
+    signer = TokenSigner(KEYS, ttl=60)
+    token, _ = signer.issue(1)
+    assert len(token.rsplit('.', 1)[1]) == len(_b64(b'\0' * 32)) == 43
@@ -0,0 +1,32 @@
+from api.src.model.contact import Contact
+
+
+def test_bad_field_types_fail_only_their_row(register):
+    user_id, _ = register()
+    result = Contact.batch_add([
+        {'name': '张三', 'phone1': '13800000001', 'phone2': {'a': 1}},
+        {'name': '李四', 'phone1': '13800000002', 'email1': ['x@example.com']},
+        {'name': ['王五'], 'phone1': '13800000003'},
+        {'name': '赵六', 'phone1': 13800000004, 'address': '上海', 'phone2': None},
+        {'name': '钱七', 'phone1': '13800000005', 'social_media': True},
+    ], user_id)
+    assert result['success'] == 1
+    assert [(e['index'], e['reason']) for e in result['errors']] == [
+        (0, '电话2格式错误'), (1, '邮箱1格式错误'), (2, '姓名格式错误'), (4, '社交账号格式错误'),
+    ]
+    rows = Contact.query(user_id, fields=['name', 'phone1', 'phone2', 'address'])[0]
+    assert [tuple(row)[:4] for row in rows] == [('赵六', '13800000004', None, '上海')]
+
+
+def test_batch_route_reports_per_row_failures(client, register):
+    _, headers = register()
+    response = client.post('/api/contacts/batch', headers=headers, json={'contacts': [
+        {'name': '甲', 'phone1': '13900000001'},
+        {'name': '乙', 'phone1': '13900000002', 'email2': {'nested': True}},
+        {'name': '丙', 'phone1': '13900000001'},
+        'not a contact',
+    ]})
+    assert response.status_code == 200
+    data = response.json['data']
+    assert data['success'] == 1 and data['fail'] == 3
+    assert [e['reason'] for e in data['errors']] == ['邮箱2格式错误', '电话1已存在', '数据格式错误']
@@ -0,0 +1,97 @@
+import pytest
+
+from api.src.model.contact import Contact
+from api.src.utils.cache import QueryCache, query_cache
+
+
+def _load(cache, user_id, value, shape=('list',)):
+    return cache.get_or_load(user_id, shape, lambda: value)
+
+
+def test_entries_are_reused_until_invalidated():
+    cache = QueryCache(max_weight=100, ttl=60)
+    assert _load(cache, 1, [1]) == [1]
+    assert _load(cache, 1, [2]) == [1]
+    assert _load(cache, 2, [3]) == [3]
+    cache.invalidate(1)
+    assert _load(cache, 1, [4]) == [4]
+    assert _load(cache, 2, [5]) == [3]   # 只失效写入的用户
+    assert cache.stats()['hits'] == 2
+
+
+def test_load_racing_a_write_is_not_cached():
+    cache = QueryCache(max_weight=100, ttl=60)
+    assert cache.get_or_load(1, ('list',), lambda: cache.invalidate(1) or ['old']) == ['old']
+    assert _load(cache, 1, ['new']) == ['new']
+
+
+def test_user_states_are_bounded_and_evict_their_entries():
+    cache = QueryCache(max_weight=100, ttl=60, max_users=2)
+    for user_id in (1, 2, 3):
+        _load(cache, user_id, [user_id])
+    assert cache.stats()['users'] == 2
+    assert cache.stats()['entries'] == 2
+    assert _load(cache, 1, ['reloaded']) == ['reloaded']
+
+
+def test_load_outliving_its_user_state_is_not_cached():
+    cache = QueryCache(max_weight=100, ttl=60, max_users=1)
+
+    def loader():
+        _load(cache, 2, [2])   # 加载期间用户1的状态被淘汰
+        return ['stale']
+    assert cache.get_or_load(1, ('list',), loader) == ['stale']
+    assert _load(cache, 1, ['fresh']) == ['fresh']
+
+
+def test_first_observed_version_invalidates_earlier_entries():
+    cache = QueryCache(max_weight=100, ttl=60)
+    _load(cache, 1, ['cached before observe'])
+    cache.observe(1, 7)
+    assert _load(cache, 1, ['fresh']) == ['fresh']
+    cache.observe(1, 7)
+    assert _load(cache, 1, ['unchanged']) == ['fresh']
+    cache.observe(1, 8)                  # 其他进程写入过
+    assert _load(cache, 1, ['newer']) == ['newer']
+
+
+def _names(user_id):
+    return sorted(row['name'] for row in Contact.query(user_id, fields=['name'])[0])
+
+
+@pytest.fixture
+def cached_user(register):
+    user_id, _ = register()
+    assert Contact.add({'name': '张三', 'phone1': '13800000001'}, user_id) > 0
+    assert _names(user_id) == ['张三']
+    hits = query_cache.stats()['hits']
+    assert _names(user_id) == ['张三'] and query_cache.stats()['hits'] == hits + 1
+    return user_id
+
+
+def test_add_invalidates_cached_lists(cached_user):
+    Contact.add({'name': '李四', 'phone1': '13800000002'}, cached_user)
+    assert _names(cached_user) == ['张三', '李四']
+
+
+def test_update_invalidates_cached_lists(cached_user):
+    assert Contact.update('13800000001', {'name': '张三丰', 'phone1': '13800000001'}, cached_user)
+    assert _names(cached_user) == ['张三丰']
+
+
+def test_delete_invalidates_cached_lists(cached_user):
+    assert Contact.delete('13800000001', cached_user)
+    assert _names(cached_user) == []
+
+
+def test_batch_add_invalidates_cached_lists(cached_user):
+    result = Contact.batch_add([{'name': '王五', 'phone1': '13800000003'}], cached_user)
+    assert result['success'] == 1
+    assert _names(cached_user) == ['张三', '王五']
+
+
+def test_toggle_favorite_invalidates_cached_lists(cached_user):
+    contact_id = Contact.query(cached_user, fields=['id'])[0][0]['id']
+    assert Contact.query(cached_user, favorite=1)[0] == []
+    assert Contact.toggle_favorite(contact_id, cached_user)
+    assert [row['id'] for row in Contact.query(cached_user, favorite=1)[0]] == [contact_id]
@@ -0,0 +1,81 @@
+import gzip
+
+import pytest
+
+from api.src.utils import compression
+from api.src.utils.compression import compress_stream, negotiate_encoding
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('', None),
+    ('identity', None),
+    ('gzip', 'gzip'),
+    ('GZIP;q=0.5, deflate', 'gzip'),
+    ('gzip;q=0', None),
+    ('*', compression.ENCODINGS[0]),
+    ('*, gzip;q=0', compression.ENCODINGS[0] if compression.ENCODINGS[0] != 'gzip' else None),
+    ('gzip;q=abc', None),
+])
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+def test_negotiate_prefers_higher_q_then_server_order():
+    assert negotiate_encoding('gzip;q=1, br;q=0.5, zstd;q=0.1', ('zstd', 'br', 'gzip')) == 'gzip'
+    assert negotiate_encoding('gzip, br, zstd', ('zstd', 'br', 'gzip')) == 'zstd'
+
+
+def test_compress_stream_round_trip():
+    chunks = [b'a' * 1000, 'é' * 10, b'', b'z']
+    assert gzip.decompress(b''.join(compress_stream(chunks, 'gzip', 1))) == b'a' * 1000 + 'é'.encode() * 10 + b'z'
+
+
+@pytest.fixture
+def contacts(client, register):
+    _, headers = register()
+    response = client.post('/api/contacts/batch', headers=headers, json={
+        'contacts': [{'name': f'联系人{i}', 'phone1': f'132000{i:05d}', 'address': '北京市朝阳区' * 3}
+                     for i in range(200)]
+    })
+    assert response.json['data']['success'] == 200
+    return headers
+
+
+def test_large_json_is_compressed_above_threshold(client, contacts):
+    plain = client.get('/api/contacts', headers=contacts)
+    assert 'Content-Encoding' not in plain.headers
+
+    response = client.get('/api/contacts', headers={**contacts, 'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data) == plain.data
+
+
+def test_small_and_empty_responses_are_not_compressed(client, register):
+    _, headers = register()
+    response = client.get('/api/contacts', headers={**headers, 'Accept-Encoding': 'gzip'})
+    assert len(response.data) < compression.COMPRESS_MIN_BYTES
+    assert 'Content-Encoding' not in response.headers
+
+    etag = response.headers['ETag']
+    response = client.get('/api/contacts', headers={**headers, 'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert response.status_code == 304 and 'Content-Encoding' not in response.headers
+
+
+def test_streamed_export_is_compressed_chunk_by_chunk(client, contacts):
+    plain = client.get('/api/contacts/export', headers=contacts)
+    assert plain.is_streamed and 'Content-Encoding' not in plain.headers
+
+    response = client.get('/api/contacts/export', headers={**contacts, 'Accept-Encoding': 'gzip'})
+    assert response.is_streamed
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.data) == plain.data
+    assert gzip.decompress(response.data).decode('utf-8').startswith('\ufeff')
+
+
+def test_file_downloads_pass_through_untouched(client, contacts):
+    response = client.get('/api/contacts/export/excel', headers={**contacts, 'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert response.data[:2] == b'PK'
@@ -0,0 +1,37 @@
+import os
+import re
+
+import pytest
+
+from api.src.model import db
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_ENV_READ = re.compile(r"""environ\.get\(\s*f?['"]([A-Z0-9_]+)""")
+
+
+def _env_vars() -> set[str]:
+    names = set()
+    for root, _, files in os.walk(os.path.join(PROJECT_ROOT, 'api', 'src')):
+        for name in files:
+            if name.endswith('.py'):
+                with open(os.path.join(root, name), encoding='utf-8') as f:
+                    names.update(_ENV_READ.findall(f.read()))
+    return names
+
+
+def test_every_setting_is_documented_in_readme():
+    with open(os.path.join(PROJECT_ROOT, 'README.md'), encoding='utf-8') as f:
+        readme = f.read()
+    names = _env_vars()
+    assert len(names) > 50
+    assert sorted(name for name in names if f'`{name}' not in readme) == []
+
+
+def test_storage_profile_pragma_override(monkeypatch):
+    monkeypatch.setenv('DB_PRAGMA_SYNCHRONOUS', 'FULL')
+    profile = db.get_storage_profile('throughput')
+    assert profile['synchronous'] == 'FULL'
+    assert profile['journal_mode'] == 'WAL'
+    with pytest.raises(ValueError):
+        db.get_storage_profile('unknown')
@@ -0,0 +1,73 @@
+import os
+import sqlite3
+
+import pytest
+
+from api.src.model import db
+
+
+def test_pool_reuses_released_connections(app):
+    pool = db.ConnectionPool(os.environ['CONTACTS_DB_PATH'], max_size=2)
+    conn = pool.acquire()
+    conn.close()
+    assert pool.acquire() is conn
+    assert pool.stats()['hits'] == 1
+
+
+def test_pool_times_out_when_exhausted(app):
+    pool = db.ConnectionPool(os.environ['CONTACTS_DB_PATH'], max_size=1, timeout=0.05)
+    pool.acquire()
+    with pytest.raises(sqlite3.OperationalError):
+        pool.acquire()
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_init_db_leaves_no_idle_connections(app):
+    db.init_db()
+    assert db.get_pool().stats()['idle'] == 0
+
+
+def test_fork_child_gets_a_fresh_pool(app):
+    parent_pool = db.get_pool()
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            pool = db.get_pool()
+            conn = pool.acquire()
+            conn.execute('SELECT 1').fetchone()
+            os.write(write, b'1' if pool is not parent_pool and db._checkpointer is None else b'0')
+        finally:
+            os._exit(0)
+    os.close(write)
+    os.waitpid(pid, 0)
+    assert os.read(read, 1) == b'1'
+
+
+def test_fork_child_restarts_checkpointer_and_log_writer(app, monkeypatch):
+    from flask import Flask
+
+    from api.src.utils import logger as logger_module
+    monkeypatch.setattr(db, 'DB_CHECKPOINT_INTERVAL', 60)
+    monkeypatch.setattr(db, '_checkpointer', None)
+    db.init_app(Flask(__name__))
+    parent_checkpointer = db._checkpointer
+    parent_listener = logger_module._listener
+    assert parent_checkpointer is not None and parent_checkpointer.is_alive()
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            inherited = db._checkpointer
+            listener = logger_module._listener
+            db.init_app(Flask(__name__))
+            ok = (inherited is None and db._checkpointer is not parent_checkpointer
+                  and db._checkpointer.is_alive()
+                  and listener is not parent_listener and listener._thread.is_alive())
+            os.write(write, b'1' if ok else b'0')
+        finally:
+            os._exit(0)
+    os.close(write)
+    os.waitpid(pid, 0)
+    parent_checkpointer.stop()
+    assert os.read(read, 1) == b'1'
@@ -0,0 +1,67 @@
+import http.client
+import threading
+from urllib.parse import unquote
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+import pytest
+
+from api.src.model.contact import EXPORT_SQL
+from api.src.model.db import get_db_connection
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(app):
+    """在真实的WSGI服务器中运行应用：响应头按latin-1编码，和gunicorn的限制一致"""
+    httpd = make_server('127.0.0.1', 0, app, handler_class=QuietHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _get(address, path, headers):
+    conn = http.client.HTTPConnection(*address, timeout=10)
+    try:
+        conn.request('GET', path, headers=headers)
+        response = conn.getresponse()
+        return response.status, response.getheader('Content-Disposition'), response.read()
+    finally:
+        conn.close()
+
+
+def _filename(disposition: str) -> str:
+    for part in disposition.split(';'):
+        key, _, value = part.strip().partition('=')
+        if key == 'filename*':
+            charset, _, quoted = value.partition("''")
+            return unquote(quoted, encoding=charset)
+    return ''
+
+
+@pytest.mark.parametrize('path, suffix', [('/api/contacts/export', 'csv'), ('/api/contacts/export/excel', 'xlsx')])
+def test_export_filename_survives_wsgi_server(client, register, server, path, suffix):
+    user_id, headers = register()
+    client.post('/api/contacts', json={'name': '张三', 'phone1': '13800000001'}, headers=headers)
+    status, disposition, body = _get(server, path, headers)
+    assert status == 200
+    assert disposition.startswith('attachment;')
+    assert _filename(disposition) == f'通讯录_{user_id}.{suffix}'
+    disposition.encode('ascii')
+    if suffix == 'csv':
+        assert body.decode('utf-8').startswith('\ufeff') and '张三' in body.decode('utf-8')
+
+
+def test_export_reads_rows_in_index_order(app):
+    conn = get_db_connection()
+    try:
+        plan = ' | '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + EXPORT_SQL, (1,)))
+    finally:
+        conn.close()
+    assert 'idx_contacts_user ' in plan
+    assert 'TEMP B-TREE' not in plan
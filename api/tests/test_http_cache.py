@@ -0,0 +1,50 @@
+from api.src.model.contact import Contact
+
+
+def _add(client, headers, name, phone):
+    response = client.post('/api/contacts', json={'name': name, 'phone1': phone}, headers=headers)
+    assert response.status_code == 201
+
+
+def test_unchanged_contacts_answer_304_without_querying(client, register, monkeypatch):
+    _, headers = register()
+    _add(client, headers, '张三', '13800000001')
+    first = client.get('/api/contacts', headers=headers)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert first.headers['Last-Modified'] and first.headers['Cache-Control'] == 'private, no-cache'
+
+    def fail(*args, **kwargs):
+        raise AssertionError('304不应查询联系人')
+    monkeypatch.setattr(Contact, 'query', fail)
+    second = client.get('/api/contacts', headers={**headers, 'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.data == b'' and second.headers['ETag'] == etag
+
+
+def test_writes_change_the_etag(client, register):
+    _, headers = register()
+    etag = client.get('/api/contacts', headers=headers).headers['ETag']
+    _add(client, headers, '李四', '13800000002')
+    response = client.get('/api/contacts', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert [row['name'] for row in response.json['data']] == ['李四']
+
+
+def test_groups_share_the_user_version(client, register):
+    _, headers = register()
+    etag = client.get('/api/groups', headers=headers).headers['ETag']
+    assert client.get('/api/groups', headers={**headers, 'If-None-Match': etag}).status_code == 304
+    client.post('/api/groups', json={'group_name': '同事'}, headers=headers)
+    assert client.get('/api/groups', headers={**headers, 'If-None-Match': etag}).status_code == 200
+
+
+def test_etags_differ_per_user_and_format(client, register):
+    _, headers = register()
+    _, other_headers = register()
+    etag = client.get('/api/contacts', headers=headers).headers['ETag']
+    assert client.get('/api/contacts', headers={**other_headers, 'If-None-Match': etag}).status_code == 200
+    columnar = client.get('/api/contacts', headers={**headers, 'If-None-Match': etag,
+                                                    'Accept': 'application/vnd.contacts.columnar+json'})
+    assert columnar.status_code == 200 and columnar.headers['ETag'] != etag
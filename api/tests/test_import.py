@@ -0,0 +1,69 @@
+import os
+import re
+import subprocess
+import sys
+import zipfile
+
+from openpyxl import Workbook
+
+from api.src.model.contact import Contact
+from api.src.utils import import_rows
+from api.src.utils.xlsx_reader import (iter_row_fragments, iter_rows, load_shared_strings, parse_row_fragment,
+                                       sheet_paths)
+
+HEADER = ['姓名', '电话1', '电话2', '邮箱1', '邮箱2', '社交账号', '地址', '分组ID', '分组名称', '是否收藏']
+
+
+def _workbook(path: str, rows: int, strip_refs: bool = False) -> str:
+    """生成导入文件；strip_refs=True时去掉<row>/<c>的r属性（部分工具导出的文件没有）"""
+    wb = Workbook()
+    wb.active.append(HEADER)
+    for i in range(rows):
+        wb.active.append([f'联系人{i}', f'139{i:08d}', '', '', '', '', '', 0, '', '是' if i % 2 else '否'])
+    wb.save(path)
+    if strip_refs:
+        with zipfile.ZipFile(path) as zf:
+            items = {name: zf.read(name) for name in zf.namelist()}
+        items['xl/worksheets/sheet1.xml'] = re.sub(rb'\sr="[A-Z]*\d+"', b'', items['xl/worksheets/sheet1.xml'])
+        with zipfile.ZipFile(path, 'w') as zf:
+            for name, data in items.items():
+                zf.writestr(name, data)
+    return path
+
+
+def test_worker_module_does_not_import_database_or_flask():
+    code = ('import sys, api.src.utils.import_rows; '
+            'print(sorted(m for m in sys.modules if m.startswith(("api.src.model", "flask"))))')
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, check=True)
+    assert output.stdout.strip() == '[]'
+
+
+def test_fragments_without_row_refs_keep_row_numbers(tmp_path):
+    path = _workbook(str(tmp_path / 'norefs.xlsx'), 300, strip_refs=True)
+    sheet = sheet_paths(path)[0][1]
+    expected = list(iter_rows(path, sheet, max_col=10))
+    fragments = list(iter_row_fragments(path, sheet, fragment_bytes=2048, read_size=512))
+    assert len(fragments) > 1
+    with zipfile.ZipFile(path) as zf:
+        strings = load_shared_strings(zf)
+    parsed = [row for first_row, fragment in fragments
+              for row in parse_row_fragment(fragment, strings, max_col=10, first_row=first_row)]
+    assert [num for num, _ in parsed] == list(range(1, 302))
+    assert parsed == expected
+
+
+def test_parallel_import_reuses_one_pool(tmp_path, register):
+    path = _workbook(str(tmp_path / 'contacts.xlsx'), 50)
+    executor = import_rows.get_import_executor(2)
+    for _ in range(2):
+        user_id, _ = register()
+        report = Contact.import_from_excel_parallel(path, user_id, workers=2)
+        assert report['success'] == 50 and report['fail'] == 0
+        assert len(Contact.query(user_id, fields=['id'])[0]) == 50
+    assert import_rows.get_import_executor(2) is executor
+    norefs = _workbook(str(tmp_path / 'norefs.xlsx'), 20, strip_refs=True)
+    user_id, _ = register()
+    report = Contact.import_from_excel_parallel(norefs, user_id, workers=2)
+    assert report['success'] == 20
+    assert not [row for row in report['rows'] if row['status'] == 'failed']
@@ -0,0 +1,98 @@
+import os
+import time
+from io import BytesIO
+
+from openpyxl import Workbook
+
+from api.src.model.db import get_db_connection
+from api.src.model.job import Job
+from api.src.utils import jobs
+
+
+def _job(user_id: int, status: str, age_seconds: int) -> str:
+    job_id = Job.create(user_id, 'import_excel')
+    conn = get_db_connection()
+    try:
+        conn.execute(
+            "UPDATE jobs SET status = ?, updated_at = datetime('now', ?) WHERE id = ?",
+            (status, f'-{age_seconds} seconds', job_id)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return job_id
+
+
+def _touch(name: str, age_seconds: int = 0) -> str:
+    path = jobs.job_path(os.path.splitext(name)[0], os.path.splitext(name)[1])
+    with open(path, 'w') as f:
+        f.write('x')
+    mtime = time.time() - age_seconds
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def _status(job_id: str, user_id: int):
+    job = Job.get(job_id, user_id)
+    return job['status'] if job else None
+
+
+def test_interrupted_jobs_are_failed_and_their_uploads_removed(register):
+    user_id, _ = register()
+    stale = _job(user_id, 'running', jobs.JOB_STALE_SECONDS + 60)
+    queued = _job(user_id, 'queued', jobs.JOB_STALE_SECONDS + 60)
+    live = _job(user_id, 'running', 10)
+    uploads = [_touch(f'{job_id}.upload') for job_id in (stale, queued, live)]
+
+    jobs.purge_jobs()
+
+    assert _status(stale, user_id) == 'failed' and _status(queued, user_id) == 'failed'
+    assert '中断' in Job.get(stale, user_id)['message']
+    assert _status(live, user_id) == 'running'
+    assert [os.path.exists(path) for path in uploads] == [False, False, True]
+
+
+def test_expired_jobs_are_deleted_with_their_files(register):
+    user_id, _ = register()
+    expired = [_job(user_id, status, jobs.JOB_RETENTION + 60) for status in ('succeeded', 'failed', 'running')]
+    recent = _job(user_id, 'succeeded', 10)
+    files = [_touch(f'{expired[0]}.csv'), _touch(f'{expired[2]}.upload')]
+    kept = _touch(f'{recent}.xlsx', jobs.JOB_RETENTION + 60)
+
+    jobs.purge_jobs()
+
+    assert [_status(job_id, user_id) for job_id in expired] == [None, None, None]
+    assert _status(recent, user_id) == 'succeeded'
+    assert not any(os.path.exists(path) for path in files)
+    assert os.path.exists(kept)
+
+
+def test_orphan_files_are_removed_after_retention():
+    old = _touch('0123456789abcdef.upload', jobs.JOB_RETENTION + 60)
+    fresh = _touch('fedcba9876543210.upload')
+    jobs.purge_jobs()
+    assert not os.path.exists(old)
+    assert os.path.exists(fresh)
+    os.remove(fresh)
+
+
+def test_async_import_names_upload_after_job(client, register):
+    _, headers = register()
+    workbook = Workbook()
+    workbook.active.append(['姓名', '电话1'])
+    workbook.active.append(['张三', '13800000001'])
+    data = BytesIO()
+    workbook.save(data)
+    data.seek(0)
+
+    response = client.post('/api/contacts/import/excel?async=1', headers=headers,
+                           data={'file': (data, 'contacts.xlsx')}, content_type='multipart/form-data')
+    assert response.status_code == 202
+    job_id = response.json['data']['job_id']
+    deadline = time.time() + 10
+    while (job := client.get(f'/api/contacts/jobs/{job_id}', headers=headers).json['data'])['status'] \
+            in ('queued', 'running') and time.time() < deadline:
+        time.sleep(0.05)
+    assert job['status'] == 'succeeded', job
+    assert job['result']['success'] == 1
+    assert not os.path.exists(os.path.join(jobs.JOB_DIR, f'{job_id}.upload'))
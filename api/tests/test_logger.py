@@ -0,0 +1,58 @@
+import json
+import logging
+import queue
+import sys
+
+from api.src.utils import logger as logger_module
+from api.src.utils.logger import JsonFormatter, NonBlockingQueueHandler, TextFormatter, log_event
+
+
+def _record(message='导入完成', exc_info=None, **fields):
+    record = logging.LogRecord('api.test', logging.INFO, __file__, 1, message, None, exc_info)
+    record.fields = fields
+    return record
+
+
+def test_text_and_json_formatters_carry_fields():
+    text = TextFormatter().format(_record(user_id=7, rows=100))
+    assert text.endswith('INFO api.test: 导入完成 user_id=7 rows=100')
+
+    data = json.loads(JsonFormatter().format(_record(user_id=7, rows=100)))
+    assert (data['level'], data['logger'], data['msg'], data['user_id'], data['rows']) == \
+        ('INFO', 'api.test', '导入完成', 7, 100)
+
+
+def test_exception_text_is_prepared_in_the_calling_thread():
+    try:
+        raise ValueError('坏数据')
+    except ValueError:
+        record = NonBlockingQueueHandler(queue.Queue()).prepare(_record(exc_info=sys.exc_info(), row=3))
+    assert record.exc_info is None and 'ValueError: 坏数据' in record.exc_text
+    data = json.loads(JsonFormatter().format(record))
+    assert data['row'] == 3 and 'ValueError' in data['exc']
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(1))
+    for _ in range(3):
+        handler.handle(_record())
+    assert handler.queue.qsize() == 1 and handler.dropped == 2
+
+
+def test_disabled_levels_cost_only_a_level_check():
+    calls = []
+
+    class Recorder(logging.Logger):
+        def log(self, level, msg, *args, **kwargs):
+            calls.append((level, msg, kwargs['extra']['fields']))
+
+    recorder = Recorder('api.test_gate')
+    recorder.setLevel(logging.WARNING)
+    log_event(recorder, logging.DEBUG, '逐行明细', row=1)
+    log_event(recorder, logging.WARNING, '导入失败', rows=2)
+    assert calls == [(logging.WARNING, '导入失败', {'rows': 2})]
+
+
+def test_module_loggers_hang_off_the_api_root():
+    assert logger_module.get_logger('api.src.model.contact').name == 'api.src.model.contact'
+    assert logger_module.get_logger('__main__').name == 'api.__main__'
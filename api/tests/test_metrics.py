@@ -0,0 +1,67 @@
+import time
+
+import pytest
+from flask import Flask
+
+from api.src.model.db import get_db_connection, init_app as init_db_pool
+from api.src.utils import metrics
+
+
+@pytest.fixture
+def metrics_client(app, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_TOKEN', 'scrape-token')
+    monkeypatch.setattr(metrics, 'metrics', metrics.Metrics())
+    instrumented = Flask(__name__)
+    init_db_pool(instrumented)
+
+    @instrumented.route('/api/ping')
+    def ping():
+        conn = get_db_connection()
+        conn.execute('SELECT 1').fetchone()
+        conn.execute('SELECT 2').fetchone()
+        return 'pong'
+
+    @instrumented.route('/api/slow')
+    def slow():
+        get_db_connection().execute('SELECT 1').fetchone()
+        time.sleep(0.05)
+        return 'done'
+    metrics.init_app(instrumented)
+    return instrumented.test_client()
+
+
+AUTH = {'Authorization': 'Bearer scrape-token'}
+
+
+def test_metrics_require_the_token(metrics_client):
+    for path in ('/api/metrics', '/api/metrics/slow', '/api/metrics/queries'):
+        assert metrics_client.get(path).status_code == 401
+        assert metrics_client.get(path, headers={'Authorization': 'Bearer wrong'}).status_code == 401
+        assert metrics_client.get(path, headers=AUTH).status_code == 200
+
+
+def test_metrics_routes_are_absent_without_a_token(client):
+    assert metrics.METRICS_TOKEN == ''
+    assert client.get('/api/metrics').status_code == 404
+
+
+def test_request_latency_and_sql_counts_are_exported(metrics_client):
+    response = metrics_client.get('/api/ping')
+    assert response.data == b'pong'
+    assert any(value.startswith('db;') and '2 queries' in value for value in response.headers.getlist('Server-Timing'))
+
+    text = metrics_client.get('/api/metrics', headers=AUTH).get_data(as_text=True)
+    assert 'http_requests_total{endpoint="ping",method="GET",status="200"} 1' in text
+    assert 'http_request_duration_seconds_count{endpoint="ping",method="GET"} 1' in text
+    assert 'sql_queries_per_request_bucket{endpoint="ping",le="2"} 1' in text
+    assert 'sql_queries_per_request_bucket{endpoint="ping",le="1"} 0' in text
+    assert 'db_pool_' in text and 'query_cache_' in text
+
+
+def test_slow_requests_are_profiled(metrics_client, monkeypatch):
+    monkeypatch.setattr(metrics, 'PROFILE_SAMPLE_RATE', 1.0)
+    monkeypatch.setattr(metrics, 'PROFILE_SLOW_MS', 0)
+    metrics_client.get('/api/slow')
+    profiles = metrics_client.get('/api/metrics/slow', headers=AUTH).json['data']
+    assert [(p['path'], p['sql_count']) for p in profiles] == [('/api/slow', 1)]
+    assert any('slow (test_metrics.py' in stack for stack in profiles[0]['samples'])
@@ -0,0 +1,44 @@
+import sqlite3
+
+import pytest
+
+from api.src.model.migrations import MIGRATIONS, get_schema_version, migrate
+
+
+def _tables(conn) -> set[str]:
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'index')")}
+
+
+def test_migrate_applies_all_versions_once():
+    conn = sqlite3.connect(':memory:')
+    versions = [version for version, _, _ in MIGRATIONS]
+    assert migrate(conn) == sorted(versions)
+    assert get_schema_version(conn) == max(versions)
+    assert {'users', 'contacts', 'contacts_fts', 'jobs', 'user_versions', 'idx_contacts_user_name'} <= _tables(conn)
+    assert migrate(conn) == []
+    recorded = [row[0] for row in conn.execute('SELECT version FROM schema_version ORDER BY version')]
+    assert recorded == sorted(versions)
+
+
+def test_migrate_resumes_from_recorded_version():
+    conn = sqlite3.connect(':memory:')
+    assert migrate(conn, MIGRATIONS[:2]) == [1, 2]
+    conn.execute("INSERT INTO users (username, password) VALUES ('u', 'p')")
+    conn.execute("INSERT INTO contacts (name, phone1, user_id) VALUES ('张三', '13800000001', 1)")
+    conn.commit()
+
+    assert migrate(conn) == [version for version, _, _ in MIGRATIONS[2:]]
+    # 迁移3补建的全文索引包含迁移前已有的联系人
+    assert conn.execute("SELECT rowid FROM contacts_fts WHERE contacts_fts MATCH '\"138000\"'").fetchall() == [(1,)]
+
+
+def test_failed_migration_is_rolled_back_and_not_recorded():
+    conn = sqlite3.connect(':memory:')
+    broken = MIGRATIONS[:1] + [(2, '失败的迁移', [
+        'CREATE TABLE partial (id INTEGER)',
+        'CREATE TABLE broken (',
+    ])]
+    with pytest.raises(sqlite3.Error):
+        migrate(conn, broken)
+    assert get_schema_version(conn) == 1
+    assert 'partial' not in _tables(conn)
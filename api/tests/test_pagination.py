@@ -0,0 +1,88 @@
+import base64
+import json
+
+import pytest
+
+from api.src.model.contact import _compile_query, decode_cursor, encode_cursor
+from api.src.model.db import get_db_connection
+
+
+def _cursor(payload) -> str:
+    raw = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor({'id': 7}, 'id'), 'id') == [7]
+    assert decode_cursor(encode_cursor({'name': '张三', 'id': 7}, 'name'), 'name') == ['张三', 7]
+
+
+@pytest.mark.parametrize('cursor, sort', [
+    ('!!!', 'id'),
+    (_cursor(b'\xff\xfe'), 'id'),
+    (_cursor(5), 'id'),
+    (_cursor(['id']), 'id'),
+    (_cursor(['id', 5]), 'id'),
+    (_cursor(['id', '5']), 'id'),
+    (_cursor(['id', [{'a': 1}]]), 'id'),
+    (_cursor(['id', [True]]), 'id'),
+    (_cursor(['id', [1.5]]), 'id'),
+    (_cursor(['id', [1, 2]]), 'id'),
+    (_cursor(['name', [1, 2]]), 'name'),
+    (_cursor(['name', ['a', None]]), 'name'),
+    (_cursor(['name', [1]]), 'id'),
+    (_cursor({'id': [1]}), 'id'),
+])
+def test_malformed_cursor_is_rejected(cursor, sort):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, sort)
+
+
+def test_malformed_cursor_returns_400(client, register):
+    _, headers = register()
+    for payload in (['id', 5], ['id', [{'a': 1}]], ['name', [[1], 2]]):
+        sort = payload[0]
+        response = client.get(f'/api/contacts?limit=10&sort={sort}&after={_cursor(payload)}', headers=headers)
+        assert response.status_code == 400, payload
+        assert response.json['success'] is False
+
+
+def test_pages_cover_all_contacts(client, register):
+    _, headers = register()
+    client.post('/api/contacts/batch', headers=headers, json={
+        'contacts': [{'name': f'联系人{i}', 'phone1': f'137000000{i:02d}'} for i in range(7)]
+    })
+    for sort in ('id', 'name'):
+        names, after = [], ''
+        while True:
+            data = client.get(f'/api/contacts?limit=3&sort={sort}&fields=name&after={after}', headers=headers).json
+            names += [row['name'] for row in data['data']]
+            if not data['next_cursor']:
+                break
+            after = data['next_cursor']
+        assert sorted(names) == sorted(f'联系人{i}' for i in range(7)) and len(names) == 7
+
+
+@pytest.mark.parametrize('has_cursor', [False, True])
+def test_id_pages_read_the_user_index_in_order(app, has_cursor):
+    _, select_sql = _compile_query('', False, False, ('id', 'name'), 'id', has_cursor, True)
+    conn = get_db_connection()
+    try:
+        params = [1] + [1] * has_cursor + [10]
+        plan = ' | '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + select_sql, params))
+    finally:
+        conn.close()
+    assert 'idx_contacts_user ' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_cursor_pages_skip_the_count(client, register):
+    _, headers = register()
+    client.post('/api/contacts/batch', headers=headers, json={
+        'contacts': [{'name': f'计数{i}', 'phone1': f'134000000{i:02d}'} for i in range(3)]
+    })
+    first = client.get('/api/contacts?limit=2', headers=headers)
+    assert first.headers['X-Total-Count'] == '3'
+    second = client.get(f"/api/contacts?limit=2&after={first.json['next_cursor']}", headers=headers)
+    assert len(second.json['data']) == 1
+    assert 'X-Total-Count' not in second.headers
@@ -0,0 +1,36 @@
+from api.src.model import user as user_model
+from api.src.model.db import get_db_connection
+from api.src.model.user import User, hash_password, verify_password
+
+
+def test_hash_round_trip_and_rehash_on_param_change():
+    stored = hash_password('secret', 'pbkdf2_sha256', {'i': 1000})
+    assert stored.startswith('pbkdf2_sha256$i=1000$')
+    assert verify_password('secret', stored) == (True, True)   # 参数与当前配置不同，需要重新哈希
+    assert verify_password('wrong', stored) == (False, False)
+    assert verify_password('secret', hash_password('secret')) == (True, False)
+
+
+def test_legacy_plaintext_password_is_rehashed_on_login(app):
+    assert User.register('legacy_user', 'placeholder', 'legacy@example.com') > 0
+    conn = get_db_connection()
+    conn.execute("UPDATE users SET password = 'plain-pw' WHERE username = 'legacy_user'")
+    conn.commit()
+    conn.close()
+    assert User.login('legacy_user', 'plain-pw') is not None
+    assert User.login('legacy_user', 'plain-pw')['password'].startswith('scrypt$')
+
+
+def test_unknown_username_costs_one_kdf_like_a_wrong_password(app, monkeypatch):
+    assert User.register('timing_user', 'right-password', 'timing@example.com') > 0
+    user_model._dummy_hash()  # 固定哈希只在第一次使用时生成，不计入比较
+    calls = []
+    derive = user_model._derive
+    monkeypatch.setattr(user_model, '_derive', lambda *args: calls.append(args[2:]) or derive(*args))
+
+    assert User.login('no_such_user', 'whatever') is None
+    unknown = list(calls)
+    calls.clear()
+    assert User.login('timing_user', 'wrong-password') is None
+    assert len(unknown) == len(calls) == 1
+    assert unknown[0] == calls[0]  # 同样的算法和参数
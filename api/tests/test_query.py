@@ -0,0 +1,50 @@
+import pytest
+
+
+def _group(client, headers, name):
+    response = client.post('/api/groups', json={'group_name': name}, headers=headers)
+    assert response.status_code in (200, 201), response.json
+    return response.json['data']['id']
+
+
+def _names(client, headers, query):
+    response = client.get(f'/api/contacts?fields=name&{query}', headers=headers)
+    assert response.status_code == 200, response.json
+    return sorted(row['name'] for row in response.json['data'])
+
+
+@pytest.fixture
+def seeded(client, register):
+    _, headers = register()
+    family = _group(client, headers, '家人')
+    work = _group(client, headers, '同事')
+    response = client.post('/api/contacts/batch', headers=headers, json={'contacts': [
+        {'name': '张三', 'phone1': '13800000001', 'group_id': family, 'is_favorite': 1},
+        {'name': '张四', 'phone1': '13800000002', 'group_id': family},
+        {'name': '张五', 'phone1': '13800000003', 'group_id': work, 'is_favorite': 1},
+        {'name': '李六', 'phone1': '13800000004', 'group_id': family, 'is_favorite': 1},
+    ]})
+    assert response.json['data']['fail'] == 0, response.json
+    return headers, family, work
+
+
+def test_filters_combine_in_one_query(client, seeded):
+    headers, family, work = seeded
+    assert _names(client, headers, '') == ['张三', '张五', '张四', '李六']
+    assert _names(client, headers, 'keyword=张') == ['张三', '张五', '张四']
+    assert _names(client, headers, f'group_id={family}') == ['张三', '张四', '李六']
+    assert _names(client, headers, 'favorite=1') == ['张三', '张五', '李六']
+    assert _names(client, headers, f'keyword=张&group_id={family}') == ['张三', '张四']
+    assert _names(client, headers, f'keyword=张&group_id={family}&favorite=1') == ['张三']
+    assert _names(client, headers, f'keyword=张&group_id={work}&favorite=0') == []
+    assert _names(client, headers, 'keyword=1380000&favorite=0') == ['张四']   # 全文索引+收藏
+
+
+def test_combined_filters_page_with_cursor(client, seeded):
+    headers, family, _ = seeded
+    first = client.get(f'/api/contacts?fields=name&group_id={family}&favorite=1&limit=1', headers=headers)
+    assert first.headers['X-Total-Count'] == '2'
+    second = client.get(f"/api/contacts?fields=name&group_id={family}&favorite=1&limit=1"
+                        f"&after={first.json['next_cursor']}", headers=headers)
+    assert [row['name'] for row in first.json['data'] + second.json['data']] == ['张三', '李六']
+    assert second.json['next_cursor'] is None
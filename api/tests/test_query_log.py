@@ -0,0 +1,72 @@
+import sqlite3
+
+import pytest
+
+from api.src.model import query_log as query_log_module
+from api.src.model.query_log import QueryLog, normalize_sql, parameters_shape
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE contacts (id INTEGER PRIMARY KEY, user_id INTEGER, name TEXT)')
+    conn.execute('CREATE INDEX idx_contacts_user ON contacts (user_id)')
+    conn.executemany('INSERT INTO contacts (user_id, name) VALUES (?, ?)', [(1, '张三'), (1, '李四'), (2, '王五')])
+    return conn
+
+
+@pytest.fixture
+def events(monkeypatch):
+    logged = []
+    monkeypatch.setattr(query_log_module, 'log_event',
+                        lambda logger, level, message, **fields: logged.append((message, fields)))
+    return logged
+
+
+def _run(log, conn, sql, parameters, seconds):
+    cursor = conn.execute(sql, parameters)
+    log.observe(sql, parameters, seconds, cursor)
+    return cursor
+
+
+def test_normalize_and_parameter_shape():
+    assert normalize_sql("SELECT *  FROM contacts\n WHERE id IN (?, ?, ?) AND name = 'x' LIMIT 10") == \
+        'SELECT * FROM contacts WHERE id IN (?, ...) AND name = ? LIMIT ?'
+    assert parameters_shape((1, '13800000000', None)) == '(int, str, NoneType)'
+    assert parameters_shape({'phone': '1'}) == '{phone: str}'
+
+
+def test_statements_are_aggregated_by_normalized_text(conn, events):
+    log = QueryLog(slow_ms=100, plan_check=True)
+    _run(log, conn, 'SELECT name FROM contacts WHERE user_id = ? LIMIT 1', (1,), 0.001)
+    _run(log, conn, 'SELECT name FROM contacts WHERE user_id = ? LIMIT 2', (2,), 0.003)
+    [entry] = log.report()
+    assert entry['sql'] == 'SELECT name FROM contacts WHERE user_id = ? LIMIT ?'
+    assert entry['count'] == 2 and entry['total_ms'] == 4.0 and entry['max_ms'] == 3.0
+    assert entry['scans'] == [] and 'idx_contacts_user' in entry['plan'][0]
+    assert events == []
+
+
+def test_full_scans_are_flagged_once_and_reported_first(conn, events):
+    log = QueryLog(slow_ms=100, plan_check=True)
+    _run(log, conn, 'SELECT id FROM contacts WHERE user_id = ?', (1,), 0.05)
+    for _ in range(2):
+        _run(log, conn, 'SELECT c.id FROM contacts c WHERE c.name = ?', ('张三',), 0.001)
+    report = log.report()
+    assert report[0]['sql'] == 'SELECT c.id FROM contacts c WHERE c.name = ?'
+    assert report[0]['scans'] == ['contacts']
+    assert [message for message, _ in events] == ['查询计划全表扫描']
+
+
+def test_slow_statements_are_logged_with_plan_and_shape(conn, events, monkeypatch):
+    monkeypatch.setattr(query_log_module, 'DB_SLOW_QUERY_COUNT_ROWS', True)
+    log = QueryLog(slow_ms=10, plan_check=False)
+    _run(log, conn, 'SELECT name FROM contacts WHERE user_id = ?', (1,), 0.002)
+    assert events == []
+    _run(log, conn, 'SELECT name FROM contacts WHERE user_id = ?', (1,), 0.025)
+    [(message, fields)] = events
+    assert message == '慢查询'
+    assert fields['ms'] == 25.0 and fields['rows'] == 2 and fields['params'] == '(int)'
+    assert fields['sql'] == 'SELECT name FROM contacts WHERE user_id = ?'
+    assert any('idx_contacts_user' in detail for detail in fields['plan'])
+    assert log.report()[0]['slow'] == 1
@@ -0,0 +1,53 @@
+import pytest
+from flask import Flask
+
+from api.src.utils import ratelimit
+from api.src.utils.ratelimit import MemoryBackend, by_ip, rate_limit
+
+
+@pytest.fixture
+def limited_client(monkeypatch):
+    monkeypatch.setattr(ratelimit, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setattr(ratelimit, '_backend', MemoryBackend())
+    app = Flask(__name__)
+
+    @app.route('/login', methods=['POST'])
+    @rate_limit(2, 60, scope='test-login')
+    def login():
+        return 'ok'
+    return app.test_client()
+
+
+def _post(client, forwarded=None, remote='10.0.0.1'):
+    headers = {'X-Forwarded-For': forwarded} if forwarded else {}
+    return client.post('/login', headers=headers, environ_base={'REMOTE_ADDR': remote}).status_code
+
+
+def test_limit_applies_per_connection_address(limited_client):
+    assert [_post(limited_client) for _ in range(3)] == [200, 200, 429]
+    assert _post(limited_client, remote='10.0.0.2') == 200
+    # 未信任代理时忽略X-Forwarded-For
+    assert _post(limited_client, forwarded='1.2.3.4') == 429
+
+
+def test_spoofed_forwarded_for_does_not_reset_the_bucket(limited_client, monkeypatch):
+    monkeypatch.setattr(ratelimit, 'RATE_LIMIT_TRUST_PROXY', 1)
+    # 客户端自己填写的地址在左边，可信代理追加的真实地址在最右边
+    statuses = [_post(limited_client, forwarded=f'198.51.100.{i}, 203.0.113.7') for i in range(3)]
+    assert statuses == [200, 200, 429]
+    assert _post(limited_client, forwarded='203.0.113.8') == 200
+
+
+@pytest.mark.parametrize('hops, forwarded, expected', [
+    (0, '1.1.1.1, 2.2.2.2', '10.0.0.1'),
+    (1, '1.1.1.1, 2.2.2.2', '2.2.2.2'),
+    (2, '1.1.1.1, 2.2.2.2, 3.3.3.3', '2.2.2.2'),
+    (2, '3.3.3.3', '10.0.0.1'),     # 地址数少于代理层数：请求没有经过完整的代理链
+    (1, '', '10.0.0.1'),
+])
+def test_by_ip_takes_the_trusted_hop(monkeypatch, hops, forwarded, expected):
+    monkeypatch.setattr(ratelimit, 'RATE_LIMIT_TRUST_PROXY', hops)
+    app = Flask(__name__)
+    headers = {'X-Forwarded-For': forwarded} if forwarded else {}
+    with app.test_request_context(headers=headers, environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+        assert by_ip() == expected
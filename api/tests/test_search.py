@@ -0,0 +1,98 @@
+from api.src.model import contact as contact_model
+from api.src.model.contact import Contact
+
+
+def _seed(client, headers, contacts):
+    response = client.post('/api/contacts/batch', json={'contacts': contacts}, headers=headers)
+    assert response.json['data']['fail'] == 0, response.json
+
+
+def _names(user_id, keyword, **kwargs):
+    return [row['name'] for row in Contact._query(user_id, keyword, 0, -1, ['name'], kwargs.get('sort'),
+                                                  kwargs.get('limit'), kwargs.get('cursor'))[0]]
+
+
+def test_short_keyword_matches_substrings(client, register):
+    user_id, headers = register()
+    other_id, other_headers = register()
+    _seed(client, headers, [
+        {'name': '张三', 'phone1': '13800000001', 'email1': 'zs@example.com'},
+        {'name': '李四', 'phone1': '13900000002', 'address': '北京'},
+        {'name': '王张', 'phone1': '13700000003'},
+        {'name': '王小明', 'phone1': '13600000004', 'phone2': '010-5678'},
+    ])
+    _seed(client, other_headers, [{'name': '张五', 'phone1': '13500000005'}])
+    assert _names(user_id, '张') == ['张三', '王张']   # 任意位置匹配，只查当前用户
+    assert _names(user_id, '三') == ['张三']
+    assert _names(user_id, '小明') == ['王小明']
+    assert _names(user_id, '78') == ['王小明']        # 电话2
+    assert _names(user_id, 'ZS') == ['张三']           # 邮箱、拼音首字母，不区分大小写
+    assert _names(user_id, '北京') == ['李四']         # 地址
+    assert _names(user_id, 'wz') == ['王张']
+    assert _names(user_id, '%') == []                  # LIKE通配符按字面匹配
+    assert _names(other_id, '张') == ['张五']
+
+
+def test_long_keyword_uses_full_text_within_tenant(client, register):
+    user_id, headers = register()
+    other_id, other_headers = register()
+    _seed(client, headers, [{'name': '赵六', 'phone1': '13812345678', 'address': '上海市浦东新区'}])
+    _seed(client, other_headers, [{'name': '钱七', 'phone1': '13812345679', 'address': '上海市徐汇区'}])
+    assert _names(user_id, '上海市') == ['赵六']
+    assert _names(user_id, '2345') == ['赵六']
+    assert _names(other_id, '上海市') == ['钱七']
+
+
+def test_keyword_search_pages_with_cursor(client, register):
+    user_id, headers = register()
+    _seed(client, headers, [{'name': f'测试{i:02d}', 'phone1': f'135000000{i:02d}'} for i in range(5)])
+    seen = []
+    cursor = None
+    while True:
+        rows, next_cursor, total = Contact._query(user_id, '测试', 0, -1, ['name'], None, 2, cursor)
+        assert total == (5 if cursor is None else None)   # 只有第一页计数
+        cursor = next_cursor
+        seen += [row['name'] for row in rows]
+        if cursor is None:
+            break
+    assert seen == [f'测试{i:02d}' for i in range(5)]
+    assert _names(user_id, '13500', sort='name', limit=10) == [f'测试{i:02d}' for i in range(5)]
+
+
+def test_keyword_count_is_capped(client, register, monkeypatch):
+    user_id, headers = register()
+    _seed(client, headers, [{'name': f'王{i}', 'phone1': f'136000000{i:02d}'} for i in range(4)])
+    monkeypatch.setattr(contact_model, 'SEARCH_COUNT_LIMIT', 2)
+    rows, cursor, total = Contact._query(user_id, '13600', 0, -1, None, None, 1, None)
+    assert total is None and cursor is not None
+    response = client.get('/api/contacts?keyword=13600&limit=1', headers=headers)
+    assert 'X-Total-Count' not in response.headers
+    assert response.json['next_cursor']
+    # 不带关键词时仍返回精确总数
+    assert Contact._query(user_id, '', 0, -1, None, None, 1, None)[2] == 4
+
+
+def test_long_keyword_is_ranked_by_relevance(client, register):
+    user_id, headers = register()
+    _seed(client, headers, [
+        {'name': '钱一', 'phone1': '13100000001', 'address': '杭州西湖区'},
+        {'name': '西湖区', 'phone1': '13100000002'},
+    ])
+    assert _names(user_id, '西湖区') == ['西湖区', '钱一']          # 姓名命中权重最高
+    assert _names(user_id, '西湖区', sort='id') == ['钱一', '西湖区']
+
+
+def test_ranked_search_pages_with_offset_cursor(client, register):
+    user_id, headers = register()
+    _seed(client, headers, [{'name': f'分页{i}', 'phone1': f'133000000{i:02d}'} for i in range(5)])
+    seen = []
+    cursor = None
+    while True:
+        rows, next_cursor, total = Contact._query(user_id, '13300', 0, -1, ['name'], None, 2, cursor)
+        assert total == (5 if cursor is None else None)
+        cursor = next_cursor
+        seen += [row['name'] for row in rows]
+        if cursor is None:
+            break
+    assert sorted(seen) == [f'分页{i}' for i in range(5)]
+    assert _names(user_id, '13300', limit=2, cursor=contact_model.encode_cursor(None, 'rank', 4)) == [seen[4]]
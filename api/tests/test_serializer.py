@@ -0,0 +1,88 @@
+import json
+import sqlite3
+
+import pytest
+
+from api.src.utils import serializer
+
+
+@pytest.fixture
+def rows():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute('CREATE TABLE contacts (id INTEGER, name TEXT, email1 TEXT, is_favorite INTEGER, score REAL)')
+    conn.executemany('INSERT INTO contacts VALUES (?, ?, ?, ?, ?)', [
+        (i, f'联系人"{i}"\\', None if i % 2 else f'u{i}@example.com', i % 2, i / 4) for i in range(7)
+    ])
+    return conn.execute('SELECT * FROM contacts ORDER BY id').fetchall()
+
+
+def _baseline(rows):
+    """改造前的输出：dict(Row) 交给标准库json编码"""
+    return json.loads(json.dumps([dict(row) for row in rows]))
+
+
+@pytest.mark.parametrize('backend', sorted(serializer.BACKENDS))
+def test_backends_encode_rows_like_dict_rows(rows, backend, monkeypatch):
+    monkeypatch.setattr(serializer, 'dumps', serializer.BACKENDS[backend])
+    assert json.loads(serializer.encode_rows(rows)) == _baseline(rows)
+    assert json.loads(serializer.encode_rows([])) == []
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 3, 100])
+def test_streamed_array_matches_one_shot_encoding(rows, chunk_rows):
+    assert b''.join(serializer.iter_rows_json(rows, chunk_rows=chunk_rows)) == serializer.encode_rows(rows)
+    assert b''.join(serializer.iter_rows_json([], chunk_rows=chunk_rows)) == b'[]'
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_rows_response_envelope(app, rows, stream):
+    with app.test_request_context():
+        response = serializer.rows_response(rows, {'next_cursor': None}, stream=stream)
+        body = b''.join(response.response)
+    assert response.is_streamed == stream
+    assert response.mimetype == 'application/json'
+    assert json.loads(body) == {'success': True, 'next_cursor': None, 'data': _baseline(rows)}
+
+
+def test_list_endpoint_returns_baseline_json(client, register):
+    user_id, headers = register()
+    client.post('/api/contacts', json={'name': '张三', 'phone1': '13800000001'}, headers=headers)
+    data = client.get('/api/contacts', headers=headers).json['data']
+    assert data[0]['name'] == '张三' and data[0]['user_id'] == user_id and data[0]['email1'] == ''
+
+
+def _from_columnar(table):
+    return [dict(zip(table['columns'], row)) for row in table['rows']]
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_columnar_response_decodes_to_the_same_rows(app, rows, stream):
+    with app.test_request_context():
+        response = serializer.rows_response(rows, {'next_cursor': 'x'}, stream=stream, fmt='columnar')
+        body = json.loads(b''.join(response.response))
+    assert response.mimetype == serializer.COLUMNAR_MIMETYPE
+    assert body['next_cursor'] == 'x'
+    assert body['data']['columns'] == ['id', 'name', 'email1', 'is_favorite', 'score']
+    assert _from_columnar(body['data']) == _baseline(rows)
+
+
+def test_msgpack_response_decodes_to_the_same_rows(app, rows):
+    msgpack = pytest.importorskip('msgpack')
+    with app.test_request_context():
+        response = serializer.rows_response(rows, fmt='msgpack')
+    body = msgpack.unpackb(response.get_data(), raw=False)
+    assert response.mimetype == serializer.MSGPACK_MIMETYPE
+    assert _from_columnar(body['data']) == _baseline(rows)
+
+
+def test_contact_list_negotiates_format_from_accept(client, register):
+    _, headers = register()
+    client.post('/api/contacts', json={'name': '张三', 'phone1': '13800000001'}, headers=headers)
+    rows = client.get('/api/contacts', headers=headers).json['data']
+    columnar = client.get('/api/contacts', headers={**headers, 'Accept': serializer.COLUMNAR_MIMETYPE})
+    assert columnar.mimetype == serializer.COLUMNAR_MIMETYPE
+    assert 'Accept' in columnar.headers['Vary']
+    assert _from_columnar(columnar.json['data']) == rows
+    # 不支持的类型回退到默认JSON
+    assert client.get('/api/contacts', headers={**headers, 'Accept': 'text/csv'}).json['data'] == rows
@@ -0,0 +1,60 @@
+from api.src.model.db import get_db_connection
+
+
+def _changes(client, headers, since):
+    response = client.get(f'/api/contacts/changes?since={since}', headers=headers)
+    assert response.status_code == 200
+    return response.json['data'], response.json['next_since']
+
+
+def _add(client, headers, name, phone):
+    response = client.post('/api/contacts', json={'name': name, 'phone1': phone}, headers=headers)
+    assert response.status_code == 201
+    return response.json['data']['id']
+
+
+def test_incremental_sync_returns_only_changes(client, register):
+    _, headers = register()
+    first = _add(client, headers, '张三', '13800000001')
+    second = _add(client, headers, '李四', '13800000002')
+
+    data, since = _changes(client, headers, 0)
+    assert data['reset'] is True
+    assert sorted(c['id'] for c in data['upserts']) == [first, second]
+
+    client.put('/api/contacts', json={'old_phone': '13800000001', 'new_name': '张三丰',
+                                      'new_phone': '13800000001'}, headers=headers)
+    client.delete('/api/contacts', json={'phone': '13800000002'}, headers=headers)
+    third = _add(client, headers, '王五', '13800000003')
+
+    data, next_since = _changes(client, headers, since)
+    assert data['reset'] is False
+    assert [(c['id'], c['name']) for c in data['upserts']] == [(first, '张三丰'), (third, '王五')]
+    assert data['deletes'] == [second]
+    assert next_since > since
+
+    data, _ = _changes(client, headers, next_since)
+    assert data == {'upserts': [], 'deletes': [], 'reset': False}
+
+
+def test_sync_resets_for_unknown_or_pruned_versions(client, register):
+    user_id, headers = register()
+    _add(client, headers, '甲', '13900000001')
+    _add(client, headers, '乙', '13900000002')
+    _, since = _changes(client, headers, 0)
+
+    assert _changes(client, headers, since + 100)[0]['reset'] is True
+    assert client.get('/api/contacts/changes?since=abc', headers=headers).status_code == 400
+
+    client.delete('/api/contacts', json={'phone': '13900000001'}, headers=headers)
+    conn = get_db_connection()
+    try:
+        conn.execute("UPDATE contact_tombstones SET deleted_at = datetime('now', '-400 days') WHERE user_id = ?",
+                     (user_id,))
+        conn.commit()
+    finally:
+        conn.close()
+    # 下一次删除时清理过期墓碑，早于已清理版本的同步令牌只能全量同步
+    client.delete('/api/contacts', json={'phone': '13900000002'}, headers=headers)
+    data, _ = _changes(client, headers, since)
+    assert data['reset'] is True and data['deletes'] == [] and data['upserts'] == []